@@ -1,27 +1,86 @@
 from __future__ import annotations
 
+import abc
+import bisect
+import copy
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import math
+import mimetypes
 import os
+import queue
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import AbstractContextManager, contextmanager
+from contextvars import ContextVar
 from datetime import date, datetime, timedelta
 from functools import wraps
 from pathlib import Path
-from typing import Any, Callable
+from typing import Any, Callable, Iterable, Iterator
+from urllib.parse import unquote_to_bytes
 
 from flask import (
     Flask,
     Response,
+    current_app,
     flash,
+    g,
+    has_app_context,
+    has_request_context,
     jsonify,
     redirect,
     render_template,
     request,
+    send_from_directory,
+    stream_with_context,
     session,
     url_for,
 )
-from flask_migrate import Migrate
+import click
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from flask_migrate import Migrate, upgrade as upgrade_database
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import UniqueConstraint
+from flask_sqlalchemy.session import Session as SQLAlchemySession
+from markupsafe import Markup
+from sqlalchemy import (
+    DDL,
+    Select,
+    UniqueConstraint,
+    case,
+    column,
+    create_engine,
+    delete,
+    event,
+    false,
+    func,
+    insert,
+    inspect,
+    literal_column,
+    select,
+    table,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import Connection, Engine, Row, make_url
+from sqlalchemy.orm import Mapper, Session
+from sqlalchemy.sql.util import find_tables
 from werkzeug.security import check_password_hash, generate_password_hash
 
+try:
+    import brotli
+except ImportError:  # brotli is optional; .br variants are skipped without it.
+    brotli = None
+
 BASE_DIR = Path(__file__).resolve().parent
 DB_PATH = BASE_DIR / "tracker.db"
 DEFAULT_PRIORITY = "Medium"
@@ -29,9 +88,271 @@ DEFAULT_THEME = "dark"
 DEFAULT_DAILY_GOAL = 3
 DATE_FORMAT = "%Y-%m-%d"
 ALLOWED_PRIORITIES = {"Low", "Medium", "High"}
+DEFAULT_FRAGMENT_CACHE_MAX_BYTES = 4 * 1024 * 1024
+DEFAULT_HEATMAP_CACHE_MAX_BYTES = 2 * 1024 * 1024
+HEATMAP_DEFAULT_DAYS = 365
+HEATMAP_MAX_DAYS = 731
+DEFAULT_ANALYTICS_DEBOUNCE_SECONDS = 2
+DEFAULT_ANALYTICS_REFRESH_SECONDS = 60
+DEFAULT_ANALYTICS_SNAPSHOT_MAX_AGE_SECONDS = 300
+DEFAULT_SIDE_EFFECT_WORKERS = 2
+DEFAULT_SIDE_EFFECT_QUEUE_SIZE = 1000
+DEFAULT_SIDE_EFFECT_SWEEP_SECONDS = 5
+DEFAULT_SIDE_EFFECT_MAX_ATTEMPTS = 5
+SIDE_EFFECT_BATCH_SIZE = 50
+DEFAULT_GROUP_COMMIT_MAX_LATENCY_MS = 5
+DEFAULT_GROUP_COMMIT_MAX_BATCH = 64
+GROUP_COMMIT_TIMEOUT_SECONDS = 30
+# (tokens per second, burst) for each route class, per user.
+DEFAULT_RATE_LIMITS = {"read": (20.0, 60.0), "write": (10.0, 30.0), "heavy": (1.0, 10.0)}
+DEFAULT_ADMISSION_MAX_IN_FLIGHT = 64
+DEFAULT_ADMISSION_HEAVY_SHARE = 0.5
+DEFAULT_TIMER_FLUSH_SECONDS = 60
+DEFAULT_TIMER_STALE_SECONDS = 120
+DEFAULT_PROJECTION_CACHE_MAX_BYTES = 1024 * 1024
+PROJECTION_DEFAULT_TRAJECTORIES = 10_000
+PROJECTION_MAX_TRAJECTORIES = 50_000
+PROJECTION_HISTORY_DAYS = 28
+PROJECTION_EFFICIENCY_SIGMA = 0.25
+COHORT_PERCENTILES = (10, 25, 50, 75, 90)
+COHORT_AT_RISK_LIMIT = 50
+DEADLINE_DEFAULT_DAYS = 7
+DEADLINE_MAX_DAYS = 90
+DEADLINE_BUCKET_LIMIT = 20
+DASHBOARD_DEADLINE_FIELDS = ("id", "title", "due_date")
+TASK_SEARCH_DEFAULT_LIMIT = 20
+TASK_SEARCH_MAX_LIMIT = 100
+TASK_SEARCH_MAX_TERMS = 8
+PLAN_MAX_DAYS = 366
+PLAN_DEFAULT_APPLY_DAYS = 7
+# (progress field, task label, share of the topic weight, estimated hours)
+PLAN_STAGES: tuple[tuple[str, str, float, float], ...] = (
+    ("theory_completed", "Theory", 0.4, 3.0),
+    ("pyq_30_done", "PYQ practice", 0.3, 2.0),
+    ("revision_1_done", "Revision 1", 0.2, 1.0),
+    ("revision_2_done", "Revision 2", 0.1, 1.0),
+)
+STATIC_DIR = BASE_DIR / "static"
+ASSET_OUTPUT_DIR = STATIC_DIR / "dist"
+ASSET_MANIFEST_NAME = "manifest.json"
+ASSET_EXTENSIONS = {".css", ".js"}
+ASSET_MAX_AGE_SECONDS = 365 * 24 * 60 * 60
+# Precompressed variants in order of preference: (content-coding, suffix).
+ASSET_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+DEFAULT_COMPRESSION_MIN_BYTES = 1024
+DEFAULT_COMPRESSION_LEVEL = 6
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/html", "text/plain"}
+JSON_STREAM_CHUNK_BYTES = 16 * 1024
+DEFAULT_EVENT_QUEUE_SIZE = 100
+DEFAULT_EVENT_KEEPALIVE_SECONDS = 15
+RESYNC_EVENT: dict[str, Any] = {"type": "resync"}
+IDEMPOTENCY_KEY_MAX_LENGTH = 80
+IDEMPOTENCY_RETENTION = timedelta(days=2)
+# status_code of a reserved key whose request is still running.
+IDEMPOTENCY_PENDING_STATUS = 0
+IDEMPOTENCY_WAIT_SECONDS = 10.0
+IDEMPOTENCY_POLL_SECONDS = 0.05
+MAX_BATCH_OPERATIONS = 100
+BATCH_METHODS = {"POST", "PATCH", "PUT", "DELETE"}
+BATCH_OPERATION_ENVIRON_KEY = "tracker.batch_operation"
+# Batch request headers that describe its own body or response negotiation and
+# must not leak into the sub-requests built from its environ.
+BATCH_DROPPED_ENVIRON_KEYS = frozenset(
+    {
+        "CONTENT_TYPE",
+        "CONTENT_LENGTH",
+        "HTTP_ACCEPT_ENCODING",
+        "HTTP_CONTENT_ENCODING",
+        "HTTP_IDEMPOTENCY_KEY",
+        "HTTP_IF_MATCH",
+        "HTTP_IF_NONE_MATCH",
+        "werkzeug.request",
+    }
+)
+
+# Per-user tables live in the shard chosen by user id when SHARD_COUNT > 0;
+# filled in once the models are defined.
+SHARDED_TABLE_NAMES: set[str] = set()
+# Last revision applied to shards before they were versioned; unversioned
+# shards that already hold tables are stamped here and upgraded from it.
+SHARD_BASE_REVISION = "20261019_11"
+_pinned_shard: ContextVar[int | None] = ContextVar("pinned_shard", default=None)
+
+
+class ShardRouter:
+    """Map users to SQLite shard files holding their per-user rows.
+
+    Each shard connection attaches the central database, so statements that
+    join per-user tables with shared catalogs (users, syllabus topics, routine
+    templates) still run as a single query on the shard.
+    """
+
+    def __init__(self, directory: Path, count: int, central_path: str | None) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        self.count = count
+        self.engines = [
+            create_engine(f"sqlite:///{directory / f'shard_{index}.db'}")
+            for index in range(count)
+        ]
+        if central_path and central_path != ":memory:":
+            for engine in self.engines:
+                event.listen(engine, "connect", self._attach_central(central_path))
+
+    @staticmethod
+    def _attach_central(central_path: str) -> Callable[[Any, Any], None]:
+        def attach(dbapi_connection: Any, connection_record: Any) -> None:
+            dbapi_connection.execute("ATTACH DATABASE ? AS central", (central_path,))
+
+        return attach
+
+    def shard_for_user(self, user_id: int) -> int:
+        return user_id % self.count
+
+    def create_all(self) -> None:
+        """Create and version shards that do not exist yet.
+
+        A new shard gets the per-user tables from the models and is stamped at
+        the head revision. A shard created before shards were versioned is
+        stamped at ``SHARD_BASE_REVISION``. Existing shards are brought up to
+        date by ``flask db upgrade``, which runs each revision against every
+        shard (see migrations/env.py).
+        """
+
+        tables = [table for table in db.metadata.sorted_tables if table.name in SHARDED_TABLE_NAMES]
+        script: ScriptDirectory | None = None
+        for engine in self.engines:
+            with engine.begin() as connection:
+                migration = MigrationContext.configure(connection)
+                if migration.get_current_revision() is not None:
+                    continue
+                script = script or ScriptDirectory(get_migrations_directory())
+                if inspect(connection).has_table(Task.__table__.name):
+                    migration.stamp(script, SHARD_BASE_REVISION)
+                    continue
+                db.metadata.create_all(connection, tables=tables)
+                migration.stamp(script, "heads")
+
+    def dispose(self) -> None:
+        for engine in self.engines:
+            engine.dispose()
+
+
+def get_migrations_directory() -> str:
+    return current_app.extensions["migrate"].directory
+
+
+def get_shard_router() -> ShardRouter | None:
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("shard_router")
+
+
+def current_shard(router: ShardRouter) -> int:
+    """Return the pinned shard, else the shard of the logged-in user."""
+
+    pinned = _pinned_shard.get()
+    if pinned is not None:
+        return pinned
+    user_id = session.get("user_id") if has_request_context() else None
+    if user_id is None:
+        raise RuntimeError("No shard selected for per-user tables; use use_user_shard().")
+    return router.shard_for_user(user_id)
+
+
+@contextmanager
+def use_shard(index: int | None) -> Iterator[None]:
+    """Pin per-user tables to shard ``index`` for the duration of the block.
+
+    Primary keys are only unique within a shard, so per-user rows loaded
+    inside the block are expunged from the session when it exits. Commit
+    before leaving the block.
+    """
+
+    if index is None:
+        yield
+        return
+    token = _pinned_shard.set(index)
+    try:
+        yield
+    finally:
+        _pinned_shard.reset(token)
+        for obj in list(db.session.identity_map.values()):
+            if obj.__table__.name in SHARDED_TABLE_NAMES:
+                db.session.expunge(obj)
+
+
+def use_user_shard(user_id: int) -> AbstractContextManager[None]:
+    """Pin per-user tables to ``user_id``'s shard outside of their request."""
+
+    router = get_shard_router()
+    return use_shard(router.shard_for_user(user_id) if router is not None else None)
+
+
+def iter_shards() -> Iterator[int | None]:
+    """Yield each shard index with it pinned; yields None once when unsharded."""
+
+    router = get_shard_router()
+    if router is None:
+        yield None
+        return
+    for index in range(router.count):
+        with use_shard(index):
+            yield index
+
+
+def touches_sharded_table(mapper: Any, clause: Any) -> bool:
+    if isinstance(mapper, Mapper) and mapper.local_table.name in SHARDED_TABLE_NAMES:
+        return True
+    if clause is None:
+        return False
+    return any(
+        table.name in SHARDED_TABLE_NAMES for table in find_tables(clause, include_crud=True)
+    )
+
+
+class ShardedSession(SQLAlchemySession):
+    """Session that routes per-user tables to the shard of the user they belong to.
+
+    Flushed rows go to the shard of their ``user_id``; queries go to the
+    current shard (see ``current_shard``). Without a shard router this is the
+    plain Flask-SQLAlchemy session.
+    """
+
+    def __init__(self, db: SQLAlchemy, **kwargs: Any) -> None:
+        super().__init__(db, **kwargs)
+        if get_shard_router() is not None:
+            self.connection_callable = self._connection_for_instance
+
+    def _connection_for_instance(self, mapper: Mapper[Any], instance: Any) -> Connection:
+        return self.connection(bind_arguments={"bind": self.get_bind(mapper, instance=instance)})
+
+    def connection_for_user(self, user_id: int) -> Connection:
+        """Return this transaction's connection to ``user_id``'s per-user tables."""
+
+        router = get_shard_router()
+        if router is None:
+            return self.connection()
+        engine = router.engines[router.shard_for_user(user_id)]
+        return self.connection(bind_arguments={"bind": engine})
+
+    def get_bind(
+        self,
+        mapper: Any | None = None,
+        clause: Any | None = None,
+        bind: Engine | Connection | None = None,
+        **kwargs: Any,
+    ) -> Engine | Connection:
+        instance = kwargs.pop("instance", None)
+        router = get_shard_router()
+        if bind is None and router is not None and touches_sharded_table(mapper, clause):
+            if instance is not None:
+                return router.engines[router.shard_for_user(instance.user_id)]
+            return router.engines[current_shard(router)]
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
 
 # SQLAlchemy instance configured by create_app.
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": ShardedSession})
 migrate = Migrate()
 
 
@@ -42,6 +363,8 @@ class User(db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    progress_version = db.Column(db.Integer, nullable=False, default=0)
+    change_seq = db.Column(db.Integer, nullable=False, default=0)
 
     tasks = db.relationship("Task", back_populates="user", cascade="all, delete-orphan")
     settings = db.relationship(
@@ -61,6 +384,18 @@ class User(db.Model):
 class Task(db.Model):
     """Database model representing one study task."""
 
+    __table_args__ = (
+        db.Index("ix_task_user_change_seq", "user_id", "change_seq"),
+        # Only open tasks with a due date are indexed, so the deadline queries
+        # stay the same size however much completed history accumulates.
+        db.Index(
+            "ix_task_user_open_due_date",
+            "user_id",
+            "due_date",
+            sqlite_where=db.text("completed = 0 AND due_date IS NOT NULL"),
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(
         db.Integer, db.ForeignKey("user.id"), nullable=False, index=True
@@ -73,6 +408,8 @@ class Task(db.Model):
     notes = db.Column(db.Text, default="")
     completed = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = db.Column(db.Integer, nullable=False, default=0)
 
     user = db.relationship("User", back_populates="tasks")
 
@@ -92,6 +429,104 @@ class Task(db.Model):
         }
 
 
+# External-content FTS5 index over Task kept in sync by triggers. user_id is
+# indexed too so a MATCH can be scoped to one user inside the index.
+TASK_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5("
+    "title, topic, notes, user_id, content='task', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_ai AFTER INSERT ON task BEGIN "
+    "INSERT INTO task_fts(rowid, title, topic, notes, user_id) "
+    "VALUES (new.id, new.title, new.topic, new.notes, new.user_id); END",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_ad AFTER DELETE ON task BEGIN "
+    "INSERT INTO task_fts(task_fts, rowid, title, topic, notes, user_id) "
+    "VALUES ('delete', old.id, old.title, old.topic, old.notes, old.user_id); END",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_au AFTER UPDATE OF title, topic, notes, user_id ON task BEGIN "
+    "INSERT INTO task_fts(task_fts, rowid, title, topic, notes, user_id) "
+    "VALUES ('delete', old.id, old.title, old.topic, old.notes, old.user_id); "
+    "INSERT INTO task_fts(rowid, title, topic, notes, user_id) "
+    "VALUES (new.id, new.title, new.topic, new.notes, new.user_id); END",
+)
+for statement in TASK_SEARCH_DDL:
+    event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(
+    Task.__table__, "before_drop", DDL("DROP TABLE IF EXISTS task_fts").execute_if(dialect="sqlite")
+)
+
+
+TASK_SEARCH_TABLE = table("task_fts", column("rowid"))
+
+
+def rebuild_task_search_index() -> None:
+    """Recreate the task search index and repopulate it from the task table."""
+
+    # Bound through the Task mapper so the statements reach the task shard.
+    bind_arguments = {"mapper": Task}
+    for statement in TASK_SEARCH_DDL:
+        db.session.execute(db.text(statement), bind_arguments=bind_arguments)
+    db.session.execute(
+        db.text("INSERT INTO task_fts(task_fts) VALUES ('rebuild')"),
+        bind_arguments=bind_arguments,
+    )
+    db.session.commit()
+
+
+def open_due_task_conditions(user_id: int) -> tuple[Any, ...]:
+    """WHERE terms for a user's open tasks with a due date.
+
+    They repeat the partial index predicate literally (``completed = 0``
+    rather than a bound parameter) so SQLite can use ix_task_user_open_due_date.
+    """
+
+    return (Task.user_id == user_id, Task.completed == false(), Task.due_date.is_not(None))
+
+
+def build_upcoming_deadlines(
+    user_id: int, today: date, days: int, fields: tuple[str, ...]
+) -> dict[str, Any]:
+    """Return overdue, due-today and due-in-the-next-``days`` buckets of open tasks."""
+
+    end = today + timedelta(days=days)
+    open_due = open_due_task_conditions(user_id)
+    overdue, due_today, upcoming = db.session.execute(
+        select(
+            func.count().filter(Task.due_date < today),
+            func.count().filter(Task.due_date == today),
+            func.count().filter(Task.due_date > today),
+        ).where(*open_due, Task.due_date <= end)
+    ).one()
+    serialize = TASK_ROWS.serializer(fields)
+
+    def bucket(count: int, *conditions: Any) -> dict[str, Any]:
+        if not count:
+            return {"count": 0, "tasks": []}
+        rows = db.session.execute(
+            TASK_ROWS.select(fields)
+            .where(*open_due, *conditions)
+            .order_by(Task.due_date.asc(), Task.id.asc())
+            .limit(DEADLINE_BUCKET_LIMIT)
+        )
+        return {"count": count, "tasks": [serialize(row) for row in rows]}
+
+    return {
+        "date": today.isoformat(),
+        "days": days,
+        "overdue": bucket(overdue, Task.due_date < today),
+        "today": bucket(due_today, Task.due_date == today),
+        "upcoming": bucket(upcoming, Task.due_date > today, Task.due_date <= end),
+    }
+
+
+def build_task_search_match(query: str, user_id: int) -> str | None:
+    """Turn free text into an FTS5 query: every word as a prefix, scoped to the user."""
+
+    terms = re.findall(r"\w+", query.lower())[:TASK_SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    phrases = " ".join(f'"{term}"*' for term in terms)
+    return f'user_id : "{user_id}" AND {{title topic notes}} : ({phrases})'
+
+
 class Setting(db.Model):
     """Database model for user-specific app settings."""
 
@@ -116,6 +551,11 @@ class Setting(db.Model):
 
 
 class StudySession(db.Model):
+    __table_args__ = (
+        # Covers the per-user date-range totals without touching the table.
+        db.Index("ix_study_session_user_date", "user_id", "date", "duration_seconds"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(
         db.Integer, db.ForeignKey("user.id"), nullable=False, index=True
@@ -147,6 +587,8 @@ class RoutineTemplate(db.Model):
 class RoutineCompletion(db.Model):
     __table_args__ = (
         UniqueConstraint("user_id", "routine_id", "date", name="uq_routine_completion_user_routine_date"),
+        db.Index("ix_routine_completion_user_change_seq", "user_id", "change_seq"),
+        db.Index("ix_routine_completion_user_date", "user_id", "date", "completed"),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -158,6 +600,8 @@ class RoutineCompletion(db.Model):
     )
     date = db.Column(db.Date, nullable=False, index=True, default=date.today)
     completed = db.Column(db.Boolean, default=False, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = db.Column(db.Integer, nullable=False, default=0)
 
     routine = db.relationship("RoutineTemplate")
 
@@ -195,6 +639,7 @@ class SyllabusTopic(db.Model):
 class UserSyllabusProgress(db.Model):
     __table_args__ = (
         UniqueConstraint("user_id", "topic_id", name="uq_user_syllabus_topic"),
+        db.Index("ix_user_syllabus_progress_user_change_seq", "user_id", "change_seq"),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -208,9 +653,17 @@ class UserSyllabusProgress(db.Model):
     pyq_30_done = db.Column(db.Boolean, default=False, nullable=False)
     revision_1_done = db.Column(db.Boolean, default=False, nullable=False)
     revision_2_done = db.Column(db.Boolean, default=False, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = db.Column(db.Integer, nullable=False, default=0)
 
 
 class DailyTask(db.Model):
+    __table_args__ = (
+        db.Index("ix_daily_task_user_change_seq", "user_id", "change_seq"),
+        # Serves the planner's (user_id, date) lookups in created_at order.
+        db.Index("ix_daily_task_user_date_created_at", "user_id", "date", "created_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(
         db.Integer, db.ForeignKey("user.id"), nullable=False, index=True
@@ -219,6 +672,8 @@ class DailyTask(db.Model):
     date = db.Column(db.Date, nullable=False, index=True, default=date.today)
     completed = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = db.Column(db.Integer, nullable=False, default=0)
 
     def to_dict(self) -> dict[str, Any]:
         return {
@@ -232,6 +687,7 @@ class DailyTask(db.Model):
 class MockTest(db.Model):
     __table_args__ = (
         UniqueConstraint("user_id", "test_number", name="uq_mock_test_user_test_number"),
+        db.Index("ix_mock_test_user_change_seq", "user_id", "change_seq"),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -242,6 +698,8 @@ class MockTest(db.Model):
     attempted = db.Column(db.Boolean, default=False, nullable=False)
     attempt_date = db.Column(db.Date, nullable=True)
     score = db.Column(db.Float, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = db.Column(db.Integer, nullable=False, default=0)
 
     def to_dict(self) -> dict[str, Any]:
         return {
@@ -253,6 +711,353 @@ class MockTest(db.Model):
         }
 
 
+class IdempotencyRecord(db.Model):
+    """Stored response of a mutating request, replayed for repeated keys.
+
+    The record is inserted with ``IDEMPOTENCY_PENDING_STATUS`` before the
+    request runs, so the unique constraint decides which of two concurrent
+    requests with the same key applies the mutation.
+    """
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_record_user_key"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    key = db.Column(db.String(IDEMPOTENCY_KEY_MAX_LENGTH), nullable=False)
+    method = db.Column(db.String(10), nullable=False)
+    path = db.Column(db.String(255), nullable=False)
+    status_code = db.Column(db.Integer, nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class SyncTombstone(db.Model):
+    """Record of a deleted synced row so delta sync can report removals."""
+
+    __table_args__ = (
+        db.Index("ix_sync_tombstone_user_change_seq", "user_id", "change_seq"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    entity = db.Column(db.String(40), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    change_seq = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SyncCounter(db.Model):
+    """A user's delta-sync change sequence, kept next to the rows it stamps.
+
+    Rows are created on the first change, seeded from the legacy
+    ``User.change_seq`` column that held the sequence before sharding.
+    """
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    change_seq = db.Column(db.Integer, nullable=False, default=0)
+
+
+class AnalyticsSnapshot(db.Model):
+    """Latest precomputed analytics summary for a user."""
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    summary = db.Column(db.Text, nullable=False)
+    summary_date = db.Column(db.Date, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class UserEvent(db.Model):
+    """Append-only log of a user's changes; projections fold over it."""
+
+    __table_args__ = (db.Index("ix_user_event_user_id_id", "user_id", "id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    kind = db.Column(db.String(40), nullable=False)
+    data = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class OutboxTask(db.Model):
+    """Deferred side effect, committed in the same transaction as its write."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    kind = db.Column(db.String(40), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ProjectionSnapshot(db.Model):
+    """A projection's folded state for a user as of ``event_id``."""
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    name = db.Column(db.String(40), primary_key=True)
+    state = db.Column(db.Text, nullable=False)
+    event_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+SHARDED_TABLE_NAMES.update(
+    model.__table__.name
+    for model in (
+        Task,
+        Setting,
+        StudySession,
+        RoutineCompletion,
+        DailyRoutineTask,
+        UserSyllabusProgress,
+        DailyTask,
+        MockTest,
+        IdempotencyRecord,
+        SyncTombstone,
+        SyncCounter,
+        AnalyticsSnapshot,
+        UserEvent,
+        ProjectionSnapshot,
+        OutboxTask,
+    )
+)
+SHARDED_TABLE_NAMES.add(TASK_SEARCH_TABLE.name)
+
+
+def isoformat_or_none(value: date | datetime | None) -> str | None:
+    return value.isoformat() if value is not None else None
+
+
+class RowSerializer:
+    """Serialize Core result rows of one model without building ORM instances.
+
+    ``converters`` lists the public fields in ``to_dict()`` order, mapped to an
+    optional value converter. Serializers are compiled once per fieldset.
+    """
+
+    def __init__(
+        self,
+        model: type[db.Model],
+        converters: dict[str, Callable[[Any], Any] | None],
+    ) -> None:
+        self.model = model
+        self.converters = converters
+        self.default_fields = tuple(converters)
+        self._compiled: dict[
+            tuple[str, ...], Callable[[Row[Any]], dict[str, Any]]
+        ] = {}
+        self._lock = threading.Lock()
+
+    def parse_fields(self, raw_fields: str | None) -> tuple[str, ...]:
+        """Parse a ``?fields=a,b`` value; raises ``ValueError`` on unknown names."""
+
+        if raw_fields is None or not raw_fields.strip():
+            return self.default_fields
+        fields = tuple(
+            dict.fromkeys(name.strip() for name in raw_fields.split(",") if name.strip())
+        )
+        unknown = [name for name in fields if name not in self.converters]
+        if unknown:
+            raise ValueError(
+                f"fields must be a subset of {list(self.default_fields)}"
+            )
+        return fields
+
+    def select(self, fields: tuple[str, ...], *extra: str) -> Select[Any]:
+        """Select ``fields`` followed by any ``extra`` columns not already in it."""
+
+        names = fields + tuple(name for name in extra if name not in fields)
+        return select(*(getattr(self.model, name) for name in names))
+
+    def serializer(self, fields: tuple[str, ...]) -> Callable[[Row[Any]], dict[str, Any]]:
+        """Return a row-to-dict function for the leading ``fields`` columns."""
+
+        compiled = self._compiled.get(fields)
+        if compiled is not None:
+            return compiled
+
+        converted = tuple(
+            (name, converter)
+            for name in fields
+            if (converter := self.converters[name]) is not None
+        )
+
+        def serialize(row: Row[Any]) -> dict[str, Any]:
+            item = dict(zip(fields, row))
+            for name, converter in converted:
+                item[name] = converter(item[name])
+            return item
+
+        with self._lock:
+            self._compiled[fields] = serialize
+        return serialize
+
+
+TASK_ROWS = RowSerializer(
+    Task,
+    {
+        "id": None,
+        "title": None,
+        "unit": None,
+        "topic": None,
+        "priority": None,
+        "due_date": isoformat_or_none,
+        "notes": None,
+        "completed": None,
+        "created_at": isoformat_or_none,
+    },
+)
+DAILY_TASK_ROWS = RowSerializer(
+    DailyTask,
+    {"id": None, "title": None, "date": isoformat_or_none, "completed": None},
+)
+MOCK_TEST_ROWS = RowSerializer(
+    MockTest,
+    {
+        "id": None,
+        "test_number": None,
+        "attempted": None,
+        "attempt_date": isoformat_or_none,
+        "score": None,
+    },
+)
+
+
+SYLLABUS_PROGRESS_ROWS = RowSerializer(
+    UserSyllabusProgress,
+    {
+        "id": None,
+        "topic_id": None,
+        "theory_completed": None,
+        "pyq_30_done": None,
+        "revision_1_done": None,
+        "revision_2_done": None,
+    },
+)
+ROUTINE_COMPLETION_ROWS = RowSerializer(
+    RoutineCompletion,
+    {"id": None, "routine_id": None, "date": isoformat_or_none, "completed": None},
+)
+
+# Per-user collections exposed through /api/sync, keyed by their payload name.
+SYNC_COLLECTIONS: dict[str, RowSerializer] = {
+    "tasks": TASK_ROWS,
+    "daily_tasks": DAILY_TASK_ROWS,
+    "mock_tests": MOCK_TEST_ROWS,
+    "syllabus_progress": SYLLABUS_PROGRESS_ROWS,
+    "routine_completions": ROUTINE_COMPLETION_ROWS,
+}
+SYNC_ENTITY_BY_MODEL = {rows.model: name for name, rows in SYNC_COLLECTIONS.items()}
+
+
+def allocate_change_seq(connection: Connection, user_id: int) -> int:
+    """Advance and return the user's monotonic change sequence.
+
+    ``connection`` must be the transaction's connection to the user's shard so
+    the counter commits or rolls back with the rows it stamps.
+    """
+
+    counter = SyncCounter.__table__
+    advanced = connection.execute(
+        update(counter)
+        .where(counter.c.user_id == user_id)
+        .values(change_seq=counter.c.change_seq + 1)
+    )
+    if advanced.rowcount == 0:
+        user_table = User.__table__
+        connection.execute(
+            insert(counter).from_select(
+                ["user_id", "change_seq"],
+                select(user_table.c.id, user_table.c.change_seq + 1).where(
+                    user_table.c.id == user_id
+                ),
+            )
+        )
+    return connection.execute(
+        select(counter.c.change_seq).where(counter.c.user_id == user_id)
+    ).scalar_one()
+
+
+@event.listens_for(db.session, "before_flush")
+def stamp_sync_changes(session: Session, flush_context: Any, instances: Any) -> None:
+    """Stamp changed synced rows with a new change_seq and tombstone deletes."""
+
+    changed = [
+        obj
+        for obj in (*session.new, *session.dirty)
+        if type(obj) in SYNC_ENTITY_BY_MODEL
+        and (obj in session.new or session.is_modified(obj))
+    ]
+    deleted = [obj for obj in session.deleted if type(obj) in SYNC_ENTITY_BY_MODEL]
+    if not changed and not deleted:
+        return
+
+    seq_by_user = {
+        user_id: allocate_change_seq(session.connection_for_user(user_id), user_id)
+        for user_id in sorted({obj.user_id for obj in (*changed, *deleted)})
+    }
+    for obj in changed:
+        obj.change_seq = seq_by_user[obj.user_id]
+    for obj in deleted:
+        session.add(
+            SyncTombstone(
+                user_id=obj.user_id,
+                entity=SYNC_ENTITY_BY_MODEL[type(obj)],
+                entity_id=obj.id,
+                change_seq=seq_by_user[obj.user_id],
+            )
+        )
+
+
+def build_sync_payload(user_id: int, since: int | None) -> dict[str, Any]:
+    """Return rows changed after ``since`` (or everything when ``None``)."""
+
+    token = db.session.execute(
+        select(SyncCounter.change_seq).where(SyncCounter.user_id == user_id)
+    ).scalar_one_or_none()
+    if token is None:
+        token = db.session.execute(
+            select(User.change_seq).where(User.id == user_id)
+        ).scalar_one()
+    changes: dict[str, list[dict[str, Any]]] = {}
+    for name, rows in SYNC_COLLECTIONS.items():
+        model = rows.model
+        stmt = rows.select(rows.default_fields).where(model.user_id == user_id)
+        if since is not None:
+            stmt = stmt.where(model.change_seq > since, model.change_seq <= token)
+        serialize = rows.serializer(rows.default_fields)
+        changes[name] = [serialize(row) for row in db.session.execute(stmt)]
+
+    deleted: dict[str, list[int]] = {name: [] for name in SYNC_COLLECTIONS}
+    if since is not None:
+        tombstones = db.session.execute(
+            select(SyncTombstone.entity, SyncTombstone.entity_id).where(
+                SyncTombstone.user_id == user_id,
+                SyncTombstone.change_seq > since,
+                SyncTombstone.change_seq <= token,
+            )
+        )
+        for entity, entity_id in tombstones:
+            deleted.setdefault(entity, []).append(entity_id)
+
+    return {
+        "token": str(token),
+        "full": since is None,
+        "changes": changes,
+        "deleted": deleted,
+    }
+
+
+def parse_fields_param(
+    serializer: RowSerializer,
+) -> tuple[tuple[str, ...], tuple[Response, int] | None]:
+    try:
+        return serializer.parse_fields(request.args.get("fields")), None
+    except ValueError as exc:
+        return (), (jsonify({"error": str(exc)}), 400)
+
+
 SUBJECT_WEIGHTAGE: dict[str, float] = {
     "Linear Algebra": 35,
     "Real Analysis": 35,
@@ -384,6 +1189,40 @@ def parse_json_payload() -> tuple[dict[str, Any] | None, tuple[Response, int] |
     return payload, None
 
 
+def build_batch_operation_environ(operation: dict[str, Any]) -> dict[str, Any]:
+    """Return the WSGI environ for one ``/api/batch`` operation.
+
+    The sub-request is derived from the batch request's own environ, so it
+    keeps the client address, server details and session; only the method,
+    path, JSON body and Idempotency-Key are replaced.
+    """
+
+    path, _, query_string = str(operation["path"]).partition("?")
+    body = operation.get("body")
+    data = b"" if body is None else json.dumps(body).encode("utf-8")
+    environ = {
+        name: value
+        for name, value in request.environ.items()
+        if name not in BATCH_DROPPED_ENVIRON_KEYS
+    }
+    environ.update(
+        {
+            "REQUEST_METHOD": str(operation["method"]).upper(),
+            # WSGI carries the percent-decoded path as latin-1 code points.
+            "PATH_INFO": unquote_to_bytes(path).decode("latin-1"),
+            "QUERY_STRING": query_string,
+            "wsgi.input": io.BytesIO(data),
+            "CONTENT_LENGTH": str(len(data)),
+            BATCH_OPERATION_ENVIRON_KEY: True,
+        }
+    )
+    if body is not None:
+        environ["CONTENT_TYPE"] = "application/json"
+    if operation.get("idempotency_key"):
+        environ["HTTP_IDEMPOTENCY_KEY"] = str(operation["idempotency_key"])
+    return environ
+
+
 def validate_task_payload(
     payload: dict[str, Any], *, partial: bool = False
 ) -> dict[str, str]:
@@ -458,6 +1297,148 @@ def require_login(
     return wrapped
 
 
+def claim_idempotency_key(user_id: int, key: str) -> bool:
+    """Reserve ``key`` with a pending record; False if another request holds it.
+
+    The reservation goes through the group committer, so concurrent requests
+    share the commit.
+    """
+
+    method, path = request.method, request.path
+
+    def reserve(user: User) -> None:
+        db.session.add(
+            IdempotencyRecord(
+                user_id=user_id,
+                key=key,
+                method=method,
+                path=path,
+                status_code=IDEMPOTENCY_PENDING_STATUS,
+                body="",
+            )
+        )
+
+    committer: GroupCommitter = current_app.extensions["group_commit"]
+    try:
+        committer.run(user_id, reserve)
+    except IntegrityError:
+        return False
+    return True
+
+
+def record_idempotent_response(user_id: int, key: str, response: Response) -> None:
+    """Store the response for ``key`` through the group committer."""
+
+    status_code, body = response.status_code, response.get_data(as_text=True)
+
+    def record(user: User) -> None:
+        db.session.execute(
+            update(IdempotencyRecord)
+            .where(IdempotencyRecord.user_id == user_id, IdempotencyRecord.key == key)
+            .values(status_code=status_code, body=body)
+        )
+        db.session.execute(
+            delete(IdempotencyRecord).where(
+                IdempotencyRecord.created_at < datetime.utcnow() - IDEMPOTENCY_RETENTION
+            )
+        )
+
+    committer: GroupCommitter = current_app.extensions["group_commit"]
+    committer.run(user_id, record)
+
+
+def release_idempotency_key(user_id: int, key: str) -> None:
+    """Drop a pending reservation so a retry of a failed request can run."""
+
+    db.session.rollback()
+    db.session.execute(
+        delete(IdempotencyRecord).where(
+            IdempotencyRecord.user_id == user_id,
+            IdempotencyRecord.key == key,
+            IdempotencyRecord.status_code == IDEMPOTENCY_PENDING_STATUS,
+        )
+    )
+    db.session.commit()
+
+
+def idempotent(
+    view: Callable[..., Response | tuple[Response, int]],
+) -> Callable[..., Response | tuple[Response, int]]:
+    """Replay the stored response when a mutation repeats its Idempotency-Key.
+
+    Must be applied inside ``require_login`` so the key is scoped per user.
+    Requests without the header run normally. The key is reserved before the
+    view runs; a concurrent request with the same key waits for the first to
+    finish and replays its response, or gets ``409`` if it is still running
+    after ``IDEMPOTENCY_WAIT_SECONDS``.
+    """
+
+    @wraps(view)
+    def wrapped(*args: Any, **kwargs: Any) -> Response | tuple[Response, int]:
+        key = request.headers.get("Idempotency-Key", "").strip()
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({"error": "Idempotency-Key is too long"}), 400
+
+        user = get_current_user()
+        assert user is not None
+        user_id = user.id
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            record = IdempotencyRecord.query.filter_by(user_id=user_id, key=key).first()
+            if record is None:
+                if claim_idempotency_key(user_id, key):
+                    break
+                continue
+            if (record.method, record.path) != (request.method, request.path):
+                return jsonify({"error": "Idempotency-Key was used for another request"}), 422
+            if record.status_code != IDEMPOTENCY_PENDING_STATUS:
+                replay = Response(
+                    record.body, status=record.status_code, mimetype="application/json"
+                )
+                replay.headers["Idempotent-Replayed"] = "true"
+                return replay
+            if time.monotonic() >= deadline:
+                response = jsonify(
+                    {"error": "A request with this Idempotency-Key is still in progress"}
+                )
+                response.headers["Retry-After"] = str(math.ceil(IDEMPOTENCY_WAIT_SECONDS))
+                return response, 409
+            # End the read transaction so the next poll sees the holder's commit.
+            db.session.rollback()
+            time.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            release_idempotency_key(user_id, key)
+            raise
+        if response.status_code >= 500:
+            release_idempotency_key(user_id, key)
+            return response
+        if response.status_code >= 400:
+            # A rejected request may have changed rows before it validated its
+            # input; only the recorded error response should be committed.
+            db.session.rollback()
+        record_idempotent_response(user_id, key, response)
+        return response
+
+    return wrapped
+
+
+def require_admin(
+    view: Callable[..., Response | tuple[Response, int]],
+) -> Callable[..., Response | tuple[Response, int]]:
+    @wraps(view)
+    def wrapped(*args: Any, **kwargs: Any) -> Response | tuple[Response, int]:
+        if not session.get("is_admin"):
+            return jsonify({"error": "Admin login required"}), 403
+        return view(*args, **kwargs)
+
+    return wrapped
+
+
 def login_required_page(
     view: Callable[..., Response | str],
 ) -> Callable[..., Response | str]:
@@ -547,14 +1528,18 @@ def calculate_unit_breakdown(tasks: list[Task]) -> dict[str, dict[str, int]]:
 def calculate_study_streak(tasks: list[Task], *, today: date | None = None) -> int:
     """Calculate consecutive study days ending today from completed tasks."""
 
-    reference_day = today or date.today()
     completion_days = {
         task.created_at.date() for task in tasks if task.completed and task.created_at
     }
+    return count_streak(completion_days, today or date.today())
+
+
+def count_streak(days: set[date], today: date) -> int:
+    """Count consecutive days in ``days`` ending at ``today``."""
 
     streak = 0
-    current_day = reference_day
-    while current_day in completion_days:
+    current_day = today
+    while current_day in days:
         streak += 1
         current_day -= timedelta(days=1)
     return streak
@@ -649,17 +1634,102 @@ def get_or_create_daily_routine(user: User) -> list[dict[str, Any]]:
     for template in templates:
         completion = completion_by_routine.get(template.id)
         items.append(
-            {
-                "id": template.id,
-                "title": template.title,
-                "time_label": template.time_label,
-                "completed": bool(completion and completion.completed),
-                "date": today.isoformat(),
-            }
+            build_routine_item(template, bool(completion and completion.completed), today)
         )
     return items
 
 
+def build_daily_routine_payload(user: User) -> dict[str, Any]:
+    """Return today's routine items and counters as served by /api/daily-routine."""
+
+    items = get_or_create_daily_routine(user)
+    completed_count = sum(1 for item in items if item["completed"])
+    total_count = len(items)
+    completion_percentage = round((completed_count / total_count) * 100, 1) if total_count else 0
+    return {
+        "items": items,
+        "tasks": items,
+        "completed_count": completed_count,
+        "total_count": total_count,
+        "completion_percentage": completion_percentage,
+        "completed_percent": completion_percentage,
+    }
+
+
+def build_routine_item(
+    template: RoutineTemplate, completed: bool, day: date
+) -> dict[str, Any]:
+    return {
+        "id": template.id,
+        "title": template.title,
+        "time_label": template.time_label,
+        "completed": completed,
+        "date": day.isoformat(),
+    }
+
+
+def calculate_routine_counters(user: User, day: date) -> dict[str, Any]:
+    """Return routine completion counters for ``day`` using aggregate queries."""
+
+    total_count = db.session.execute(select(func.count(RoutineTemplate.id))).scalar_one()
+    completed_count = db.session.execute(
+        select(func.count(RoutineCompletion.id)).where(
+            RoutineCompletion.user_id == user.id,
+            RoutineCompletion.date == day,
+            RoutineCompletion.completed.is_(True),
+        )
+    ).scalar_one()
+    completion_percentage = round((completed_count / total_count) * 100, 1) if total_count else 0
+    return {
+        "completed_count": completed_count,
+        "total_count": total_count,
+        "completion_percentage": completion_percentage,
+        "completed_percent": completion_percentage,
+    }
+
+
+def calculate_daily_planner_counters(user: User, day: date) -> dict[str, Any]:
+    """Return planner counters and streak for ``day`` using aggregate queries."""
+
+    total_count, completed_count = db.session.execute(
+        select(
+            func.count(DailyTask.id),
+            func.count(DailyTask.id).filter(DailyTask.completed.is_(True)),
+        ).where(DailyTask.user_id == user.id, DailyTask.date == day)
+    ).one()
+    completion_percentage = round((completed_count / total_count) * 100, 1) if total_count else 0
+    return {
+        "completed_count": completed_count,
+        "total_count": total_count,
+        "completion_percentage": completion_percentage,
+        "streak": calculate_daily_planner_streak(user),
+    }
+
+
+def build_daily_planner_payload(
+    user: User, planner_date: date, fields: tuple[str, ...] = DAILY_TASK_ROWS.default_fields
+) -> dict[str, Any]:
+    """Return the planner items and counters for ``planner_date`` as served by the API."""
+
+    rows = db.session.execute(
+        DAILY_TASK_ROWS.select(fields, "completed")
+        .where(DailyTask.user_id == user.id, DailyTask.date == planner_date)
+        .order_by(DailyTask.created_at.asc())
+    ).all()
+    serialize = DAILY_TASK_ROWS.serializer(fields)
+    total_count = len(rows)
+    completed_count = sum(1 for row in rows if row.completed)
+    completion_percentage = round((completed_count / total_count) * 100, 1) if total_count else 0
+    return {
+        "date": planner_date.isoformat(),
+        "items": [serialize(row) for row in rows],
+        "completed_count": completed_count,
+        "total_count": total_count,
+        "completion_percentage": completion_percentage,
+        "streak": calculate_daily_planner_streak(user),
+    }
+
+
 def calculate_daily_planner_streak(user: User) -> int:
     completed_days = {
         row[0]
@@ -691,20 +1761,100 @@ def seed_mock_tests_for_user(user: User) -> None:
     ]
     if to_create:
         db.session.add_all(to_create)
+        record_event(
+            user.id, "mock.seeded", test_numbers=[test.test_number for test in to_create]
+        )
         db.session.commit()
 
 
-def get_mock_test_stats(user: User) -> dict[str, Any]:
-    tests = MockTest.query.filter_by(user_id=user.id).order_by(MockTest.test_number.asc()).all()
-    attempted_tests = [item for item in tests if item.attempted]
-    scored_tests = [item.score for item in attempted_tests if item.score is not None]
-    total_tests = len(tests)
-    attempted_count = len(attempted_tests)
+def latest_event_id(user_id: int) -> int:
+    """Return the id of the user's newest logged change, 0 if none."""
+
+    return (
+        db.session.scalar(select(func.max(UserEvent.id)).where(UserEvent.user_id == user_id))
+        or 0
+    )
+
+
+class SingleFlight:
+    """Share one in-flight computation among concurrent callers of the same key.
+
+    The first caller computes; callers arriving before it finishes wait and
+    receive a deep copy of its result or exception. Nothing is cached once the
+    computation completes.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Any, Future[Any]] = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key: Any, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return copy.deepcopy(future.result())
+        try:
+            result = compute()
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+def single_flight(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Coalesce concurrent identical per-user computations.
+
+    Calls share a computation when they are for the same user and arguments
+    and see the same latest event id. A caller whose write committed after a
+    computation started therefore gets a fresh one.
+    """
+
+    def decorate(compute: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(compute)
+        def wrapped(user: User, *args: Any, **kwargs: Any) -> Any:
+            flights: SingleFlight | None = (
+                current_app.extensions.get("single_flight") if has_app_context() else None
+            )
+            if flights is None:
+                return compute(user, *args, **kwargs)
+            key = (name, user.id, args, tuple(sorted(kwargs.items())), latest_event_id(user.id))
+            return flights.do(key, lambda: compute(user, *args, **kwargs))
+
+        return wrapped
+
+    return decorate
+
+
+@single_flight("mock_stats")
+def get_mock_test_stats(
+    user: User, fields: tuple[str, ...] = MOCK_TEST_ROWS.default_fields
+) -> dict[str, Any]:
+    rows = db.session.execute(
+        MOCK_TEST_ROWS.select(fields, "attempted", "score")
+        .where(MockTest.user_id == user.id)
+        .order_by(MockTest.test_number.asc())
+    ).all()
+    serialize = MOCK_TEST_ROWS.serializer(fields)
+    attempted_rows = [row for row in rows if row.attempted]
+    scored_tests = [row.score for row in attempted_rows if row.score is not None]
+    total_tests = len(rows)
+    attempted_count = len(attempted_rows)
     attempt_percent = round((attempted_count / total_tests) * 100, 1) if total_tests else 0
     average_score = round(sum(scored_tests) / len(scored_tests), 2) if scored_tests else 0
     best_score = round(max(scored_tests), 2) if scored_tests else 0
     return {
-        "items": [test.to_dict() for test in tests],
+        "items": [serialize(row) for row in rows],
         "attempted_count": attempted_count,
         "total_count": total_tests,
         "attempt_percent": attempt_percent,
@@ -713,12 +1863,18 @@ def get_mock_test_stats(user: User) -> dict[str, Any]:
     }
 
 
+def calculate_mock_test_summary(user: User) -> dict[str, Any]:
+    """Return mock test counters without the per-test item list."""
+
+    return load_projection(user, "mock_stats")
+
+
 def compute_analytics_summary(user: User) -> dict[str, Any]:
     study_totals = calculate_study_time_totals(user)
-    sessions = StudySession.query.filter_by(user_id=user.id).all()
-    total_hours_studied = round(sum(s.duration_seconds for s in sessions) / 3600, 2)
-    session_days = {s.date for s in sessions}
-    average_daily_hours = round(total_hours_studied / len(session_days), 2) if session_days else 0
+    study_days = load_projection(user, "study_days")
+    total_hours_studied = study_days["total_hours"]
+    session_days = study_days["study_days"]
+    average_daily_hours = round(total_hours_studied / session_days, 2) if session_days else 0
 
     routine_items = get_or_create_daily_routine(user)
     routine_completed = sum(1 for item in routine_items if item["completed"])
@@ -731,7 +1887,7 @@ def compute_analytics_summary(user: User) -> dict[str, Any]:
     planner_completed = sum(1 for item in planner_tasks if item.completed)
     planner_percent = round((planner_completed / planner_total) * 100, 1) if planner_total else 0
 
-    mock_stats = get_mock_test_stats(user)
+    mock_stats = load_projection(user, "mock_stats")
     syllabus_data = compute_syllabus_progress(user)
     syllabus_completion = round(syllabus_data["weighted_total"], 1)
     mock_attempt_percent = mock_stats["attempt_percent"]
@@ -745,11 +1901,7 @@ def compute_analytics_summary(user: User) -> dict[str, Any]:
         + (0.2 * productivity_index),
         1,
     )
-    confidence_level = "Low"
-    if predicted_score >= 70:
-        confidence_level = "High"
-    elif predicted_score >= 45:
-        confidence_level = "Medium"
+    confidence_level = classify_confidence(predicted_score)
 
     return {
         "total_hours_studied": total_hours_studied,
@@ -764,20 +1916,263 @@ def compute_analytics_summary(user: User) -> dict[str, Any]:
     }
 
 
-def calculate_study_time_totals(user: User) -> dict[str, float]:
-    today = date.today()
+def classify_confidence(predicted_score: float) -> str:
+    if predicted_score >= 70:
+        return "High"
+    if predicted_score >= 45:
+        return "Medium"
+    return "Low"
+
+
+def select_cohort_metrics(today: date) -> Select[Any]:
+    """Return one row of raw analytics inputs per user, aggregated in SQL."""
+
     week_start = today - timedelta(days=today.weekday())
-    sessions = StudySession.query.filter_by(user_id=user.id).all()
-    today_seconds = sum(s.duration_seconds for s in sessions if s.date == today)
-    week_seconds = sum(s.duration_seconds for s in sessions if s.date >= week_start)
+    study = (
+        select(
+            StudySession.user_id,
+            func.total(StudySession.duration_seconds).label("total_seconds"),
+            func.count(func.distinct(StudySession.date)).label("study_days"),
+            func.total(StudySession.duration_seconds)
+            .filter(StudySession.date >= week_start)
+            .label("week_seconds"),
+        )
+        .group_by(StudySession.user_id)
+        .subquery()
+    )
+    mocks = (
+        select(
+            MockTest.user_id,
+            func.count(MockTest.id).label("mock_total"),
+            func.count(MockTest.id).filter(MockTest.attempted.is_(True)).label("mock_attempted"),
+            func.avg(MockTest.score)
+            .filter(MockTest.attempted.is_(True), MockTest.score.is_not(None))
+            .label("mock_average"),
+        )
+        .group_by(MockTest.user_id)
+        .subquery()
+    )
+    # Each topic contributes its subject's weight split evenly across the
+    # subject's topics, scaled by the same stage weights as
+    # compute_syllabus_progress.
+    topic_shares = (
+        select(
+            SyllabusTopic.subject_name,
+            (func.total(SyllabusTopic.weight) / func.count(SyllabusTopic.id)).label("topic_share"),
+        )
+        .group_by(SyllabusTopic.subject_name)
+        .subquery()
+    )
+    stage_points = (
+        case((UserSyllabusProgress.theory_completed.is_(True), 0.4), else_=0.0)
+        + case((UserSyllabusProgress.pyq_30_done.is_(True), 0.3), else_=0.0)
+        + case((UserSyllabusProgress.revision_1_done.is_(True), 0.2), else_=0.0)
+        + case((UserSyllabusProgress.revision_2_done.is_(True), 0.1), else_=0.0)
+    )
+    syllabus = (
+        select(
+            UserSyllabusProgress.user_id,
+            func.total(topic_shares.c.topic_share * stage_points).label("syllabus_completion"),
+        )
+        .join(SyllabusTopic, SyllabusTopic.id == UserSyllabusProgress.topic_id)
+        .join(topic_shares, topic_shares.c.subject_name == SyllabusTopic.subject_name)
+        .group_by(UserSyllabusProgress.user_id)
+        .subquery()
+    )
+    planner = (
+        select(
+            DailyTask.user_id,
+            func.count(DailyTask.id).filter(DailyTask.completed.is_(True)).label("planner_completed"),
+            func.count(DailyTask.id).label("planner_total"),
+        )
+        .where(DailyTask.date == today)
+        .group_by(DailyTask.user_id)
+        .subquery()
+    )
+    routine = (
+        select(
+            RoutineCompletion.user_id,
+            func.count(RoutineCompletion.id).label("routine_completed"),
+        )
+        .where(RoutineCompletion.date == today, RoutineCompletion.completed.is_(True))
+        .group_by(RoutineCompletion.user_id)
+        .subquery()
+    )
+    return (
+        select(
+            User.id,
+            User.username,
+            func.coalesce(study.c.total_seconds, 0),
+            func.coalesce(study.c.study_days, 0),
+            func.coalesce(study.c.week_seconds, 0),
+            func.coalesce(mocks.c.mock_total, 0),
+            func.coalesce(mocks.c.mock_attempted, 0),
+            mocks.c.mock_average,
+            func.coalesce(syllabus.c.syllabus_completion, 0),
+            func.coalesce(planner.c.planner_completed, 0),
+            func.coalesce(planner.c.planner_total, 0),
+            func.coalesce(routine.c.routine_completed, 0),
+        )
+        .outerjoin(study, study.c.user_id == User.id)
+        .outerjoin(mocks, mocks.c.user_id == User.id)
+        .outerjoin(syllabus, syllabus.c.user_id == User.id)
+        .outerjoin(planner, planner.c.user_id == User.id)
+        .outerjoin(routine, routine.c.user_id == User.id)
+        .order_by(User.id)
+    )
+
+
+def percentile(sorted_values: list[float], rank: float) -> float:
+    """Linearly interpolated percentile of an already sorted list."""
+
+    if not sorted_values:
+        return 0
+    position = (len(sorted_values) - 1) * rank / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return round(sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction, 2)
+
+
+def summarize_column(values: list[float]) -> dict[str, Any]:
+    ordered = sorted(values)
     return {
-        "today_hours": round(today_seconds / 3600, 2),
-        "week_hours": round(week_seconds / 3600, 2),
+        "mean": round(sum(ordered) / len(ordered), 2) if ordered else 0,
+        "min": ordered[0] if ordered else 0,
+        "max": ordered[-1] if ordered else 0,
+        "percentiles": {f"p{rank}": percentile(ordered, rank) for rank in COHORT_PERCENTILES},
     }
 
 
-def compute_syllabus_progress(user: User) -> dict[str, Any]:
-    topics = SyllabusTopic.query.order_by(SyllabusTopic.subject_name, SyllabusTopic.id).all()
+def compute_cohort_report(today: date | None = None) -> dict[str, Any]:
+    """Evaluate compute_analytics_summary's metrics for every user at once.
+
+    The per-user inputs come from one aggregate query; the formulas are then
+    applied column by column rather than per user object.
+    """
+
+    today = today or date.today()
+    router = get_shard_router()
+    rows: list[Row[Any]] = []
+    for shard in iter_shards():
+        statement = select_cohort_metrics(today)
+        if router is not None:
+            # Every shard sees all central users; keep the ones it owns.
+            statement = statement.where(User.id % router.count == shard)
+        rows.extend(db.session.execute(statement).all())
+    rows.sort(key=lambda row: row[0])
+    routine_total = db.session.scalar(select(func.count(RoutineTemplate.id))) or 0
+    (
+        user_ids,
+        usernames,
+        total_seconds,
+        study_days,
+        week_seconds,
+        mock_total,
+        mock_attempted,
+        mock_average,
+        syllabus_raw,
+        planner_completed,
+        planner_total,
+        routine_completed,
+    ) = (list(column) for column in zip(*rows)) if rows else ([] for _ in range(12))
+
+    total_hours = [round(seconds / 3600, 2) for seconds in total_seconds]
+    average_daily_hours = [
+        round(hours / days, 2) if days else 0 for hours, days in zip(total_hours, study_days)
+    ]
+    week_hours = [round(seconds / 3600, 2) for seconds in week_seconds]
+    productivity = [min(100, round(hours / 21 * 100, 1)) for hours in week_hours]
+    attempt_percent = [
+        round(attempted / total * 100, 1) if total else 0
+        for attempted, total in zip(mock_attempted, mock_total)
+    ]
+    average_score = [round(score, 2) if score is not None else 0 for score in mock_average]
+    normalized_score = [round(score / 200 * 100, 1) if score else 0 for score in average_score]
+    syllabus_completion = [round(value, 1) for value in syllabus_raw]
+    planner_percent = [
+        round(done / total * 100, 1) if total else 0
+        for done, total in zip(planner_completed, planner_total)
+    ]
+    routine_percent = [
+        round(done / routine_total * 100, 1) if routine_total else 0 for done in routine_completed
+    ]
+    predicted = [
+        round(0.4 * syllabus + 0.2 * attempts + 0.2 * normalized + 0.2 * productive, 1)
+        for syllabus, attempts, normalized, productive in zip(
+            syllabus_completion, attempt_percent, normalized_score, productivity
+        )
+    ]
+    confidence = [classify_confidence(score) for score in predicted]
+
+    distribution = [0] * 10
+    for score in predicted:
+        distribution[min(int(score // 10), 9)] += 1
+
+    def user_summary(index: int) -> dict[str, Any]:
+        return {
+            "user_id": user_ids[index],
+            "username": usernames[index],
+            "predicted_score": predicted[index],
+            "syllabus_completion": syllabus_completion[index],
+            "mock_test_attempt_percent": attempt_percent[index],
+            "week_hours": week_hours[index],
+        }
+
+    low_readiness = sorted(
+        (index for index, level in enumerate(confidence) if level == "Low"),
+        key=lambda index: predicted[index],
+    )
+    inactive = [index for index, hours in enumerate(week_hours) if hours == 0]
+
+    return {
+        "date": today.isoformat(),
+        "user_count": len(user_ids),
+        "metrics": {
+            "predicted_score": summarize_column(predicted),
+            "syllabus_completion": summarize_column(syllabus_completion),
+            "total_hours_studied": summarize_column(total_hours),
+            "average_daily_hours": summarize_column(average_daily_hours),
+            "mock_test_attempt_percent": summarize_column(attempt_percent),
+            "average_mock_score": summarize_column(average_score),
+            "productivity_index": summarize_column(productivity),
+            "daily_planner_completion_percent": summarize_column(planner_percent),
+            "routine_consistency_percent": summarize_column(routine_percent),
+        },
+        "predicted_score_distribution": [
+            {"range": f"{bucket * 10}-{bucket * 10 + 10}", "count": count}
+            for bucket, count in enumerate(distribution)
+        ],
+        "confidence_levels": {
+            level: confidence.count(level) for level in ("High", "Medium", "Low")
+        },
+        "at_risk": {
+            "low_readiness_count": len(low_readiness),
+            "low_readiness": [user_summary(index) for index in low_readiness[:COHORT_AT_RISK_LIMIT]],
+            "inactive_this_week_count": len(inactive),
+            "inactive_this_week": [user_summary(index) for index in inactive[:COHORT_AT_RISK_LIMIT]],
+        },
+    }
+
+
+def calculate_study_time_totals(user: User) -> dict[str, float]:
+    today = date.today()
+    week_start = today - timedelta(days=today.weekday())
+    today_seconds, week_seconds = db.session.execute(
+        select(
+            func.total(StudySession.duration_seconds).filter(StudySession.date == today),
+            func.total(StudySession.duration_seconds),
+        ).where(StudySession.user_id == user.id, StudySession.date >= week_start)
+    ).one()
+    return {
+        "today_hours": round(today_seconds / 3600, 2),
+        "week_hours": round(week_seconds / 3600, 2),
+    }
+
+
+@single_flight("syllabus_progress")
+def compute_syllabus_progress(user: User) -> dict[str, Any]:
+    topics = SyllabusTopic.query.order_by(SyllabusTopic.subject_name, SyllabusTopic.id).all()
     progress_items = UserSyllabusProgress.query.filter_by(user_id=user.id).all()
     progress_by_topic = {item.topic_id: item for item in progress_items}
     total = len(topics)
@@ -805,92 +2200,2578 @@ def compute_syllabus_progress(user: User) -> dict[str, Any]:
             }
         )
 
-    percentages = {
-        "theory_percent": round((counters["theory"] / total) * 100, 1) if total else 0,
-        "pyq_percent": round((counters["pyq"] / total) * 100, 1) if total else 0,
-        "revision_1_percent": round((counters["rev1"] / total) * 100, 1) if total else 0,
-        "revision_2_percent": round((counters["rev2"] / total) * 100, 1) if total else 0,
-    }
+    percentages = {
+        "theory_percent": round((counters["theory"] / total) * 100, 1) if total else 0,
+        "pyq_percent": round((counters["pyq"] / total) * 100, 1) if total else 0,
+        "revision_1_percent": round((counters["rev1"] / total) * 100, 1) if total else 0,
+        "revision_2_percent": round((counters["rev2"] / total) * 100, 1) if total else 0,
+    }
+
+    subject_meta: dict[str, dict[str, float | str]] = {}
+    for topic in topics:
+        if topic.subject_name not in subject_meta:
+            subject_meta[topic.subject_name] = {"unit_name": topic.unit_name, "weight": 0.0}
+        subject_meta[topic.subject_name]["weight"] = float(subject_meta[topic.subject_name]["weight"]) + float(topic.weight)
+
+    subject_breakdown = []
+    for subject_name, topics_list in grouped.items():
+        topic_count = len(topics_list)
+        if not topic_count:
+            continue
+        theory_pct = (sum(1 for t in topics_list if t["theory_completed"]) / topic_count) * 100
+        pyq_pct = (sum(1 for t in topics_list if t["pyq_30_done"]) / topic_count) * 100
+        rev1_pct = (sum(1 for t in topics_list if t["revision_1_done"]) / topic_count) * 100
+        rev2_pct = (sum(1 for t in topics_list if t["revision_2_done"]) / topic_count) * 100
+        progress_score = (
+            theory_pct * 0.4
+            + pyq_pct * 0.3
+            + rev1_pct * 0.2
+            + rev2_pct * 0.1
+        ) / 100
+        subject_weight = float(subject_meta.get(subject_name, {}).get("weight", SUBJECT_WEIGHTAGE.get(subject_name, 0)))
+        subject_contribution = progress_score * subject_weight
+        subject_breakdown.append(
+            {
+                "subject_name": subject_name,
+                "unit_name": str(subject_meta.get(subject_name, {}).get("unit_name", "Unknown Unit")),
+                "weight": subject_weight,
+                "theory_percent": round(theory_pct, 1),
+                "pyq_percent": round(pyq_pct, 1),
+                "revision_1_percent": round(rev1_pct, 1),
+                "revision_2_percent": round(rev2_pct, 1),
+                "progress_score": round(progress_score * 100, 1),
+                "contribution": round(subject_contribution, 2),
+            }
+        )
+
+    subject_breakdown.sort(key=lambda item: item["weight"], reverse=True)
+    weighted_total = sum(item["contribution"] for item in subject_breakdown)
+    final_score = min(200, round(20 + weighted_total, 2))
+
+    return {
+        "grouped_topics": grouped,
+        "total_topics": total,
+        "subject_breakdown": subject_breakdown,
+        "weighted_total": round(weighted_total, 2),
+        "final_score": final_score,
+        **percentages,
+    }
+
+
+def get_daily_study_hours(user: User, today: date, days: int) -> list[float]:
+    """Return study hours for each of the last ``days`` days, zeros included."""
+
+    start = today - timedelta(days=days - 1)
+    rows = db.session.execute(
+        select(StudySession.date, func.total(StudySession.duration_seconds))
+        .where(StudySession.user_id == user.id, StudySession.date.between(start, today))
+        .group_by(StudySession.date)
+    ).all()
+    seconds_by_day = {day: seconds for day, seconds in rows}
+    return [
+        seconds_by_day.get(start + timedelta(days=offset), 0) / 3600 for offset in range(days)
+    ]
+
+
+def pace_order(rates: list[float]) -> list[int]:
+    """Subject indexes in the order study hours go to them: fastest first."""
+
+    return sorted(range(len(rates)), key=lambda index: -rates[index])
+
+
+def fill_subject_gains(rates: list[float], caps: list[float], gain: float) -> list[float]:
+    """Split ``gain`` points across subjects in pace order, each up to its cap."""
+
+    gains = [0.0] * len(rates)
+    for index in pace_order(rates):
+        if gain <= 0:
+            break
+        if rates[index] <= 0:
+            continue
+        gains[index] = min(caps[index], gain)
+        gain -= gains[index]
+    return gains
+
+
+def simulate_score_projection(
+    *,
+    current_points: float,
+    subject_rates: list[float],
+    subject_caps: list[float],
+    daily_hours: list[float],
+    days_remaining: int,
+    trajectories: int,
+    seed: int,
+) -> list[float]:
+    """Return sorted projected final scores, one per simulated trajectory.
+
+    Each trajectory draws the total study hours until the exam and a study
+    efficiency multiplier. Summing ``days_remaining`` days resampled from
+    ``daily_hours`` is approximated by its normal limit, so a trajectory costs
+    two draws instead of one per day.
+
+    Hours go to subjects in pace order; subject ``i`` earns
+    ``subject_rates[i]`` points per hour until it reaches its unfinished
+    weight ``subject_caps[i]``, so gains flatten as the quick subjects finish.
+    """
+
+    base_score = 20 + current_points
+    order = [
+        index for index in pace_order(subject_rates)
+        if subject_rates[index] > 0 and subject_caps[index] > 0
+    ]
+    if days_remaining <= 0 or not order:
+        return [min(200.0, round(base_score, 2))] * trajectories
+
+    # Piecewise-linear gain curve: hours and points after finishing each
+    # subject in turn.
+    hour_marks = [0.0]
+    point_marks = [0.0]
+    for index in order:
+        hour_marks.append(hour_marks[-1] + subject_caps[index] / subject_rates[index])
+        point_marks.append(point_marks[-1] + subject_caps[index])
+    slopes = [subject_rates[index] for index in order]
+    finished_hours = hour_marks[-1]
+    all_points = point_marks[-1]
+
+    def gain(hours: float) -> float:
+        if hours >= finished_hours:
+            return all_points
+        segment = bisect.bisect_right(hour_marks, hours) - 1
+        return point_marks[segment] + (hours - hour_marks[segment]) * slopes[segment]
+
+    mean_hours = sum(daily_hours) / len(daily_hours)
+    variance = sum((hours - mean_hours) ** 2 for hours in daily_hours) / len(daily_hours)
+    hours_mean = mean_hours * days_remaining
+    hours_sd = (variance * days_remaining) ** 0.5
+    sigma = PROJECTION_EFFICIENCY_SIGMA
+    rng = random.Random(seed)
+    gauss = rng.gauss
+    lognormal = rng.lognormvariate
+    scores = [
+        min(
+            200.0,
+            base_score
+            + gain(max(0.0, gauss(hours_mean, hours_sd)) * lognormal(-sigma * sigma / 2, sigma)),
+        )
+        for _ in range(trajectories)
+    ]
+    scores.sort()
+    return scores
+
+
+def get_study_time_version(user: User) -> tuple[int, float]:
+    """Return the count and total seconds of the user's logged study sessions."""
+
+    count, total = db.session.execute(
+        select(func.count(StudySession.id), func.total(StudySession.duration_seconds)).where(
+            StudySession.user_id == user.id
+        )
+    ).one()
+    return count, total
+
+
+def compute_score_projection(user: User, exam_date: date, trajectories: int) -> dict[str, Any]:
+    """Project the final score distribution at ``exam_date`` from study pace and progress."""
+
+    today = date.today()
+    days_remaining = max(0, (exam_date - today).days)
+    syllabus = compute_syllabus_progress(user)
+    subjects = syllabus["subject_breakdown"]
+    topic_counts = [len(syllabus["grouped_topics"][item["subject_name"]]) for item in subjects]
+    shares = [item["progress_score"] / 100 for item in subjects]
+    current_points = sum(item["weight"] * share for item, share in zip(subjects, shares))
+    caps = [item["weight"] * (1 - share) for item, share in zip(subjects, shares)]
+    lifetime_hours = get_study_time_version(user)[1] / 3600
+    # Topics' worth of syllabus covered per study hour so far. A subject pays
+    # its weight spread over its topics, so its points per hour scale with
+    # weight per topic; without logged hours there is no pace to extrapolate
+    # and the projection stays at today's score.
+    covered_topics = sum(count * share for count, share in zip(topic_counts, shares))
+    topics_per_hour = covered_topics / lifetime_hours if lifetime_hours else 0
+    rates = [
+        topics_per_hour * item["weight"] / count for item, count in zip(subjects, topic_counts)
+    ]
+    daily_hours = get_daily_study_hours(user, today, PROJECTION_HISTORY_DAYS)
+
+    scores = simulate_score_projection(
+        current_points=current_points,
+        subject_rates=rates,
+        subject_caps=caps,
+        daily_hours=daily_hours,
+        days_remaining=days_remaining,
+        trajectories=trajectories,
+        seed=hash((user.id, user.progress_version, today.toordinal())),
+    )
+    median_gains = fill_subject_gains(
+        rates, caps, percentile(scores, 50) - 20 - current_points
+    )
+    return {
+        "exam_date": exam_date.isoformat(),
+        "days_remaining": days_remaining,
+        "trajectories": trajectories,
+        "current_score": min(200, round(20 + current_points, 2)),
+        "mean": round(sum(scores) / len(scores), 2),
+        "percentiles": {f"p{rank}": percentile(scores, rank) for rank in COHORT_PERCENTILES},
+        "max_possible": min(200, round(20 + current_points + sum(caps), 2)),
+        "inputs": {
+            "mean_daily_hours": round(sum(daily_hours) / len(daily_hours), 2),
+            "points_per_hour": round(current_points / lifetime_hours if lifetime_hours else 0, 3),
+            "remaining_points": round(sum(caps), 2),
+        },
+        "subjects": [
+            {
+                "subject_name": item["subject_name"],
+                "weight": item["weight"],
+                "points_per_hour": round(rate, 3),
+                "current_percent": item["progress_score"],
+                "projected_percent": round(
+                    item["progress_score"] + (gain / item["weight"] * 100 if item["weight"] else 0),
+                    1,
+                ),
+            }
+            for item, rate, gain in zip(subjects, rates, median_gains)
+        ],
+    }
+
+
+def load_score_projection(user: User, exam_date: date, trajectories: int) -> dict[str, Any]:
+    """Return the cached projection while the user's progress and study time are unchanged."""
+
+    projection_cache: FragmentCache = current_app.extensions["projection_cache"]
+    key = (
+        "projection",
+        user.id,
+        user.progress_version,
+        get_study_time_version(user),
+        date.today().isoformat(),
+        exam_date.isoformat(),
+        trajectories,
+    )
+    cached = projection_cache.get(key)
+    if cached is not None:
+        return json.loads(cached)
+    projection = compute_score_projection(user, exam_date, trajectories)
+    projection_cache.set(key, json.dumps(projection))
+    return projection
+
+
+def chain_priority(topic_weight: float, stages: tuple[tuple[str, str, float, float], ...]) -> float:
+    """Best points-per-hour ratio over any prefix of a topic's remaining stages.
+
+    Stages of one topic must run in order, so a low-yield stage that unlocks
+    high-yield ones is ranked by the whole prefix (Sidney's ratio rule).
+    """
+
+    best = points = hours = 0.0
+    for _, _, share, stage_hours in stages:
+        points += topic_weight * share
+        hours += stage_hours
+        best = max(best, points / hours)
+    return best
+
+
+def generate_study_plan(
+    topics: list[SyllabusTopic],
+    progress_by_topic: dict[int, UserSyllabusProgress],
+    start: date,
+    days: int,
+    tasks_per_day: int,
+) -> tuple[list[dict[str, Any]], int]:
+    """Schedule remaining syllabus stages over ``days`` days.
+
+    Greedy over a max-heap keyed by chain priority: each day takes the best
+    available stages up to ``tasks_per_day``, and a topic's next stage
+    becomes available the following day. Returns the per-day plan and the
+    number of stages that did not fit before the exam.
+    """
+
+    remaining: dict[int, tuple[tuple[str, str, float, float], ...]] = {}
+    topics_by_id = {topic.id: topic for topic in topics}
+    heap: list[tuple[float, int, int, int]] = []
+    for topic in topics:
+        progress = progress_by_topic.get(topic.id)
+        stages = tuple(
+            stage for stage in PLAN_STAGES if not (progress and getattr(progress, stage[0]))
+        )
+        if stages:
+            remaining[topic.id] = stages
+            heap.append((-chain_priority(topic.weight, stages), topic.id, 0, 0))
+    heapq.heapify(heap)
+
+    plan = []
+    for day_index in range(days):
+        items: list[dict[str, Any]] = []
+        not_ready = []
+        while heap and len(items) < tasks_per_day:
+            entry = heapq.heappop(heap)
+            _, topic_id, stage_index, available_day = entry
+            if available_day > day_index:
+                not_ready.append(entry)
+                continue
+            topic = topics_by_id[topic_id]
+            stages = remaining[topic_id]
+            field, label, share, hours = stages[stage_index]
+            items.append(
+                {
+                    "topic_id": topic_id,
+                    "topic_name": topic.topic_name,
+                    "subject_name": topic.subject_name,
+                    "stage": field,
+                    "title": f"{label}: {topic.topic_name}",
+                    "hours": hours,
+                    "points": round(topic.weight * share, 3),
+                }
+            )
+            if stage_index + 1 < len(stages):
+                heapq.heappush(
+                    heap,
+                    (
+                        -chain_priority(topic.weight, stages[stage_index + 1:]),
+                        topic_id,
+                        stage_index + 1,
+                        day_index + 1,
+                    ),
+                )
+        for entry in not_ready:
+            heapq.heappush(heap, entry)
+        plan.append({"date": (start + timedelta(days=day_index)).isoformat(), "items": items})
+
+    unscheduled = sum(len(remaining[topic_id]) - stage_index for _, topic_id, stage_index, _ in heap)
+    return plan, unscheduled
+
+
+def build_study_plan(user: User, setting: Setting, days: int | None = None) -> dict[str, Any]:
+    """Return the day-by-day plan from today until the day before the exam."""
+
+    today = date.today()
+    days_remaining = (setting.exam_date - today).days if setting.exam_date else 0
+    plan_days = min(days_remaining, PLAN_MAX_DAYS if days is None else days)
+    topics = SyllabusTopic.query.order_by(SyllabusTopic.id).all()
+    progress_by_topic = {
+        item.topic_id: item for item in UserSyllabusProgress.query.filter_by(user_id=user.id)
+    }
+    plan, unscheduled = generate_study_plan(
+        topics, progress_by_topic, today, max(plan_days, 0), setting.daily_goal or DEFAULT_DAILY_GOAL
+    )
+    scheduled = [item for day in plan for item in day["items"]]
+    return {
+        "exam_date": isoformat_or_none(setting.exam_date),
+        "days_remaining": max(days_remaining, 0),
+        "tasks_per_day": setting.daily_goal or DEFAULT_DAILY_GOAL,
+        "planned_hours": round(sum(item["hours"] for item in scheduled), 1),
+        "planned_points": round(sum(item["points"] for item in scheduled), 2),
+        "unscheduled_stages": unscheduled,
+        "days": plan,
+    }
+
+
+def apply_study_plan(user: User, plan: dict[str, Any]) -> list[DailyTask]:
+    """Add the plan's items as DailyTask rows, skipping titles already planned that day.
+
+    The caller commits.
+    """
+
+    if not plan["days"]:
+        return []
+    start = date.fromisoformat(plan["days"][0]["date"])
+    end = date.fromisoformat(plan["days"][-1]["date"])
+    existing = {
+        (row.date, row.title)
+        for row in db.session.execute(
+            select(DailyTask.date, DailyTask.title).where(
+                DailyTask.user_id == user.id, DailyTask.date.between(start, end)
+            )
+        )
+    }
+    created = [
+        DailyTask(user_id=user.id, title=item["title"], date=date.fromisoformat(day["date"]))
+        for day in plan["days"]
+        for item in day["items"]
+        if (date.fromisoformat(day["date"]), item["title"]) not in existing
+    ]
+    db.session.add_all(created)
+    return created
+
+
+def build_dashboard_context(user: User, active_route: str) -> dict[str, Any]:
+    task_streak = load_projection(user, "task_streak")
+    setting = get_or_create_settings(user)
+    target_exam = setting.exam_date.isoformat() if setting.exam_date else None
+    study_totals = calculate_study_time_totals(user)
+
+    return {
+        "syllabus": {k: v["topics"] for k, v in SYLLABUS.items()},
+        "active_route": active_route,
+        "user_id": user.id,
+        "event_seq": latest_event_id(user.id),
+        "study_streak": task_streak["streak"],
+        "total_tracked_minutes": task_streak["tracked_minutes"],
+        "target_exam": target_exam,
+        "countdown": calculate_countdown(setting.exam_date),
+        "today_hours": study_totals["today_hours"],
+        "week_hours": study_totals["week_hours"],
+    }
+
+
+class FragmentCache:
+    """Thread-safe LRU cache of rendered template fragments with a byte cap."""
+
+    def __init__(self, max_bytes: int = DEFAULT_FRAGMENT_CACHE_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: OrderedDict[tuple[Any, ...], tuple[str, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[Any, ...]) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: tuple[Any, ...], value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def discard(self, key: tuple[Any, ...]) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.current_bytes -= entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def get_syllabus_catalog_version() -> str:
+    """Return a cheap fingerprint of the shared syllabus topic catalog."""
+
+    count, max_id, total_weight = db.session.query(
+        func.count(SyllabusTopic.id),
+        func.max(SyllabusTopic.id),
+        func.total(SyllabusTopic.weight),
+    ).one()
+    return f"{count}:{max_id or 0}:{total_weight or 0}"
+
+
+def bump_progress_version(user: User) -> None:
+    """Mark the user's syllabus progress as changed; callers commit."""
+
+    user.progress_version = User.progress_version + 1
+
+
+def render_cached_fragment(
+    template_name: str,
+    user: User,
+    build_context: Callable[[User], dict[str, Any]],
+) -> Markup:
+    """Render a progress-dependent partial, reusing the cached HTML if valid."""
+
+    fragment_cache: FragmentCache = current_app.extensions["fragment_cache"]
+    key = (
+        template_name,
+        user.id,
+        user.progress_version,
+        get_syllabus_catalog_version(),
+    )
+    html = fragment_cache.get(key)
+    if html is None:
+        html = render_template(template_name, **build_context(user))
+        fragment_cache.set(key, html)
+    return Markup(html)
+
+
+def build_syllabus_partial_context(user: User) -> dict[str, Any]:
+    """Return the template context for the syllabus partial."""
+
+    syllabus_data = compute_syllabus_progress(user)
+    return {
+        "grouped_topics": syllabus_data["grouped_topics"],
+        "progress": {
+            "theory": syllabus_data["theory_percent"],
+            "pyq": syllabus_data["pyq_percent"],
+            "revision_1": syllabus_data["revision_1_percent"],
+            "revision_2": syllabus_data["revision_2_percent"],
+        },
+    }
+
+
+def build_subject_breakdown_context(user: User) -> dict[str, Any]:
+    """Return the template context for the subject breakdown cards."""
+
+    return {"subject_breakdown": compute_syllabus_progress(user)["subject_breakdown"]}
+
+
+def build_syllabus_view_context(user: User) -> dict[str, Any]:
+    """Return the rendered syllabus fragment for the syllabus view."""
+
+    return {
+        "syllabus_fragment": render_cached_fragment(
+            "partials/syllabus_content.html", user, build_syllabus_partial_context
+        )
+    }
+
+
+def build_score_predictor_view_context(user: User) -> dict[str, Any]:
+    """Return the template context for the score predictor partial."""
+
+    analytics_summary = load_analytics_summary(user)
+    return {
+        "subject_breakdown_fragment": render_cached_fragment(
+            "partials/subject_breakdown.html", user, build_subject_breakdown_context
+        ),
+        "predicted_score": analytics_summary["predicted_score"],
+        "category": analytics_summary["confidence_level"],
+        "initial_state": {"/api/analytics-summary": analytics_summary},
+    }
+
+
+# Views whose server-side fragment needs extra data; every other route only
+# needs the shared dashboard context. A builder may return ``initial_state``
+# with API payloads it already loaded, which the page embeds as they are.
+VIEW_CONTEXT_BUILDERS: dict[str, Callable[[User], dict[str, Any]]] = {
+    "syllabus": build_syllabus_view_context,
+    "score-predictor": build_score_predictor_view_context,
+}
+
+
+def build_default_deadlines_state(user: User) -> dict[str, Any]:
+    return build_upcoming_deadlines(
+        user.id, date.today(), DEADLINE_DEFAULT_DAYS, DASHBOARD_DEADLINE_FIELDS
+    )
+
+
+def build_default_planner_state(user: User) -> dict[str, Any]:
+    return build_daily_planner_payload(user, date.today())
+
+
+def build_default_mock_tests_state(user: User) -> dict[str, Any]:
+    seed_mock_tests_for_user(user)
+    return get_mock_test_stats(user)
+
+
+def build_default_heatmap_state(user: User) -> dict[str, Any]:
+    end = date.today()
+    return build_heatmap_payload(user, end - timedelta(days=HEATMAP_DEFAULT_DAYS - 1), end)
+
+
+def build_default_analytics_state(user: User) -> dict[str, Any]:
+    return load_analytics_summary(user)
+
+
+# API responses app.js would fetch right after loading each view, keyed by the
+# exact URL it requests. The page embeds them so the first paint needs no
+# extra round trip; the client consumes each entry once, and later
+# navigation or resyncs go back to the API.
+INITIAL_STATE_BUILDERS: dict[str, dict[str, Callable[[User], Any]]] = {
+    "dashboard": {
+        "/api/tasks/upcoming?fields=" + ",".join(DASHBOARD_DEADLINE_FIELDS): (
+            build_default_deadlines_state
+        ),
+    },
+    "plan": {"/api/daily-planner": build_default_planner_state},
+    "routine": {"/api/daily-routine": build_daily_routine_payload},
+    "tests": {"/api/mock-tests": build_default_mock_tests_state},
+    "analytics": {
+        "/api/analytics-summary": build_default_analytics_state,
+        "/api/analytics/heatmap": build_default_heatmap_state,
+    },
+    "score-predictor": {"/api/analytics-summary": build_default_analytics_state},
+}
+
+
+def build_initial_state(
+    user: User, active_route: str, loaded: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    """Return the embedded API payloads for ``active_route``.
+
+    Payloads in ``loaded`` were already built for the view and are reused.
+    """
+
+    state = dict(loaded or {})
+    for url, build in INITIAL_STATE_BUILDERS.get(active_route, {}).items():
+        if url not in state:
+            state[url] = build(user)
+    return state
+
+
+def get_month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def get_next_month_start(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def compute_heatmap_days(user_id: int, start: date, end: date) -> dict[str, dict[str, int]]:
+    """Aggregate study, planner and routine activity per day, inclusive of both ends.
+
+    Only days with some activity are returned, keyed by ISO date.
+    """
+
+    days: dict[str, dict[str, int]] = {}
+
+    def entry(day: date) -> dict[str, int]:
+        return days.setdefault(
+            day.isoformat(),
+            {"study_seconds": 0, "planner_completed": 0, "planner_total": 0, "routine_completed": 0},
+        )
+
+    study_rows = db.session.execute(
+        select(StudySession.date, func.sum(StudySession.duration_seconds))
+        .where(StudySession.user_id == user_id, StudySession.date.between(start, end))
+        .group_by(StudySession.date)
+    )
+    for day, seconds in study_rows:
+        entry(day)["study_seconds"] = int(seconds or 0)
+
+    planner_rows = db.session.execute(
+        select(
+            DailyTask.date,
+            func.count(DailyTask.id).filter(DailyTask.completed.is_(True)),
+            func.count(DailyTask.id),
+        )
+        .where(DailyTask.user_id == user_id, DailyTask.date.between(start, end))
+        .group_by(DailyTask.date)
+    )
+    for day, completed, total in planner_rows:
+        entry(day).update(planner_completed=completed, planner_total=total)
+
+    routine_rows = db.session.execute(
+        select(RoutineCompletion.date, func.count(RoutineCompletion.id))
+        .where(
+            RoutineCompletion.user_id == user_id,
+            RoutineCompletion.completed.is_(True),
+            RoutineCompletion.date.between(start, end),
+        )
+        .group_by(RoutineCompletion.date)
+    )
+    for day, completed in routine_rows:
+        entry(day)["routine_completed"] = completed
+
+    return days
+
+
+def get_heatmap_month(user_id: int, month_start: date, today: date) -> dict[str, dict[str, int]]:
+    """Return one month of heatmap activity, cached once the month is over.
+
+    Routine completions are only written for today, but a finished month can
+    still change: planner tasks may be back-dated, and a study session is
+    dated by the day its timer started, so a timer running past midnight
+    keeps adding to an earlier day. Those writers call
+    invalidate_heatmap_days for every month from the row's day to today. The
+    current month is always recomputed.
+    """
+
+    month_end = get_next_month_start(month_start) - timedelta(days=1)
+    if month_end >= get_month_start(today):
+        return compute_heatmap_days(user_id, month_start, month_end)
+
+    heatmap_cache: FragmentCache = current_app.extensions["heatmap_cache"]
+    key = ("heatmap", user_id, month_start.isoformat())
+    cached = heatmap_cache.get(key)
+    if cached is not None:
+        return json.loads(cached)
+    days = compute_heatmap_days(user_id, month_start, month_end)
+    heatmap_cache.set(key, json.dumps(days))
+    return days
+
+
+def invalidate_heatmap_day(user: User, day: date) -> None:
+    """Drop the cached heatmap month containing ``day`` once the write commits."""
+
+    invalidate_heatmap_days(user.id, day, day)
+
+
+def invalidate_heatmap_days(user_id: int, first: date, last: date) -> None:
+    """Drop every cached heatmap month from ``first`` to ``last`` once the write commits."""
+
+    month_start = get_month_start(first)
+    while month_start <= last:
+        defer_side_effect("heatmap.invalidate", user_id=user_id, day=month_start.isoformat())
+        month_start = get_next_month_start(month_start)
+
+
+def build_heatmap_payload(user: User, start: date, end: date) -> dict[str, Any]:
+    """Return the heatmap days plus the routine total, as served by the API."""
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "routine_total": db.session.scalar(select(func.count(RoutineTemplate.id))),
+        "days": build_heatmap(user, start, end),
+    }
+
+
+def build_heatmap(user: User, start: date, end: date) -> list[dict[str, Any]]:
+    """Return one entry per day from ``start`` to ``end`` for a calendar heatmap."""
+
+    today = date.today()
+    activity: dict[str, dict[str, int]] = {}
+    month_start = get_month_start(start)
+    while month_start <= end:
+        activity.update(get_heatmap_month(user.id, month_start, today))
+        month_start = get_next_month_start(month_start)
+
+    empty = {"study_seconds": 0, "planner_completed": 0, "planner_total": 0, "routine_completed": 0}
+    return [
+        {"date": day.isoformat(), **activity.get(day.isoformat(), empty)}
+        for day in (start + timedelta(days=offset) for offset in range((end - start).days + 1))
+    ]
+
+
+def collect_static_assets(static_dir: Path, output_dir: Path) -> dict[str, str]:
+    """Write content-hashed copies of static assets plus compressed variants.
+
+    Returns the manifest mapping each logical asset path (``js/app.js``) to its
+    fingerprinted path (``js/app.3f2a9c1d0b4e.js``) and also stores it as
+    ``manifest.json`` inside ``output_dir``.
+    """
+
+    manifest: dict[str, str] = {}
+    for source in sorted(static_dir.rglob("*")):
+        if not source.is_file() or source.suffix not in ASSET_EXTENSIONS:
+            continue
+        if output_dir in source.parents:
+            continue
+        content = source.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        logical_path = source.relative_to(static_dir).as_posix()
+        hashed_path = source.relative_to(static_dir).with_name(
+            f"{source.stem}.{digest}{source.suffix}"
+        )
+        target = output_dir / hashed_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+        target.with_name(target.name + ".gz").write_bytes(
+            gzip.compress(content, compresslevel=9, mtime=0)
+        )
+        if brotli is not None:
+            target.with_name(target.name + ".br").write_bytes(brotli.compress(content))
+        manifest[logical_path] = hashed_path.as_posix()
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    (output_dir / ASSET_MANIFEST_NAME).write_text(
+        json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8"
+    )
+    return manifest
+
+
+def get_asset_manifest() -> dict[str, str]:
+    """Return the collected asset manifest, or an empty one if not collected."""
+
+    manifest = current_app.extensions.get("asset_manifest")
+    if manifest is None:
+        manifest_path = Path(current_app.config["ASSET_OUTPUT_DIR"]) / ASSET_MANIFEST_NAME
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            manifest = {}
+        current_app.extensions["asset_manifest"] = manifest
+    return manifest
+
+
+def asset_url(filename: str) -> str:
+    """Template helper returning the fingerprinted URL for a static asset."""
+
+    hashed_path = get_asset_manifest().get(filename)
+    if hashed_path is None:
+        return url_for("static", filename=filename)
+    return url_for("serve_asset", filename=hashed_path)
+
+
+def iter_json_object(payload: dict[str, Any]) -> Iterator[str]:
+    """Encode ``payload`` as a JSON object piece by piece.
+
+    Iterator values (for example a generator of ``to_dict()`` results) are
+    written as JSON arrays one item at a time, so the full list is never
+    materialised in memory.
+    """
+
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    yield "{"
+    for index, (key, value) in enumerate(payload.items()):
+        if index:
+            yield ","
+        yield f"{encoder.encode(key)}:"
+        if isinstance(value, Iterator):
+            yield "["
+            for item_index, item in enumerate(value):
+                if item_index:
+                    yield ","
+                yield encoder.encode(item)
+            yield "]"
+        else:
+            yield from encoder.iterencode(value)
+    yield "}"
+
+
+def iter_buffered(chunks: Iterable[str], chunk_bytes: int) -> Iterator[bytes]:
+    """Group many small string chunks into byte blocks of about ``chunk_bytes``."""
+
+    buffer: list[bytes] = []
+    buffered = 0
+    for chunk in chunks:
+        encoded = chunk.encode("utf-8")
+        buffer.append(encoded)
+        buffered += len(encoded)
+        if buffered >= chunk_bytes:
+            yield b"".join(buffer)
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def stream_json_response(payload: dict[str, Any], status: int = 200) -> Response:
+    """Return a streamed JSON response for payloads with large list values.
+
+    Fetch rows before calling: an open cursor would keep a read transaction,
+    and the database lock with it, until a slow client has the whole body.
+    """
+
+    body = iter_buffered(iter_json_object(payload), JSON_STREAM_CHUNK_BYTES)
+    return Response(
+        stream_with_context(body), status=status, mimetype="application/json"
+    )
+
+
+def negotiate_content_encoding() -> str | None:
+    """Pick the best response content-coding the client accepts."""
+
+    for encoding in ("br", "gzip", "deflate"):
+        if encoding == "br" and brotli is None:
+            continue
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def make_compressor(
+    encoding: str, level: int
+) -> tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    """Return ``(compress, flush)`` callables for an HTTP content-coding."""
+
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=min(level, 11))
+        return compressor.process, compressor.finish
+    wbits = 31 if encoding == "gzip" else 15
+    deflater = zlib.compressobj(level, zlib.DEFLATED, wbits)
+    return deflater.compress, deflater.flush
+
+
+def iter_compressed(
+    chunks: Iterable[bytes | str], encoding: str, level: int
+) -> Iterator[bytes]:
+    """Compress a streamed response body without buffering it whole."""
+
+    compress, flush = make_compressor(encoding, level)
+    try:
+        for chunk in chunks:
+            data = compress(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def compress_response(response: Response) -> Response:
+    """Compress eligible responses using the negotiated content-coding."""
+
+    if (
+        request.method == "HEAD"
+        or response.direct_passthrough
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_content_encoding()
+    if encoding is None:
+        return response
+
+    level = current_app.config["COMPRESSION_LEVEL"]
+    if response.is_streamed:
+        response.response = iter_compressed(response.response, encoding, level)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < current_app.config["COMPRESSION_MIN_BYTES"]:
+            return response
+        compress, flush = make_compressor(encoding, level)
+        response.set_data(compress(body) + flush())
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+class EventBroker:
+    """In-process fan-out of per-user change events to SSE subscribers.
+
+    Each subscriber gets a bounded queue. A subscriber that falls behind has
+    its backlog dropped and receives a single ``resync`` event instead, so one
+    slow tab can never grow memory without bound.
+    """
+
+    def __init__(self, max_queue_size: int = DEFAULT_EVENT_QUEUE_SIZE) -> None:
+        self.max_queue_size = max_queue_size
+        self._subscribers: dict[int, set[queue.Queue[dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> queue.Queue[dict[str, Any]]:
+        subscriber: queue.Queue[dict[str, Any]] = queue.Queue(self.max_queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id: int, subscriber: queue.Queue[dict[str, Any]]) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def subscriber_count(self, user_id: int) -> int:
+        with self._lock:
+            return len(self._subscribers.get(user_id, ()))
+
+    def publish(self, user_id: int, event: dict[str, Any]) -> None:
+        self.dispatch(user_id, event)
+
+    def dispatch(self, user_id: int, event: dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                while True:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        break
+                subscriber.put_nowait(RESYNC_EVENT)
+
+    def close(self) -> None:
+        """Release background resources; the in-process broker has none."""
+
+
+class SQLiteEventRelay(EventBroker):
+    """Relay events between worker processes through a shared SQLite file.
+
+    A local stand-in for a pub/sub broker: ``publish`` appends to a shared
+    table and every worker polls it and dispatches new rows to its own
+    subscribers.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_queue_size: int = DEFAULT_EVENT_QUEUE_SIZE,
+        *,
+        poll_interval: float = 0.2,
+        retention_seconds: float = 300,
+    ) -> None:
+        super().__init__(max_queue_size)
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS event_relay ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+                "payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._last_id = connection.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM event_relay"
+            ).fetchone()[0]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._poll_loop, name="event-relay", daemon=True
+        )
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def publish(self, user_id: int, event: dict[str, Any]) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO event_relay (user_id, payload, created_at) VALUES (?, ?, ?)",
+                (user_id, json.dumps(event), time.time()),
+            )
+
+    def poll(self) -> None:
+        """Dispatch relay rows written since the last poll."""
+
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT id, user_id, payload FROM event_relay WHERE id > ? ORDER BY id",
+                (self._last_id,),
+            ).fetchall()
+            connection.execute(
+                "DELETE FROM event_relay WHERE created_at < ?",
+                (time.time() - self.retention_seconds,),
+            )
+        for row_id, user_id, payload in rows:
+            self._last_id = row_id
+            self.dispatch(user_id, json.loads(payload))
+
+    def _poll_loop(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except sqlite3.Error:
+                continue
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=self.poll_interval * 5)
+
+
+def create_event_broker(app: Flask) -> EventBroker:
+    relay_path = app.config.get("EVENT_RELAY_PATH")
+    if relay_path:
+        return SQLiteEventRelay(relay_path, app.config["EVENT_QUEUE_SIZE"])
+    return EventBroker(app.config["EVENT_QUEUE_SIZE"])
+
+
+def record_event(user_id: int, event_type: str, **data: Any) -> UserEvent:
+    """Append a change to the user's event log in the current transaction."""
+
+    logged = UserEvent(user_id=user_id, kind=event_type, data=json.dumps(data))
+    db.session.add(logged)
+    return logged
+
+
+def publish_event(user: User, event_type: str, **data: Any) -> None:
+    """Log a compact change event and publish it to the user's SSE streams
+    once the write commits.
+
+    Events carry absolute state and side-effect workers may deliver them out
+    of order, so each one carries its event-log id as ``seq``; clients ignore
+    anything older than what they have already applied.
+    """
+
+    logged = record_event(user.id, event_type, **data)
+    db.session.flush()
+    defer_side_effect(
+        "event.publish", user_id=user.id, event={"type": event_type, "seq": logged.id, **data}
+    )
+
+
+class Projection(abc.ABC):
+    """Read model folded from a user's event log.
+
+    ``snapshot`` builds the state from the current tables, for users whose
+    history predates the log; ``empty`` is the state before any event.
+    States must be JSON-serializable.
+    """
+
+    name = ""
+
+    @abc.abstractmethod
+    def empty(self) -> dict[str, Any]:
+        """Return the state before any event."""
+
+    @abc.abstractmethod
+    def snapshot(self, user_id: int) -> dict[str, Any]:
+        """Return the state built from the user's current rows."""
+
+    @abc.abstractmethod
+    def apply(self, state: dict[str, Any], kind: str, data: dict[str, Any]) -> None:
+        """Fold one event into ``state`` in place."""
+
+    def view(self, state: dict[str, Any]) -> dict[str, Any]:
+        return state
+
+
+PROJECTIONS: dict[str, Projection] = {}
+
+
+def projection(cls: type[Projection]) -> type[Projection]:
+    PROJECTIONS[cls.name] = cls()
+    return cls
+
+
+@projection
+class StudyDaysProjection(Projection):
+    """Seconds studied per day, with the number of study days and total hours.
+
+    ``session.logged`` events carry the seconds their write added to the
+    day's StudySession rows, so a timer's periodic flushes and its final stop
+    each log only their own increment.
+    """
+
+    name = "study_days"
+
+    def empty(self) -> dict[str, Any]:
+        return {"days": {}}
+
+    def snapshot(self, user_id: int) -> dict[str, Any]:
+        rows = db.session.execute(
+            select(StudySession.date, func.total(StudySession.duration_seconds))
+            .where(StudySession.user_id == user_id)
+            .group_by(StudySession.date)
+        )
+        return {"days": {day.isoformat(): int(seconds) for day, seconds in rows}}
+
+    def apply(self, state: dict[str, Any], kind: str, data: dict[str, Any]) -> None:
+        if kind == "session.logged" and data.get("date"):
+            days = state["days"]
+            days[data["date"]] = days.get(data["date"], 0) + data["duration_seconds"]
+
+    def view(self, state: dict[str, Any]) -> dict[str, Any]:
+        days = state["days"]
+        return {
+            "days": days,
+            # Every StudySession row holds at least a second, so a day in the
+            # log is a day with a row.
+            "study_days": len(days),
+            "total_hours": round(sum(days.values()) / 3600, 2),
+        }
+
+
+@projection
+class TaskStreakProjection(Projection):
+    """Streak of days with completed tasks, as ``calculate_study_streak`` counts it."""
+
+    name = "task_streak"
+
+    def empty(self) -> dict[str, Any]:
+        return {"tasks": {}}
+
+    def snapshot(self, user_id: int) -> dict[str, Any]:
+        rows = db.session.execute(
+            select(Task.id, Task.created_at, Task.completed).where(Task.user_id == user_id)
+        )
+        return {
+            "tasks": {
+                str(task_id): [created_at.date().isoformat(), completed]
+                for task_id, created_at, completed in rows
+            }
+        }
+
+    def apply(self, state: dict[str, Any], kind: str, data: dict[str, Any]) -> None:
+        if kind == "task.saved":
+            item = data["item"]
+            state["tasks"][str(item["id"])] = [item["created_at"][:10], item["completed"]]
+        elif kind == "task.deleted":
+            state["tasks"].pop(str(data["id"]), None)
+
+    def view(self, state: dict[str, Any]) -> dict[str, Any]:
+        completed_days = [day for day, completed in state["tasks"].values() if completed]
+        return {
+            "streak": count_streak(set(map(date.fromisoformat, completed_days)), date.today()),
+            "tracked_minutes": 45 * len(completed_days),
+        }
+
+
+@projection
+class MockStatsProjection(Projection):
+    """Attempt counts and scores across the user's mock tests."""
+
+    name = "mock_stats"
+
+    def empty(self) -> dict[str, Any]:
+        return {"tests": {}}
+
+    def snapshot(self, user_id: int) -> dict[str, Any]:
+        rows = db.session.execute(
+            select(MockTest.test_number, MockTest.attempted, MockTest.score).where(
+                MockTest.user_id == user_id
+            )
+        )
+        return {"tests": {str(number): [attempted, score] for number, attempted, score in rows}}
+
+    def apply(self, state: dict[str, Any], kind: str, data: dict[str, Any]) -> None:
+        if kind == "mock.seeded":
+            for number in data["test_numbers"]:
+                state["tests"].setdefault(str(number), [False, None])
+        elif kind == "mock.updated":
+            item = data["item"]
+            state["tests"][str(item["test_number"])] = [item["attempted"], item["score"]]
+
+    def view(self, state: dict[str, Any]) -> dict[str, Any]:
+        total = len(state["tests"])
+        attempted = [score for is_attempted, score in state["tests"].values() if is_attempted]
+        scores = [score for score in attempted if score is not None]
+        return {
+            "attempted_count": len(attempted),
+            "total_count": total,
+            "attempt_percent": round((len(attempted) / total) * 100, 1) if total else 0,
+            "average_score": round(sum(scores) / len(scores), 2) if scores else 0,
+            "best_score": round(max(scores), 2) if scores else 0,
+        }
+
+
+def fold_projection(user_id: int, name: str, *, from_scratch: bool = False) -> dict[str, Any]:
+    """Bring the user's snapshot of projection ``name`` up to date; returns its state.
+
+    The snapshot is advanced by the events appended since it was taken. A user
+    without a snapshot starts from the current tables, or, with
+    ``from_scratch``, from the empty state and the whole event log. Callers
+    commit.
+    """
+
+    projection = PROJECTIONS[name]
+    snapshot = db.session.get(ProjectionSnapshot, (user_id, name))
+    if from_scratch:
+        state, event_id = projection.empty(), 0
+    elif snapshot is None:
+        event_id = latest_event_id(user_id)
+        state = projection.snapshot(user_id)
+    else:
+        state, event_id = json.loads(snapshot.state), snapshot.event_id
+
+    events = db.session.execute(
+        select(UserEvent.id, UserEvent.kind, UserEvent.data)
+        .where(UserEvent.user_id == user_id, UserEvent.id > event_id)
+        .order_by(UserEvent.id)
+    ).all()
+    for event_id, kind, data in events:
+        projection.apply(state, kind, json.loads(data))
+
+    if snapshot is None:
+        snapshot = ProjectionSnapshot(user_id=user_id, name=name)
+        db.session.add(snapshot)
+    snapshot.state = json.dumps(state)
+    snapshot.event_id = event_id
+    return state
+
+
+def load_projection(user: User, name: str) -> dict[str, Any]:
+    """Serve projection ``name`` for the user, storing the advanced snapshot."""
+
+    state = fold_projection(user.id, name)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+    return PROJECTIONS[name].view(state)
+
+
+def format_sse(event: dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def refresh_analytics_snapshot(user: User) -> dict[str, Any]:
+    """Recompute and store the user's analytics summary; returns the summary."""
+
+    summary = compute_analytics_summary(user)
+    snapshot = db.session.get(AnalyticsSnapshot, user.id)
+    if snapshot is None:
+        snapshot = AnalyticsSnapshot(user_id=user.id)
+        db.session.add(snapshot)
+    snapshot.summary = json.dumps(summary)
+    snapshot.summary_date = date.today()
+    snapshot.computed_at = datetime.utcnow()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+    return summary
+
+
+@single_flight("analytics_summary")
+def load_analytics_summary(user: User) -> dict[str, Any]:
+    """Serve the user's analytics snapshot if it is recent enough.
+
+    Snapshots from an earlier day or older than ANALYTICS_SNAPSHOT_MAX_AGE_SECONDS
+    are not served; the summary is then computed live and stored.
+    """
+
+    snapshot = db.session.get(AnalyticsSnapshot, user.id)
+    max_age = timedelta(seconds=current_app.config["ANALYTICS_SNAPSHOT_MAX_AGE_SECONDS"])
+    if (
+        snapshot is not None
+        and snapshot.summary_date == date.today()
+        and datetime.utcnow() - snapshot.computed_at <= max_age
+    ):
+        return json.loads(snapshot.summary)
+    return refresh_analytics_snapshot(user)
+
+
+class AnalyticsScheduler:
+    """Recompute analytics snapshots on a background thread.
+
+    ``schedule`` is called after writes that affect analytics. Each call pushes
+    the user's deadline ``debounce_seconds`` into the future, so a burst of
+    writes costs one recompute. Every ``refresh_seconds`` the worker also
+    requeues users whose snapshot is older than that interval.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        *,
+        debounce_seconds: float = DEFAULT_ANALYTICS_DEBOUNCE_SECONDS,
+        refresh_seconds: float = DEFAULT_ANALYTICS_REFRESH_SECONDS,
+        autostart: bool = True,
+    ) -> None:
+        self.app = app
+        self.debounce_seconds = debounce_seconds
+        self.refresh_seconds = refresh_seconds
+        self._due: dict[int, float] = {}
+        self._next_sweep = time.monotonic() + refresh_seconds
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread: threading.Thread | None = None
+        if autostart:
+            self.start()
+
+    def start(self) -> None:
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="analytics-scheduler", daemon=True
+            )
+            self._thread.start()
+
+    def schedule(self, user_id: int) -> None:
+        with self._condition:
+            self._due[user_id] = time.monotonic() + self.debounce_seconds
+            self._condition.notify()
+
+    def pending(self) -> set[int]:
+        with self._condition:
+            return set(self._due)
+
+    def _pop_due(self, deadline: float) -> list[int]:
+        with self._condition:
+            due = [user_id for user_id, due_at in self._due.items() if due_at <= deadline]
+            for user_id in due:
+                del self._due[user_id]
+            return due
+
+    def _queue_stale_snapshots(self) -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=self.refresh_seconds)
+        stale_ids: list[int] = []
+        for _shard in iter_shards():
+            stale_ids.extend(
+                db.session.scalars(
+                    select(AnalyticsSnapshot.user_id).where(
+                        (AnalyticsSnapshot.computed_at < cutoff)
+                        | (AnalyticsSnapshot.summary_date < date.today())
+                    )
+                )
+            )
+        now = time.monotonic()
+        with self._condition:
+            for user_id in stale_ids:
+                self._due.setdefault(user_id, now)
+
+    def run_pending(self, *, force: bool = False) -> int:
+        """Recompute every due snapshot; ``force`` ignores debounce deadlines."""
+
+        with self.app.app_context():
+            if force or time.monotonic() >= self._next_sweep:
+                self._next_sweep = time.monotonic() + self.refresh_seconds
+                self._queue_stale_snapshots()
+            user_ids = self._pop_due(float("inf") if force else time.monotonic())
+            broker: EventBroker = self.app.extensions["event_broker"]
+            for user_id in user_ids:
+                user = db.session.get(User, user_id)
+                if user is None:
+                    continue
+                with use_user_shard(user_id):
+                    summary = refresh_analytics_snapshot(user)
+                broker.publish(user_id, {"type": "analytics.updated", "summary": summary})
+            db.session.remove()
+        return len(user_ids)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                wake_at = min([self._next_sweep, *self._due.values()])
+                timeout = wake_at - time.monotonic()
+                if timeout > 0:
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+            try:
+                self.run_pending()
+            except Exception:
+                self.app.logger.exception("Analytics snapshot refresh failed")
+
+    def close(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+def schedule_analytics_refresh(user: User) -> None:
+    """Queue a debounced snapshot recompute once the write commits."""
+
+    defer_side_effect("analytics.refresh", user_id=user.id)
+
+
+SIDE_EFFECT_HANDLERS: dict[str, Callable[..., None]] = {}
+
+
+def side_effect(kind: str) -> Callable[[Callable[..., None]], Callable[..., None]]:
+    """Register a handler for deferred side effects of ``kind``.
+
+    Handlers run at least once and may run again after a crash or a failed
+    attempt, so they must be idempotent.
+    """
+
+    def register(handler: Callable[..., None]) -> Callable[..., None]:
+        SIDE_EFFECT_HANDLERS[kind] = handler
+        return handler
+
+    return register
+
+
+@side_effect("event.publish")
+def run_event_publish(user_id: int, event: dict[str, Any]) -> None:
+    broker: EventBroker = current_app.extensions["event_broker"]
+    broker.publish(user_id, event)
+
+
+@side_effect("analytics.refresh")
+def run_analytics_refresh(user_id: int) -> None:
+    scheduler: AnalyticsScheduler = current_app.extensions["analytics_scheduler"]
+    scheduler.schedule(user_id)
+
+
+@side_effect("heatmap.invalidate")
+def run_heatmap_invalidate(user_id: int, day: str) -> None:
+    heatmap_cache: FragmentCache = current_app.extensions["heatmap_cache"]
+    month_start = get_month_start(date.fromisoformat(day))
+    heatmap_cache.discard(("heatmap", user_id, month_start.isoformat()))
+
+
+def defer_side_effect(kind: str, *, user_id: int, **payload: Any) -> None:
+    """Add a side effect to the current transaction; it runs after commit.
+
+    The outbox row lives in ``user_id``'s shard so it commits atomically with
+    the write that caused it.
+    """
+
+    db.session.add(
+        OutboxTask(user_id=user_id, kind=kind, payload=json.dumps({"user_id": user_id, **payload}))
+    )
+
+
+# (shard index or None when unsharded, outbox task id); ids are per shard.
+OutboxRef = tuple[int | None, int]
+
+
+def outbox_ref(task: OutboxTask) -> OutboxRef:
+    router = get_shard_router()
+    return (router.shard_for_user(task.user_id) if router is not None else None, task.id)
+
+
+@event.listens_for(db.session, "after_flush")
+def collect_outbox_tasks(session: Session, flush_context: Any) -> None:
+    refs = [outbox_ref(obj) for obj in session.new if isinstance(obj, OutboxTask)]
+    if refs:
+        session.info.setdefault("outbox_task_refs", []).extend(refs)
+
+
+@event.listens_for(db.session, "after_commit")
+def submit_outbox_tasks(session: Session) -> None:
+    refs = session.info.pop("outbox_task_refs", None)
+    if refs and has_app_context():
+        side_effects: SideEffectQueue = current_app.extensions["side_effects"]
+        side_effects.submit(refs)
+
+
+@event.listens_for(db.session, "after_rollback")
+def discard_outbox_tasks(session: Session) -> None:
+    session.info.pop("outbox_task_refs", None)
+
+
+class SideEffectQueue:
+    """Run deferred side effects on a bounded worker pool.
+
+    Tasks live in the outbox table until a handler succeeds, so a restart or a
+    full in-memory queue only delays them: the periodic sweep requeues any
+    row still pending. Failed tasks are retried up to ``max_attempts`` times
+    and then kept as dead letters. With ``workers=0`` tasks run inline right
+    after the commit. Workers drain up to ``SIDE_EFFECT_BATCH_SIZE`` queued
+    tasks at a time and delete the finished ones with one commit per shard.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        *,
+        workers: int = DEFAULT_SIDE_EFFECT_WORKERS,
+        max_queue_size: int = DEFAULT_SIDE_EFFECT_QUEUE_SIZE,
+        sweep_seconds: float = DEFAULT_SIDE_EFFECT_SWEEP_SECONDS,
+        max_attempts: int = DEFAULT_SIDE_EFFECT_MAX_ATTEMPTS,
+    ) -> None:
+        self.app = app
+        self.sweep_seconds = sweep_seconds
+        self.max_attempts = max_attempts
+        self.counters = {"processed": 0, "failed": 0, "overflowed": 0}
+        self._queue: queue.Queue[OutboxRef] = queue.Queue(max_queue_size)
+        self._queued: set[OutboxRef] = set()
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+        self._stop = threading.Event()
+        self._started = False
+        self._threads = [
+            threading.Thread(target=self._work, name=f"side-effects-{index}", daemon=True)
+            for index in range(workers)
+        ]
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, refs: Iterable[OutboxRef]) -> None:
+        if not self._threads:
+            self.run_tasks(list(refs))
+            return
+        with self._lock:
+            for ref in refs:
+                if ref in self._queued:
+                    continue
+                try:
+                    self._queue.put_nowait(ref)
+                except queue.Full:
+                    # The row stays in the outbox and the next sweep picks it up.
+                    self.counters["overflowed"] += 1
+                    continue
+                self._queued.add(ref)
+
+    def run_tasks(self, refs: list[OutboxRef]) -> int:
+        """Run outbox tasks in id order, committing each shard's deletes at once."""
+
+        if not refs:
+            return 0
+        ids_by_shard: dict[int | None, list[int]] = {}
+        for shard, task_id in refs:
+            ids_by_shard.setdefault(shard, []).append(task_id)
+        with self.app.app_context():
+            try:
+                finished = 0
+                for shard, task_ids in ids_by_shard.items():
+                    with use_shard(shard):
+                        finished += self._run_shard_tasks(task_ids)
+                return finished
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._queued.difference_update(refs)
+
+    def _run_shard_tasks(self, task_ids: list[int]) -> int:
+        tasks = db.session.scalars(
+            select(OutboxTask)
+            .where(
+                OutboxTask.id.in_(task_ids),
+                OutboxTask.attempts < self.max_attempts,
+            )
+            .order_by(OutboxTask.id)
+        ).all()
+        finished: list[int] = []
+        failed = 0
+        for task in tasks:
+            try:
+                SIDE_EFFECT_HANDLERS[task.kind](**json.loads(task.payload))
+            except Exception as error:
+                task.attempts += 1
+                task.last_error = repr(error)[:500]
+                failed += 1
+                self.app.logger.exception("Side effect %s failed", task.kind)
+                continue
+            finished.append(task.id)
+        if finished:
+            db.session.execute(delete(OutboxTask).where(OutboxTask.id.in_(finished)))
+        db.session.commit()
+        with self._lock:
+            self.counters["processed"] += len(finished)
+            self.counters["failed"] += failed
+        return len(finished)
+
+    def sweep(self) -> int:
+        """Requeue outbox rows left by a restart, a full queue or a failure."""
+
+        refs: list[OutboxRef] = []
+        with self.app.app_context():
+            for shard in iter_shards():
+                task_ids = db.session.scalars(
+                    select(OutboxTask.id)
+                    .where(OutboxTask.attempts < self.max_attempts)
+                    .order_by(OutboxTask.id)
+                    .limit(self._queue.maxsize or None)
+                ).all()
+                refs.extend((shard, task_id) for task_id in task_ids)
+            db.session.remove()
+        self.submit(refs)
+        return len(refs)
+
+    def metrics(self) -> dict[str, int]:
+        pending = dead_letters = 0
+        with self.app.app_context():
+            for _shard in iter_shards():
+                shard_pending, shard_dead_letters = db.session.execute(
+                    select(
+                        func.count(OutboxTask.id).filter(OutboxTask.attempts < self.max_attempts),
+                        func.count(OutboxTask.id).filter(OutboxTask.attempts >= self.max_attempts),
+                    )
+                ).one()
+                pending += shard_pending
+                dead_letters += shard_dead_letters
+            db.session.remove()
+        with self._lock:
+            return {
+                "workers": len(self._threads),
+                "queue_depth": self._queue.qsize(),
+                "in_flight": len(self._queued),
+                "outbox_pending": pending,
+                "dead_letters": dead_letters,
+                **self.counters,
+            }
+
+    def _maybe_sweep(self) -> None:
+        with self._lock:
+            if time.monotonic() < self._next_sweep:
+                return
+            self._next_sweep = time.monotonic() + self.sweep_seconds
+        self.sweep()
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            try:
+                refs = [self._queue.get(timeout=self.sweep_seconds)]
+            except queue.Empty:
+                try:
+                    self._maybe_sweep()
+                except Exception:
+                    self.app.logger.exception("Side effect sweep failed")
+                continue
+            while len(refs) < SIDE_EFFECT_BATCH_SIZE:
+                try:
+                    refs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.run_tasks(refs)
+            except Exception:
+                self.app.logger.exception("Side effect tasks %s crashed", refs)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._started:
+            for thread in self._threads:
+                thread.join(timeout=self.sweep_seconds + 1)
+
+
+def heavy_request(view: Callable[..., Any]) -> Callable[..., Any]:
+    """Mark a view as a heavy aggregate for rate limiting and load shedding."""
+
+    view.route_class = "heavy"  # type: ignore[attr-defined]
+    return view
+
+
+def classify_request() -> str:
+    view = current_app.view_functions.get(request.endpoint or "")
+    route_class = getattr(view, "route_class", None)
+    if route_class is not None:
+        return route_class
+    return "write" if request.method in BATCH_METHODS else "read"
+
+
+class TokenBucketLimiter:
+    """In-process token buckets keyed by client and route class.
+
+    ``limits`` maps each route class to ``(rate, burst)``: a bucket holds at
+    most ``burst`` tokens and refills at ``rate`` tokens per second. A request
+    is charged its full cost, such as one token per batch operation. A cost
+    above ``burst`` could never be paid, so ``acquire`` raises ``ValueError``
+    and callers reject such requests before charging them. The limits are
+    best effort: ``SQLiteTokenBucketLimiter`` admits every request while its
+    file is locked or unavailable.
+    """
+
+    def __init__(self, limits: dict[str, tuple[float, float]]) -> None:
+        self.limits = limits
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def _take(
+        self, bucket: tuple[float, float] | None, route_class: str, cost: float, now: float
+    ) -> tuple[tuple[float, float], float]:
+        rate, burst = self.limits[route_class]
+        if cost > burst:
+            raise ValueError(f"cost {cost} exceeds the {route_class} burst of {burst}")
+        tokens, updated_at = bucket if bucket is not None else (burst, now)
+        tokens = min(burst, tokens + max(now - updated_at, 0) * rate)
+        if tokens >= cost:
+            return (tokens - cost, now), 0.0
+        return (tokens, now), (cost - tokens) / rate
+
+    def acquire(
+        self, key: str, route_class: str, cost: float = 1, now: float | None = None
+    ) -> float:
+        """Take ``cost`` tokens; returns 0 on success, else seconds until they refill."""
+
+        now = time.time() if now is None else now
+        bucket_key = f"{route_class}:{key}"
+        with self._lock:
+            bucket, retry_after = self._take(
+                self._buckets.get(bucket_key), route_class, cost, now
+            )
+            self._buckets[bucket_key] = bucket
+        return retry_after
+
+
+class SQLiteTokenBucketLimiter(TokenBucketLimiter):
+    """Token buckets in a SQLite file shared by the workers on one host.
+
+    Buckets are disposable, so the file runs in WAL mode without syncing and
+    each worker keeps one connection open. If the file is locked or
+    unavailable the limiter fails open and admits the request.
+    """
+
+    def __init__(self, path: str, limits: dict[str, tuple[float, float]]) -> None:
+        super().__init__(limits)
+        self.path = path
+        self._connection = sqlite3.connect(
+            path, timeout=1, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=OFF")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS rate_bucket ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def acquire(
+        self, key: str, route_class: str, cost: float = 1, now: float | None = None
+    ) -> float:
+        now = time.time() if now is None else now
+        bucket_key = f"{route_class}:{key}"
+        connection = self._connection
+        with self._lock:
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                row = connection.execute(
+                    "SELECT tokens, updated_at FROM rate_bucket WHERE key = ?", (bucket_key,)
+                ).fetchone()
+                bucket, retry_after = self._take(row, route_class, cost, now)
+                connection.execute(
+                    "INSERT INTO rate_bucket (key, tokens, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, "
+                    "updated_at = excluded.updated_at",
+                    (bucket_key, *bucket),
+                )
+                connection.execute("COMMIT")
+            except sqlite3.OperationalError:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                return 0.0
+            except BaseException:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                raise
+        return retry_after
+
+
+def create_rate_limiter(app: Flask) -> TokenBucketLimiter:
+    limiter_path = app.config.get("RATE_LIMIT_PATH")
+    if limiter_path:
+        return SQLiteTokenBucketLimiter(limiter_path, app.config["RATE_LIMITS"])
+    return TokenBucketLimiter(app.config["RATE_LIMITS"])
+
+
+class AdmissionGate:
+    """Cap requests in flight in this process, shedding heavy ones first.
+
+    Heavy requests are admitted only while fewer than ``heavy_share`` of
+    ``max_in_flight`` requests are running, so saturation turns away analytics
+    before it delays toggles and reads.
+    """
+
+    def __init__(self, max_in_flight: int, heavy_share: float) -> None:
+        self.max_in_flight = max_in_flight
+        self.heavy_limit = max(1, int(max_in_flight * heavy_share))
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_enter(self, route_class: str) -> bool:
+        limit = self.heavy_limit if route_class == "heavy" else self.max_in_flight
+        with self._lock:
+            if self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+# Long-lived streams and static files bypass admission control.
+ADMISSION_EXEMPT_ENDPOINTS = {"static", "serve_asset", "serve_service_worker", "stream_events"}
+
+
+def too_many_requests(message: str, retry_after: float) -> tuple[Response, int]:
+    response = jsonify({"error": message, "retry_after": math.ceil(retry_after)})
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response, 429
+
+
+# (queued at, user id, work, future) for one write handed to GroupCommitter.
+CommitUnit = tuple[float, int, Callable[[User], Any], Future[Any]]
+
+
+class GroupCommitter:
+    """Coalesce small writes from concurrent requests into shared commits.
+
+    ``run`` hands a unit of work to the committer thread and blocks until the
+    transaction containing it has committed. The thread takes the oldest unit,
+    collects whatever else arrives within ``max_latency_ms`` of it (up to
+    ``max_batch`` units), applies them in order and commits once. If a unit
+    raises, the batch is rolled back and its units are replayed in one
+    transaction each, so a failing write cannot take its neighbours down.
+    With shards, a batch is split by shard so each commit touches a single
+    shard. Until ``start`` is called, or with ``max_latency_ms=0``, work runs
+    inline in the caller's session and commits immediately.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        *,
+        max_latency_ms: float = DEFAULT_GROUP_COMMIT_MAX_LATENCY_MS,
+        max_batch: int = DEFAULT_GROUP_COMMIT_MAX_BATCH,
+    ) -> None:
+        self.app = app
+        self.max_latency = max_latency_ms / 1000
+        self.max_batch = max_batch
+        self.counters = {"commits": 0, "units": 0, "replayed": 0}
+        # ``close`` puts None to wake the committer thread.
+        self._queue: queue.Queue[CommitUnit | None] = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None or self.max_latency <= 0:
+                return
+            self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+            self._thread.start()
+
+    def run(self, user_id: int, work: Callable[[User], Any]) -> Any:
+        """Apply ``work(user)`` and return its result once it is committed.
+
+        ``work`` runs in the committer's session, so it must load what it
+        changes through ``db.session`` and return plain data, not ORM objects.
+        """
+
+        if self._thread is None:
+            user = db.session.get(User, user_id)
+            try:
+                result = work(user)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            return result
+        future: Future[Any] = Future()
+        self._queue.put((time.monotonic(), user_id, work, future))
+        try:
+            return future.result(timeout=GROUP_COMMIT_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            # A unit the committer has not picked up is dropped; one it is
+            # already applying will commit or fail shortly, so wait for that.
+            if future.cancel():
+                raise
+            return future.result()
+
+    def _apply(self, user_id: int, work: Callable[[User], Any]) -> Any:
+        user = db.session.get(User, user_id)
+        with use_user_shard(user_id):
+            result = work(user)
+            db.session.flush()
+        return result
+
+    def _commit(self, units: list[CommitUnit]) -> bool:
+        try:
+            results = [self._apply(user_id, work) for _, user_id, work, _ in units]
+            db.session.commit()
+        except Exception as error:
+            db.session.rollback()
+            if len(units) == 1:
+                units[0][3].set_exception(error)
+            return False
+        with self._lock:
+            self.counters["commits"] += 1
+            self.counters["units"] += len(units)
+        for (*_, future), result in zip(units, results):
+            future.set_result(result)
+        return True
+
+    def _next_batch(self) -> list[CommitUnit]:
+        first = self._queue.get(timeout=1)
+        if first is None:
+            return []
+        batch = [first]
+        deadline = first[0] + self.max_latency
+        while len(batch) < self.max_batch:
+            try:
+                unit = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if unit is None:
+                break
+            batch.append(unit)
+        # Units whose caller timed out were cancelled and must not be applied.
+        return [unit for unit in batch if unit[3].set_running_or_notify_cancel()]
+
+    def _by_shard(self, batch: list[CommitUnit]) -> list[list[CommitUnit]]:
+        router: ShardRouter | None = self.app.extensions.get("shard_router")
+        if router is None:
+            return [batch] if batch else []
+        groups: dict[int, list[CommitUnit]] = {}
+        for unit in batch:
+            groups.setdefault(router.shard_for_user(unit[1]), []).append(unit)
+        return list(groups.values())
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                batch = self._next_batch()
+            except queue.Empty:
+                continue
+            with self.app.app_context():
+                try:
+                    for units in self._by_shard(batch):
+                        if not self._commit(units) and len(units) > 1:
+                            with self._lock:
+                                self.counters["replayed"] += len(units)
+                            for unit in units:
+                                self._commit([unit])
+                except Exception:
+                    self.app.logger.exception("Group commit failed")
+                finally:
+                    db.session.remove()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=2)
+
+
+def commit_coalesced(user: User, work: Callable[[User], Any]) -> Any:
+    """Run a small write through the group committer; returns work's result."""
+
+    committer: GroupCommitter = current_app.extensions["group_commit"]
+    return committer.run(user.id, work)
+
+
+class StudyTimer:
+    """State of one user's study timer."""
+
+    __slots__ = (
+        "user_id",
+        "started_on",
+        "elapsed",
+        "running_since",
+        "last_seen",
+        "session_id",
+        "flushed",
+    )
+
+    def __init__(self, user_id: int, now: float) -> None:
+        self.user_id = user_id
+        self.started_on = date.today()
+        self.elapsed = 0.0
+        self.running_since: float | None = now
+        self.last_seen = now
+        self.session_id: int | None = None
+        # Seconds already written to the StudySession row.
+        self.flushed = 0
+
+    def seconds(self, now: float) -> int:
+        if self.running_since is None:
+            return int(self.elapsed)
+        return int(self.elapsed + max(now - self.running_since, 0))
+
+    def unlogged(self, seconds: int) -> int:
+        """Seconds that writing ``seconds`` adds to the StudySession row."""
+
+        return seconds - self.flushed if seconds >= 1 else 0
+
+    def resume(self, now: float) -> None:
+        if self.running_since is None:
+            self.running_since = now
+        self.last_seen = now
+
+    def pause(self, now: float) -> None:
+        if self.running_since is not None:
+            self.elapsed += max(now - self.running_since, 0)
+            self.running_since = None
+        self.last_seen = now
+
+    def to_dict(self, now: float) -> dict[str, Any]:
+        return {
+            "running": self.running_since is not None,
+            "elapsed_seconds": self.seconds(now),
+            "started_on": self.started_on.isoformat(),
+        }
+
 
-    subject_meta: dict[str, dict[str, float | str]] = {}
-    for topic in topics:
-        if topic.subject_name not in subject_meta:
-            subject_meta[topic.subject_name] = {"unit_name": topic.unit_name, "weight": 0.0}
-        subject_meta[topic.subject_name]["weight"] = float(subject_meta[topic.subject_name]["weight"]) + float(topic.weight)
+class StudyTimerTable:
+    """Study timers by user id, kept in this process's memory.
 
-    subject_breakdown = []
-    for subject_name, topics_list in grouped.items():
-        topic_count = len(topics_list)
-        if not topic_count:
-            continue
-        theory_pct = (sum(1 for t in topics_list if t["theory_completed"]) / topic_count) * 100
-        pyq_pct = (sum(1 for t in topics_list if t["pyq_30_done"]) / topic_count) * 100
-        rev1_pct = (sum(1 for t in topics_list if t["revision_1_done"]) / topic_count) * 100
-        rev2_pct = (sum(1 for t in topics_list if t["revision_2_done"]) / topic_count) * 100
-        progress_score = (
-            theory_pct * 0.4
-            + pyq_pct * 0.3
-            + rev1_pct * 0.2
-            + rev2_pct * 0.1
-        ) / 100
-        subject_weight = float(subject_meta.get(subject_name, {}).get("weight", SUBJECT_WEIGHTAGE.get(subject_name, 0)))
-        subject_contribution = progress_score * subject_weight
-        subject_breakdown.append(
-            {
-                "subject_name": subject_name,
-                "unit_name": str(subject_meta.get(subject_name, {}).get("unit_name", "Unknown Unit")),
-                "weight": subject_weight,
-                "theory_percent": round(theory_pct, 1),
-                "pyq_percent": round(pyq_pct, 1),
-                "revision_1_percent": round(rev1_pct, 1),
-                "revision_2_percent": round(rev2_pct, 1),
-                "progress_score": round(progress_score * 100, 1),
-                "contribution": round(subject_contribution, 2),
-            }
+    ``get`` and ``all`` return copies; ``update`` applies a change to a copy
+    and stores the result. ``writing`` serializes the writers that turn
+    timers into StudySession rows.
+    """
+
+    def __init__(self) -> None:
+        self._timers: dict[int, StudyTimer] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def get(self, user_id: int) -> StudyTimer | None:
+        with self._lock:
+            return copy.copy(self._timers.get(user_id))
+
+    def all(self) -> list[StudyTimer]:
+        with self._lock:
+            return [copy.copy(timer) for timer in self._timers.values()]
+
+    def update(
+        self, user_id: int, change: Callable[[StudyTimer | None], StudyTimer | None]
+    ) -> StudyTimer | None:
+        """Store ``change(timer)`` unless it returns None; returns the stored timer."""
+
+        with self._lock:
+            timer = change(copy.copy(self._timers.get(user_id)))
+            if timer is not None:
+                self._timers[user_id] = copy.copy(timer)
+            return timer
+
+    def record_flush(self, user_id: int, session_id: int | None, seconds: int) -> None:
+        with self._lock:
+            timer = self._timers.get(user_id)
+            if timer is not None:
+                timer.session_id = session_id
+                timer.flushed = seconds
+
+    def remove(self, user_id: int) -> None:
+        with self._lock:
+            self._timers.pop(user_id, None)
+
+    @contextmanager
+    def writing(self) -> Iterator[StudyTimerTable]:
+        """Hold the write lock while timers are written to StudySession.
+
+        A stop and a flush never race into creating two rows for one timer.
+        """
+
+        with self._write_lock:
+            yield self
+
+    def close(self) -> None:
+        """Release background resources; the in-memory table has none."""
+
+
+class SQLiteStudyTimerTable(StudyTimerTable):
+    """Study timers in a SQLite file shared by the workers on one host.
+
+    Each call is one transaction on a persistent connection. ``writing``
+    keeps a single ``BEGIN IMMEDIATE`` transaction open for the whole block,
+    so writers in other workers wait for it and the block's removals commit
+    only if it exits normally.
+    """
+
+    _COLUMNS = "user_id, started_on, elapsed, running_since, last_seen, session_id, flushed"
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        self._lock = threading.RLock()  # type: ignore[assignment]
+        self._connection = sqlite3.connect(
+            path, timeout=5, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS study_timer ("
+            "user_id INTEGER PRIMARY KEY, started_on TEXT NOT NULL, elapsed REAL NOT NULL, "
+            "running_since REAL, last_seen REAL NOT NULL, session_id INTEGER, "
+            "flushed INTEGER NOT NULL)"
         )
 
-    subject_breakdown.sort(key=lambda item: item["weight"], reverse=True)
-    weighted_total = sum(item["contribution"] for item in subject_breakdown)
-    final_score = min(200, round(20 + weighted_total, 2))
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            if self._connection.in_transaction:
+                yield self._connection
+                return
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    @staticmethod
+    def _from_row(row: tuple[Any, ...]) -> StudyTimer:
+        timer = StudyTimer.__new__(StudyTimer)
+        (
+            timer.user_id,
+            started_on,
+            timer.elapsed,
+            timer.running_since,
+            timer.last_seen,
+            timer.session_id,
+            timer.flushed,
+        ) = row
+        timer.started_on = date.fromisoformat(started_on)
+        return timer
+
+    def get(self, user_id: int) -> StudyTimer | None:
+        with self._transaction() as connection:
+            row = connection.execute(
+                f"SELECT {self._COLUMNS} FROM study_timer WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return self._from_row(row) if row is not None else None
+
+    def all(self) -> list[StudyTimer]:
+        with self._transaction() as connection:
+            rows = connection.execute(f"SELECT {self._COLUMNS} FROM study_timer").fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def update(
+        self, user_id: int, change: Callable[[StudyTimer | None], StudyTimer | None]
+    ) -> StudyTimer | None:
+        with self._transaction() as connection:
+            timer = change(self.get(user_id))
+            if timer is not None:
+                connection.execute(
+                    f"INSERT OR REPLACE INTO study_timer ({self._COLUMNS}) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        timer.user_id,
+                        timer.started_on.isoformat(),
+                        timer.elapsed,
+                        timer.running_since,
+                        timer.last_seen,
+                        timer.session_id,
+                        timer.flushed,
+                    ),
+                )
+            return timer
 
-    return {
-        "grouped_topics": grouped,
-        "total_topics": total,
-        "subject_breakdown": subject_breakdown,
-        "weighted_total": round(weighted_total, 2),
-        "final_score": final_score,
-        **percentages,
-    }
+    def record_flush(self, user_id: int, session_id: int | None, seconds: int) -> None:
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE study_timer SET session_id = ?, flushed = ? WHERE user_id = ?",
+                (session_id, seconds, user_id),
+            )
 
+    def remove(self, user_id: int) -> None:
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM study_timer WHERE user_id = ?", (user_id,))
 
-def build_dashboard_context(user: User, active_route: str) -> dict[str, Any]:
-    tasks = Task.query.filter_by(user_id=user.id).all()
-    setting = get_or_create_settings(user)
-    total_tracked_minutes = sum(45 for task in tasks if task.completed)
-    target_exam = setting.exam_date.isoformat() if setting.exam_date else None
-    study_totals = calculate_study_time_totals(user)
+    @contextmanager
+    def writing(self) -> Iterator[StudyTimerTable]:
+        with self._transaction():
+            yield self
 
-    return {
-        "syllabus": {k: v["topics"] for k, v in SYLLABUS.items()},
-        "active_route": active_route,
-        "study_streak": calculate_study_streak(tasks),
-        "total_tracked_minutes": total_tracked_minutes,
-        "target_exam": target_exam,
-        "countdown": calculate_countdown(setting.exam_date),
-        "today_hours": study_totals["today_hours"],
-        "week_hours": study_totals["week_hours"],
-    }
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def create_study_timer_table(app: Flask) -> StudyTimerTable:
+    store_path = app.config.get("TIMER_STORE_PATH")
+    if store_path:
+        return SQLiteStudyTimerTable(store_path)
+    return StudyTimerTable()
+
+
+def save_timer_session(timer: StudyTimer, seconds: int) -> int | None:
+    """Write the timer's duration to its StudySession row; callers commit."""
+
+    if seconds < 1:
+        return timer.session_id
+    study_session = (
+        db.session.get(StudySession, timer.session_id) if timer.session_id is not None else None
+    )
+    if study_session is None:
+        study_session = StudySession(
+            user_id=timer.user_id, duration_seconds=seconds, date=timer.started_on
+        )
+        db.session.add(study_session)
+    else:
+        study_session.duration_seconds = seconds
+    db.session.flush()
+    return study_session.id
+
+
+class StudyTimerRegistry:
+    """Server-side study timers kept in a timer table and flushed to StudySession.
+
+    Start, pause and heartbeat only touch the table, which lives in process
+    memory or, with ``TIMER_STORE_PATH`` set, in a SQLite file shared by the
+    workers. Every ``flush_seconds`` the worker writes each timer's elapsed
+    time to its StudySession row in one transaction and closes timers whose
+    last heartbeat is older than ``stale_seconds``, counting time only up to
+    that heartbeat. Stopping a timer writes its final duration. A timer
+    leaves the table only after its final write commits.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        table: StudyTimerTable | None = None,
+        *,
+        flush_seconds: float = DEFAULT_TIMER_FLUSH_SECONDS,
+        stale_seconds: float = DEFAULT_TIMER_STALE_SECONDS,
+    ) -> None:
+        self.app = app
+        self.table = table if table is not None else StudyTimerTable()
+        self.flush_seconds = flush_seconds
+        self.stale_seconds = stale_seconds
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="study-timers", daemon=True)
+            self._thread.start()
+
+    def get(self, user_id: int, now: float | None = None) -> dict[str, Any] | None:
+        now = time.time() if now is None else now
+        timer = self.table.get(user_id)
+        return timer.to_dict(now) if timer is not None else None
+
+    def start_timer(self, user_id: int, now: float | None = None) -> dict[str, Any]:
+        """Start a new timer or resume a paused one."""
+
+        now = time.time() if now is None else now
+
+        def start(timer: StudyTimer | None) -> StudyTimer:
+            if timer is None:
+                return StudyTimer(user_id, now)
+            timer.resume(now)
+            return timer
+
+        timer = self.table.update(user_id, start)
+        assert timer is not None
+        return timer.to_dict(now)
+
+    def pause(self, user_id: int, now: float | None = None) -> dict[str, Any] | None:
+        now = time.time() if now is None else now
+
+        def pause(timer: StudyTimer | None) -> StudyTimer | None:
+            if timer is not None:
+                timer.pause(now)
+            return timer
+
+        timer = self.table.update(user_id, pause)
+        return timer.to_dict(now) if timer is not None else None
+
+    def heartbeat(self, user_id: int, now: float | None = None) -> bool:
+        now = time.time() if now is None else now
+
+        def beat(timer: StudyTimer | None) -> StudyTimer | None:
+            if timer is not None:
+                timer.last_seen = now
+            return timer
+
+        return self.table.update(user_id, beat) is not None
+
+    @contextmanager
+    def stopping(
+        self, user_id: int, now: float | None = None
+    ) -> Iterator[tuple[StudyTimer, int] | None]:
+        """Yield the user's timer with its final seconds, or None without one.
+
+        Write the final duration inside the block. The timer is removed when
+        the block exits normally and kept running if the write raises.
+        """
+
+        now = time.time() if now is None else now
+        with self.table.writing() as table:
+            timer = table.get(user_id)
+            if timer is None:
+                yield None
+                return
+            yield timer, timer.seconds(now)
+            table.remove(user_id)
+
+    def flush(self, now: float | None = None) -> int:
+        """Write advanced timers and close stale ones; returns rows written."""
+
+        now = time.time() if now is None else now
+        with self.table.writing() as table:
+            stale_before = now - self.stale_seconds
+            pending: list[tuple[StudyTimer, int, bool]] = []
+            for timer in table.all():
+                if timer.last_seen < stale_before:
+                    # The final duration may undo time flushed after the
+                    # last heartbeat.
+                    pending.append((timer, timer.seconds(timer.last_seen), True))
+                elif (seconds := timer.seconds(now)) > timer.flushed:
+                    pending.append((timer, seconds, False))
+            if not pending:
+                return 0
+            with self.app.app_context():
+                try:
+                    session_ids = []
+                    for timer, seconds, closed in pending:
+                        with use_user_shard(timer.user_id):
+                            session_ids.append(save_timer_session(timer, seconds))
+                            defer_side_effect("analytics.refresh", user_id=timer.user_id)
+                            if logged := timer.unlogged(seconds):
+                                record_event(
+                                    timer.user_id,
+                                    "session.logged",
+                                    duration_seconds=logged,
+                                    date=timer.started_on.isoformat(),
+                                )
+                                invalidate_heatmap_days(
+                                    timer.user_id, timer.started_on, date.today()
+                                )
+                            db.session.flush()
+                    db.session.commit()
+                finally:
+                    db.session.remove()
+            for (timer, seconds, closed), session_id in zip(pending, session_ids):
+                if closed:
+                    table.remove(timer.user_id)
+                else:
+                    table.record_flush(timer.user_id, session_id, seconds)
+        return len(pending)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception("Study timer flush failed")
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self.table.close()
+
+
+def stop_background_workers(app: Flask) -> None:
+    """Stop the threads ``create_app`` and the first request started."""
+
+    app.extensions["analytics_scheduler"].close()
+    app.extensions["side_effects"].close()
+    app.extensions["group_commit"].close()
+    app.extensions["study_timers"].close()
+    app.extensions["event_broker"].close()
 
 
-def create_app() -> Flask:
+def create_app(config: dict[str, Any] | None = None) -> Flask:
     app = Flask(__name__)
     app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DB_PATH}"
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["SECRET_KEY"] = "dev-secret-key"
     app.config["ADMIN_USERNAME"] = os.environ.get("ADMIN_USERNAME", "admin")
     app.config["ADMIN_PASSWORD"] = os.environ.get("ADMIN_PASSWORD", "admin123")
+    app.config["FRAGMENT_CACHE_MAX_BYTES"] = DEFAULT_FRAGMENT_CACHE_MAX_BYTES
+    app.config["HEATMAP_CACHE_MAX_BYTES"] = DEFAULT_HEATMAP_CACHE_MAX_BYTES
+    app.config["PROJECTION_CACHE_MAX_BYTES"] = DEFAULT_PROJECTION_CACHE_MAX_BYTES
+    app.config["ASSET_OUTPUT_DIR"] = str(ASSET_OUTPUT_DIR)
+    app.config["COMPRESSION_MIN_BYTES"] = DEFAULT_COMPRESSION_MIN_BYTES
+    app.config["COMPRESSION_LEVEL"] = DEFAULT_COMPRESSION_LEVEL
+    app.config["EVENT_QUEUE_SIZE"] = DEFAULT_EVENT_QUEUE_SIZE
+    app.config["EVENT_KEEPALIVE_SECONDS"] = DEFAULT_EVENT_KEEPALIVE_SECONDS
+    app.config["EVENT_RELAY_PATH"] = os.environ.get("EVENT_RELAY_PATH")
+    app.config["ANALYTICS_SCHEDULER_ENABLED"] = True
+    app.config["SIDE_EFFECT_WORKERS"] = DEFAULT_SIDE_EFFECT_WORKERS
+    app.config["SIDE_EFFECT_QUEUE_SIZE"] = DEFAULT_SIDE_EFFECT_QUEUE_SIZE
+    app.config["SIDE_EFFECT_SWEEP_SECONDS"] = DEFAULT_SIDE_EFFECT_SWEEP_SECONDS
+    app.config["SIDE_EFFECT_MAX_ATTEMPTS"] = DEFAULT_SIDE_EFFECT_MAX_ATTEMPTS
+    app.config["ANALYTICS_DEBOUNCE_SECONDS"] = DEFAULT_ANALYTICS_DEBOUNCE_SECONDS
+    app.config["ANALYTICS_REFRESH_SECONDS"] = DEFAULT_ANALYTICS_REFRESH_SECONDS
+    app.config["ANALYTICS_SNAPSHOT_MAX_AGE_SECONDS"] = DEFAULT_ANALYTICS_SNAPSHOT_MAX_AGE_SECONDS
+    app.config["GROUP_COMMIT_MAX_LATENCY_MS"] = DEFAULT_GROUP_COMMIT_MAX_LATENCY_MS
+    app.config["GROUP_COMMIT_MAX_BATCH"] = DEFAULT_GROUP_COMMIT_MAX_BATCH
+    app.config["RATE_LIMIT_ENABLED"] = True
+    app.config["RATE_LIMITS"] = dict(DEFAULT_RATE_LIMITS)
+    app.config["RATE_LIMIT_PATH"] = os.environ.get("RATE_LIMIT_PATH")
+    app.config["TIMER_STORE_PATH"] = os.environ.get("TIMER_STORE_PATH")
+    app.config["ADMISSION_MAX_IN_FLIGHT"] = DEFAULT_ADMISSION_MAX_IN_FLIGHT
+    app.config["ADMISSION_HEAVY_SHARE"] = DEFAULT_ADMISSION_HEAVY_SHARE
+    app.config["TIMER_FLUSH_SECONDS"] = DEFAULT_TIMER_FLUSH_SECONDS
+    app.config["TIMER_STALE_SECONDS"] = DEFAULT_TIMER_STALE_SECONDS
+    app.config["SHARD_COUNT"] = int(os.environ.get("SHARD_COUNT", 0))
+    app.config["SHARD_DIRECTORY"] = os.environ.get("SHARD_DIRECTORY", str(BASE_DIR / "shards"))
+    if config:
+        app.config.update(config)
     db.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, directory=os.path.join(app.root_path, "migrations"))
+    app.extensions["shard_router"] = (
+        ShardRouter(
+            Path(app.config["SHARD_DIRECTORY"]),
+            app.config["SHARD_COUNT"],
+            make_url(app.config["SQLALCHEMY_DATABASE_URI"]).database,
+        )
+        if app.config["SHARD_COUNT"] > 0
+        else None
+    )
+    app.extensions["fragment_cache"] = FragmentCache(
+        app.config["FRAGMENT_CACHE_MAX_BYTES"]
+    )
+    app.extensions["heatmap_cache"] = FragmentCache(
+        app.config["HEATMAP_CACHE_MAX_BYTES"]
+    )
+    app.extensions["projection_cache"] = FragmentCache(
+        app.config["PROJECTION_CACHE_MAX_BYTES"]
+    )
+
+    app.extensions["event_broker"] = create_event_broker(app)
+    app.extensions["single_flight"] = SingleFlight()
+    app.extensions["rate_limiter"] = create_rate_limiter(app)
+    app.extensions["admission_gate"] = AdmissionGate(
+        app.config["ADMISSION_MAX_IN_FLIGHT"], app.config["ADMISSION_HEAVY_SHARE"]
+    )
+    app.extensions["analytics_scheduler"] = AnalyticsScheduler(
+        app,
+        debounce_seconds=app.config["ANALYTICS_DEBOUNCE_SECONDS"],
+        refresh_seconds=app.config["ANALYTICS_REFRESH_SECONDS"],
+        autostart=False,
+    )
+    app.extensions["side_effects"] = SideEffectQueue(
+        app,
+        workers=app.config["SIDE_EFFECT_WORKERS"],
+        max_queue_size=app.config["SIDE_EFFECT_QUEUE_SIZE"],
+        sweep_seconds=app.config["SIDE_EFFECT_SWEEP_SECONDS"],
+        max_attempts=app.config["SIDE_EFFECT_MAX_ATTEMPTS"],
+    )
+    app.extensions["group_commit"] = GroupCommitter(
+        app,
+        max_latency_ms=app.config["GROUP_COMMIT_MAX_LATENCY_MS"],
+        max_batch=app.config["GROUP_COMMIT_MAX_BATCH"],
+    )
+    app.extensions["study_timers"] = StudyTimerRegistry(
+        app,
+        create_study_timer_table(app),
+        flush_seconds=app.config["TIMER_FLUSH_SECONDS"],
+        stale_seconds=app.config["TIMER_STALE_SECONDS"],
+    )
+    app.add_template_global(asset_url)
+    app.after_request(compress_response)
+
+    @app.cli.command("collect-assets")
+    def collect_assets_command() -> None:
+        """Fingerprint and precompress static assets into ASSET_OUTPUT_DIR."""
+
+        manifest = collect_static_assets(
+            Path(app.static_folder or STATIC_DIR), Path(app.config["ASSET_OUTPUT_DIR"])
+        )
+        app.extensions.pop("asset_manifest", None)
+        for logical_path, hashed_path in manifest.items():
+            click.echo(f"{logical_path} -> {hashed_path}")
+
+    @app.cli.command("init-shards")
+    def init_shards_command() -> None:
+        """Create new shards and upgrade every shard to the head revision."""
+
+        router = app.extensions["shard_router"]
+        if router is None:
+            click.echo("Sharding is disabled (SHARD_COUNT=0).")
+            return
+        router.create_all()
+        upgrade_database(directory=get_migrations_directory())
+        click.echo(f"Initialized {router.count} shards in {app.config['SHARD_DIRECTORY']}.")
+
+    @app.cli.command("rebuild-projections")
+    @click.option("--name", "names", multiple=True, help="Projection to rebuild; defaults to all.")
+    @click.option(
+        "--from-scratch",
+        is_flag=True,
+        help="Replay each user's whole event log instead of advancing stored snapshots.",
+    )
+    def rebuild_projections_command(names: tuple[str, ...], from_scratch: bool) -> None:
+        """Fold the event log into projection snapshots for every user."""
+
+        unknown = set(names) - set(PROJECTIONS)
+        if unknown:
+            raise click.BadParameter(f"unknown projections: {', '.join(sorted(unknown))}")
+        total = 0
+        for _shard in iter_shards():
+            user_ids = db.session.scalars(
+                select(UserEvent.user_id).union(select(ProjectionSnapshot.user_id))
+            ).all()
+            for user_id in user_ids:
+                for name in names or PROJECTIONS:
+                    fold_projection(user_id, name, from_scratch=from_scratch)
+                    total += 1
+                db.session.commit()
+        click.echo(f"Rebuilt {total} projection snapshots.")
+
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index_command() -> None:
+        """Rebuild the full-text task search index from the task table."""
+
+        for _shard in iter_shards():
+            rebuild_task_search_index()
+        click.echo("Rebuilt task search index.")
+
+    @app.cli.command("generate-plans")
+    @click.option("--days", default=1, show_default=True, help="Days of plan to add per user.")
+    def generate_plans_command(days: int) -> None:
+        """Add the next days of every user's study plan to their daily planner."""
+
+        total = users = 0
+        for _shard in iter_shards():
+            settings = Setting.query.filter(Setting.exam_date > date.today()).all()
+            users += len(settings)
+            for setting in settings:
+                user = db.session.get(User, setting.user_id)
+                if user is None:
+                    continue
+                total += len(apply_study_plan(user, build_study_plan(user, setting, days)))
+                db.session.commit()
+        click.echo(f"Added {total} planner tasks for {users} users.")
 
     schema_checked = False
 
@@ -900,10 +4781,78 @@ def create_app() -> Flask:
         if schema_checked:
             return
         db.create_all()
+        if app.extensions["shard_router"] is not None:
+            app.extensions["shard_router"].create_all()
         seed_syllabus_topics()
         seed_routine_templates()
+        # Background workers start with the first request rather than at
+        # import time, so CLI commands such as `db upgrade` stay single-threaded.
+        if app.config["ANALYTICS_SCHEDULER_ENABLED"]:
+            app.extensions["analytics_scheduler"].start()
+        app.extensions["side_effects"].start()
+        app.extensions["group_commit"].start()
+        app.extensions["study_timers"].start()
         schema_checked = True
 
+    @app.before_request
+    def admit_request() -> tuple[Response, int] | None:
+        if (
+            not app.config["RATE_LIMIT_ENABLED"]
+            or request.endpoint in ADMISSION_EXEMPT_ENDPOINTS
+            or request.environ.get(BATCH_OPERATION_ENVIRON_KEY)
+        ):
+            return None
+        route_class = classify_request()
+        limiter: TokenBucketLimiter = app.extensions["rate_limiter"]
+        cost = 1
+        if request.endpoint == "run_batch":
+            # A batch pays for its operations, which are not admitted again.
+            payload = request.get_json(silent=True)
+            operations = payload.get("operations") if isinstance(payload, dict) else None
+            cost = max(1, len(operations)) if isinstance(operations, list) else 1
+            burst = int(limiter.limits[route_class][1])
+            if cost > burst:
+                return jsonify({"error": f"at most {burst} operations per batch"}), 400
+        user_id = session.get("user_id")
+        client_key = f"user:{user_id}" if user_id is not None else f"ip:{request.remote_addr}"
+        retry_after = limiter.acquire(client_key, route_class, cost)
+        if retry_after:
+            return too_many_requests("Rate limit exceeded", retry_after)
+        if not app.extensions["admission_gate"].try_enter(route_class):
+            return too_many_requests("Server is busy", 1)
+        g.admitted = True
+        return None
+
+    @app.teardown_request
+    def release_admission(error: BaseException | None) -> None:
+        if request.environ.get(BATCH_OPERATION_ENVIRON_KEY):
+            return
+        if g.pop("admitted", False):
+            app.extensions["admission_gate"].leave()
+
+    @app.get("/assets/<path:filename>")
+    def serve_asset(filename: str) -> Response:
+        output_dir = app.config["ASSET_OUTPUT_DIR"]
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        content_encoding = None
+        served_name = filename
+        for encoding, suffix in ASSET_ENCODINGS:
+            if request.accept_encodings[encoding] and (
+                Path(output_dir) / f"{filename}{suffix}"
+            ).is_file():
+                content_encoding = encoding
+                served_name = f"{filename}{suffix}"
+                break
+
+        response = send_from_directory(output_dir, served_name, mimetype=mimetype)
+        if content_encoding is not None:
+            response.headers["Content-Encoding"] = content_encoding
+        response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.max_age = ASSET_MAX_AGE_SECONDS
+        response.cache_control.immutable = True
+        return response
+
     @app.get("/")
     def root_redirect() -> Response:
         if get_current_user() is not None:
@@ -939,32 +4888,38 @@ def create_app() -> Flask:
 
         dashboard_context = build_dashboard_context(user, active_route)
 
-        # Always compute syllabus data once
-        syllabus_data = compute_syllabus_progress(user)
-
-        # Build progress dict exactly like old syllabus.html expected
-        progress = {
-            "theory": syllabus_data["theory_percent"],
-            "pyq": syllabus_data["pyq_percent"],
-            "revision_1": syllabus_data["revision_1_percent"],
-            "revision_2": syllabus_data["revision_2_percent"],
-        }
-
-        analytics_summary = compute_analytics_summary(user)
+        # Only the active view is rendered server-side; the other fragments
+        # are fetched lazily by app.js when the user navigates to them.
+        view_builder = VIEW_CONTEXT_BUILDERS.get(active_route)
+        view_context = view_builder(user) if view_builder else {}
+        initial_state = build_initial_state(
+            user, active_route, view_context.pop("initial_state", None)
+        )
 
         return render_template(
             "dashboard.html",
             **dashboard_context,
+            **view_context,
+            initial_state=initial_state,
+        )
 
-            # For syllabus partial
-            grouped_topics=syllabus_data["grouped_topics"],
-            progress=progress,
+    @app.get("/fragments/syllabus")
+    @require_login
+    def render_syllabus_fragment() -> str:
+        user = get_current_user()
+        assert user is not None
+        return build_syllabus_view_context(user)["syllabus_fragment"]
 
-            # For score predictor partial
-            subject_breakdown=syllabus_data["subject_breakdown"],
-            predicted_score=analytics_summary["predicted_score"],
-            category=analytics_summary["confidence_level"],
+    @app.get("/fragments/score-predictor")
+    @require_login
+    def render_score_predictor_fragment() -> str:
+        user = get_current_user()
+        assert user is not None
+        return render_template(
+            "partials/score_predictor_content.html",
+            **build_score_predictor_view_context(user),
         )
+
     @app.get("/dashboard")
     @login_required_page
     def render_dashboard() -> str:
@@ -1068,7 +5023,8 @@ def create_app() -> Flask:
         user.set_password(password)
         db.session.add(user)
         db.session.commit()
-        get_or_create_settings(user)
+        with use_user_shard(user.id):
+            get_or_create_settings(user)
         flash(f"Account {username} created.", "success")
         return redirect(url_for("render_admin_create_user"))
 
@@ -1110,6 +5066,18 @@ def create_app() -> Flask:
         session.pop("is_admin", None)
         return jsonify({"ok": True})
 
+    @app.get("/api/admin/cohort-report")
+    @heavy_request
+    @require_admin
+    def get_cohort_report() -> Response:
+        return jsonify(compute_cohort_report())
+
+    @app.get("/api/admin/side-effects")
+    @require_admin
+    def get_side_effect_metrics() -> Response:
+        side_effects: SideEffectQueue = app.extensions["side_effects"]
+        return jsonify(side_effects.metrics())
+
     @app.get("/api/me")
     def get_me() -> Response:
         user = get_current_user()
@@ -1137,7 +5105,8 @@ def create_app() -> Flask:
         user.set_password(str(password))
         db.session.add(user)
         db.session.commit()
-        get_or_create_settings(user)
+        with use_user_shard(user.id):
+            get_or_create_settings(user)
         return jsonify({"user": user.to_dict()}), 201
 
     @app.post("/api/login")
@@ -1169,29 +5138,33 @@ def create_app() -> Flask:
     def get_bootstrap_data() -> Response:
         user = get_current_user()
         assert user is not None
-        task_models = (
-            Task.query.filter_by(user_id=user.id).order_by(Task.created_at.desc()).all()
-        )
-        tasks = [task.to_dict() for task in task_models]
+        fields, error = parse_fields_param(TASK_ROWS)
+        if error:
+            return error
+        task_streak = load_projection(user, "task_streak")
+        task_rows = db.session.execute(
+            TASK_ROWS.select(fields)
+            .where(Task.user_id == user.id)
+            .order_by(Task.created_at.desc())
+        ).all()
         setting_model = get_or_create_settings(user)
-        total_tracked_minutes = sum(45 for task in task_models if task.completed)
-        return jsonify(
+        return stream_json_response(
             {
-                "tasks": tasks,
+                "tasks": map(TASK_ROWS.serializer(fields), task_rows),
                 "settings": setting_model.to_dict(),
                 "syllabus": {k: v["topics"] for k, v in SYLLABUS.items()},
                 "user": user.to_dict(),
-                "study_streak": calculate_study_streak(task_models),
-                "total_tracked_minutes": total_tracked_minutes,
+                "study_streak": task_streak["streak"],
+                "total_tracked_minutes": task_streak["tracked_minutes"],
                 "study_time": calculate_study_time_totals(user),
                 "target_exam": setting_model.exam_date.isoformat() if setting_model.exam_date else None,
                 "countdown": calculate_countdown(setting_model.exam_date),
             }
         )
 
-
     @app.post("/api/study-session")
     @require_login
+    @idempotent
     def create_study_session() -> tuple[Response, int]:
         user = get_current_user()
         assert user is not None
@@ -1204,35 +5177,111 @@ def create_app() -> Flask:
         if not isinstance(duration, int) or isinstance(duration, bool) or duration <= 0:
             return jsonify({"error": "duration_seconds must be a positive integer"}), 400
 
-        session_model = StudySession(user_id=user.id, duration_seconds=duration, date=date.today())
-        db.session.add(session_model)
-        db.session.commit()
+        def log_session(user: User) -> dict[str, float]:
+            db.session.add(
+                StudySession(user_id=user.id, duration_seconds=duration, date=date.today())
+            )
+            totals = calculate_study_time_totals(user)
+            schedule_analytics_refresh(user)
+            publish_event(
+                user,
+                "session.logged",
+                duration_seconds=duration,
+                date=date.today().isoformat(),
+                **totals,
+            )
+            return totals
 
-        totals = calculate_study_time_totals(user)
+        totals = commit_coalesced(user, log_session)
         return jsonify({"ok": True, **totals}), 201
 
+    @app.get("/api/projections/<name>")
+    @heavy_request
+    @require_login
+    def get_projection(name: str) -> Response | tuple[Response, int]:
+        user = get_current_user()
+        assert user is not None
+        if name not in PROJECTIONS:
+            return jsonify({"error": "Projection not found"}), 404
+        return jsonify(load_projection(user, name))
+
+    @app.get("/api/timer")
+    @require_login
+    def get_study_timer() -> Response:
+        user = get_current_user()
+        assert user is not None
+        timers: StudyTimerRegistry = app.extensions["study_timers"]
+        return jsonify({"timer": timers.get(user.id)})
+
+    @app.post("/api/timer/start")
+    @require_login
+    def start_study_timer() -> Response:
+        user = get_current_user()
+        assert user is not None
+        timers: StudyTimerRegistry = app.extensions["study_timers"]
+        return jsonify({"timer": timers.start_timer(user.id)})
+
+    @app.post("/api/timer/pause")
+    @require_login
+    def pause_study_timer() -> Response | tuple[Response, int]:
+        user = get_current_user()
+        assert user is not None
+        timers: StudyTimerRegistry = app.extensions["study_timers"]
+        timer = timers.pause(user.id)
+        if timer is None:
+            return jsonify({"error": "No active timer"}), 404
+        return jsonify({"timer": timer})
+
+    @app.post("/api/timer/heartbeat")
+    def study_timer_heartbeat() -> Response | tuple[Response, int]:
+        # Runs on every open tab, so it skips require_login's user lookup
+        # and touches nothing but the timer table.
+        user_id = session.get("user_id")
+        timers: StudyTimerRegistry = app.extensions["study_timers"]
+        if user_id is None or not timers.heartbeat(user_id):
+            return jsonify({"error": "No active timer"}), 404
+        return Response(status=204)
+
+    @app.post("/api/timer/stop")
+    @require_login
+    @idempotent
+    def stop_study_timer() -> Response | tuple[Response, int]:
+        user = get_current_user()
+        assert user is not None
+        timers: StudyTimerRegistry = app.extensions["study_timers"]
+        with timers.stopping(user.id) as stopped:
+            if stopped is None:
+                return jsonify({"error": "No active timer"}), 404
+            timer, seconds = stopped
+
+            def finish_session(user: User) -> dict[str, float]:
+                save_timer_session(timer, seconds)
+                totals = calculate_study_time_totals(user)
+                schedule_analytics_refresh(user)
+                invalidate_heatmap_days(user.id, timer.started_on, date.today())
+                # Earlier flushes already logged part of the duration.
+                publish_event(
+                    user,
+                    "session.logged",
+                    duration_seconds=timer.unlogged(seconds),
+                    date=timer.started_on.isoformat(),
+                    **totals,
+                )
+                return totals
+
+            totals = commit_coalesced(user, finish_session)
+        return jsonify({"ok": True, "duration_seconds": seconds, **totals})
+
     @app.get("/api/daily-routine")
     @require_login
     def get_daily_routine() -> Response:
         user = get_current_user()
         assert user is not None
-        items = get_or_create_daily_routine(user)
-        completed_count = sum(1 for item in items if item["completed"])
-        total_count = len(items)
-        completion_percentage = round((completed_count / total_count) * 100, 1) if total_count else 0
-        return jsonify(
-            {
-                "items": items,
-                "tasks": items,
-                "completed_count": completed_count,
-                "total_count": total_count,
-                "completion_percentage": completion_percentage,
-                "completed_percent": completion_percentage,
-            }
-        )
+        return jsonify(build_daily_routine_payload(user))
 
     @app.post("/api/daily-routine")
     @require_login
+    @idempotent
     def update_daily_routine() -> Response:
         user = get_current_user()
         assert user is not None
@@ -1245,31 +5294,35 @@ def create_app() -> Flask:
         if not isinstance(routine_id, int) or isinstance(routine_id, bool):
             return jsonify({"error": "routine_id must be an integer"}), 400
 
-        completion = RoutineCompletion.query.filter_by(
-            user_id=user.id,
-            routine_id=routine_id,
-            date=date.today(),
-        ).first()
-        if completion is None:
-            completion = RoutineCompletion(user_id=user.id, routine_id=routine_id, date=date.today(), completed=False)
-            db.session.add(completion)
-
-        completion.completed = not completion.completed
-        db.session.commit()
+        template = db.session.get(RoutineTemplate, routine_id)
+        if template is None:
+            return jsonify({"error": "Routine not found"}), 404
+
+        today = date.today()
+
+        def toggle_routine(user: User) -> tuple[bool, dict[str, Any]]:
+            completion = RoutineCompletion.query.filter_by(
+                user_id=user.id,
+                routine_id=routine_id,
+                date=today,
+            ).first()
+            if completion is None:
+                completion = RoutineCompletion(user_id=user.id, routine_id=routine_id, date=today, completed=False)
+                db.session.add(completion)
+
+            completion.completed = not completion.completed
+            schedule_analytics_refresh(user)
+            publish_event(
+                user, "routine.toggled", routine_id=routine_id, completed=completion.completed
+            )
+            return completion.completed, calculate_routine_counters(user, today)
 
-        items = get_or_create_daily_routine(user)
-        completed_count = sum(1 for item in items if item["completed"])
-        total_count = len(items)
-        completion_percentage = round((completed_count / total_count) * 100, 1) if total_count else 0
+        completed, counters = commit_coalesced(user, toggle_routine)
         return jsonify(
             {
                 "ok": True,
-                "items": items,
-                "tasks": items,
-                "completed_count": completed_count,
-                "total_count": total_count,
-                "completion_percentage": completion_percentage,
-                "completed_percent": completion_percentage,
+                "item": build_routine_item(template, completed, today),
+                **counters,
             }
         )
 
@@ -1283,23 +5336,14 @@ def create_app() -> Flask:
             planner_date = parse_optional_date(raw_date) if raw_date else date.today()
         except ValueError:
             return jsonify({"error": f"date must use format {DATE_FORMAT}"}), 400
-        tasks = DailyTask.query.filter_by(user_id=user.id, date=planner_date).order_by(DailyTask.created_at.asc()).all()
-        total_count = len(tasks)
-        completed_count = sum(1 for task in tasks if task.completed)
-        completion_percentage = round((completed_count / total_count) * 100, 1) if total_count else 0
-        return jsonify(
-            {
-                "date": planner_date.isoformat(),
-                "items": [task.to_dict() for task in tasks],
-                "completed_count": completed_count,
-                "total_count": total_count,
-                "completion_percentage": completion_percentage,
-                "streak": calculate_daily_planner_streak(user),
-            }
-        )
+        fields, error = parse_fields_param(DAILY_TASK_ROWS)
+        if error:
+            return error
+        return jsonify(build_daily_planner_payload(user, planner_date, fields))
 
     @app.post("/api/daily-planner")
     @require_login
+    @idempotent
     def create_daily_planner_task() -> tuple[Response, int]:
         user = get_current_user()
         assert user is not None
@@ -1318,35 +5362,55 @@ def create_app() -> Flask:
             return jsonify({"error": f"date must use format {DATE_FORMAT}"}), 400
         task = DailyTask(user_id=user.id, title=title, date=task_date)
         db.session.add(task)
+        db.session.flush()
+        invalidate_heatmap_day(user, task.date)
+        schedule_analytics_refresh(user)
+        publish_event(user, "planner.added", item=task.to_dict())
         db.session.commit()
-        return jsonify(task.to_dict()), 201
+        return jsonify({**task.to_dict(), **calculate_daily_planner_counters(user, task.date)}), 201
 
     @app.patch("/api/daily-planner/<int:task_id>")
     @require_login
+    @idempotent
     def toggle_daily_planner_task(task_id: int) -> Response:
         user = get_current_user()
         assert user is not None
-        task = DailyTask.query.filter_by(id=task_id, user_id=user.id).first()
-        if task is None:
+
+        def toggle_task(user: User) -> dict[str, Any] | None:
+            task = DailyTask.query.filter_by(id=task_id, user_id=user.id).first()
+            if task is None:
+                return None
+            task.completed = not task.completed
+            invalidate_heatmap_day(user, task.date)
+            schedule_analytics_refresh(user)
+            publish_event(user, "planner.toggled", id=task.id, completed=task.completed)
+            return {**task.to_dict(), **calculate_daily_planner_counters(user, task.date)}
+
+        toggled = commit_coalesced(user, toggle_task)
+        if toggled is None:
             return jsonify({"error": "Task not found"}), 404
-        task.completed = not task.completed
-        db.session.commit()
-        return jsonify(task.to_dict())
+        return jsonify(toggled)
 
     @app.delete("/api/daily-planner/<int:task_id>")
     @require_login
+    @idempotent
     def delete_daily_planner_task(task_id: int) -> Response:
         user = get_current_user()
         assert user is not None
         task = DailyTask.query.filter_by(id=task_id, user_id=user.id).first()
         if task is None:
             return jsonify({"error": "Task not found"}), 404
+        task_date = task.date
         db.session.delete(task)
+        invalidate_heatmap_day(user, task_date)
+        schedule_analytics_refresh(user)
+        publish_event(user, "planner.deleted", id=task_id)
         db.session.commit()
-        return jsonify({"ok": True})
+        return jsonify({"ok": True, "id": task_id, **calculate_daily_planner_counters(user, task_date)})
 
     @app.patch("/api/mock-tests/<int:test_number>")
     @require_login
+    @idempotent
     def update_mock_test(test_number: int) -> Response:
         user = get_current_user()
         assert user is not None
@@ -1384,23 +5448,106 @@ def create_app() -> Flask:
             else:
                 return jsonify({"error": "score must be a number or null"}), 400
 
+        schedule_analytics_refresh(user)
+        publish_event(user, "mock.updated", item=test.to_dict())
         db.session.commit()
-        return jsonify({"item": test.to_dict(), **get_mock_test_stats(user)})
+        return jsonify({"item": test.to_dict(), **calculate_mock_test_summary(user)})
 
     @app.get("/api/mock-tests")
     @require_login
     def get_mock_tests() -> Response:
         user = get_current_user()
         assert user is not None
+        fields, error = parse_fields_param(MOCK_TEST_ROWS)
+        if error:
+            return error
         seed_mock_tests_for_user(user)
-        return jsonify(get_mock_test_stats(user))
+        return jsonify(get_mock_test_stats(user, fields))
 
     @app.get("/api/analytics-summary")
+    @heavy_request
     @require_login
     def get_analytics_summary() -> Response:
         user = get_current_user()
         assert user is not None
-        return jsonify(compute_analytics_summary(user))
+        return jsonify(load_analytics_summary(user))
+
+    @app.get("/api/analytics/heatmap")
+    @heavy_request
+    @require_login
+    def get_analytics_heatmap() -> Response | tuple[Response, int]:
+        user = get_current_user()
+        assert user is not None
+        try:
+            end = parse_optional_date(request.args.get("end")) or date.today()
+            start = parse_optional_date(request.args.get("start")) or end - timedelta(
+                days=HEATMAP_DEFAULT_DAYS - 1
+            )
+        except ValueError:
+            return jsonify({"error": f"start and end must use format {DATE_FORMAT}"}), 400
+        if start > end:
+            return jsonify({"error": "start must not be after end"}), 400
+        if (end - start).days + 1 > HEATMAP_MAX_DAYS:
+            return jsonify({"error": f"range must not exceed {HEATMAP_MAX_DAYS} days"}), 400
+
+        return jsonify(build_heatmap_payload(user, start, end))
+
+    @app.get("/api/score-projection")
+    @heavy_request
+    @require_login
+    def get_score_projection() -> Response | tuple[Response, int]:
+        user = get_current_user()
+        assert user is not None
+        setting = get_or_create_settings(user)
+        if setting.exam_date is None:
+            return jsonify({"error": "Set an exam date in settings to project scores"}), 400
+        trajectories = request.args.get(
+            "trajectories", PROJECTION_DEFAULT_TRAJECTORIES, type=int
+        )
+        if not 1 <= trajectories <= PROJECTION_MAX_TRAJECTORIES:
+            return jsonify(
+                {"error": f"trajectories must be between 1 and {PROJECTION_MAX_TRAJECTORIES}"}
+            ), 400
+        return jsonify(load_score_projection(user, setting.exam_date, trajectories))
+
+    @app.get("/api/study-plan")
+    @heavy_request
+    @require_login
+    def get_study_plan() -> Response | tuple[Response, int]:
+        user = get_current_user()
+        assert user is not None
+        setting = get_or_create_settings(user)
+        if setting.exam_date is None or setting.exam_date <= date.today():
+            return jsonify({"error": "Set a future exam date in settings to generate a plan"}), 400
+        return jsonify(build_study_plan(user, setting))
+
+    @app.post("/api/study-plan/apply")
+    @require_login
+    @idempotent
+    def apply_study_plan_route() -> Response | tuple[Response, int]:
+        user = get_current_user()
+        assert user is not None
+        setting = get_or_create_settings(user)
+        if setting.exam_date is None or setting.exam_date <= date.today():
+            return jsonify({"error": "Set a future exam date in settings to generate a plan"}), 400
+        payload, error = parse_json_payload()
+        if error:
+            return error
+        assert payload is not None
+        days = payload.get("days", PLAN_DEFAULT_APPLY_DAYS)
+        if not isinstance(days, int) or isinstance(days, bool) or not 1 <= days <= PLAN_MAX_DAYS:
+            return jsonify({"error": f"days must be an integer between 1 and {PLAN_MAX_DAYS}"}), 400
+
+        created = apply_study_plan(user, build_study_plan(user, setting, days))
+        db.session.flush()
+        today = date.today()
+        for task in created:
+            if task.date == today:
+                publish_event(user, "planner.added", item=task.to_dict())
+        if any(task.date == today for task in created):
+            schedule_analytics_refresh(user)
+        db.session.commit()
+        return jsonify({"created": len(created), "days": days}), 201
 
     @app.get("/api/syllabus-progress")
     @require_login
@@ -1411,6 +5558,7 @@ def create_app() -> Flask:
 
     @app.post("/api/syllabus-progress")
     @require_login
+    @idempotent
     def update_syllabus_progress() -> Response:
         user = get_current_user()
         assert user is not None
@@ -1435,27 +5583,166 @@ def create_app() -> Flask:
         if topic is None:
             return jsonify({"error": "Topic not found"}), 404
 
-        progress = UserSyllabusProgress.query.filter_by(user_id=user.id, topic_id=topic_id).first()
-        if progress is None:
-            progress = UserSyllabusProgress(user_id=user.id, topic_id=topic_id)
-            db.session.add(progress)
+        def set_progress(user: User) -> None:
+            progress = UserSyllabusProgress.query.filter_by(user_id=user.id, topic_id=topic_id).first()
+            if progress is None:
+                progress = UserSyllabusProgress(user_id=user.id, topic_id=topic_id)
+                db.session.add(progress)
 
-        setattr(progress, field, value)
-        db.session.commit()
+            setattr(progress, field, value)
+            bump_progress_version(user)
+            schedule_analytics_refresh(user)
+            publish_event(user, "syllabus.changed", topic_id=topic_id, field=field, value=value)
+
+        commit_coalesced(user, set_progress)
         return jsonify({"ok": True})
 
+    @app.post("/api/batch")
+    @require_login
+    def run_batch() -> tuple[Response, int]:
+        payload, error = parse_json_payload()
+        if error:
+            return error
+        assert payload is not None
+
+        operations = payload.get("operations")
+        if not isinstance(operations, list) or not operations:
+            return jsonify({"error": "operations must be a non-empty list"}), 400
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            return jsonify({"error": f"at most {MAX_BATCH_OPERATIONS} operations per batch"}), 400
+
+        for operation in operations:
+            if not isinstance(operation, dict):
+                return jsonify({"error": "each operation must be an object"}), 400
+            method = str(operation.get("method", "")).upper()
+            path = str(operation.get("path", ""))
+            if method not in BATCH_METHODS or not path.startswith("/api/") or path.startswith("/api/batch"):
+                return jsonify({"error": f"unsupported operation {method} {path}"}), 400
+
+        results = []
+        for operation in operations:
+            with app.request_context(build_batch_operation_environ(operation)):
+                response = app.full_dispatch_request()
+            # Operations share this request's session; drop whatever a failed
+            # one left uncommitted so the next operation cannot commit it.
+            db.session.rollback()
+            results.append(
+                {
+                    "status": response.status_code,
+                    "body": response.get_json(silent=True),
+                }
+            )
+        return jsonify({"results": results}), 200
+
+    @app.get("/sw.js")
+    def serve_service_worker() -> Response:
+        response = send_from_directory(Path(app.static_folder or STATIC_DIR) / "js", "sw.js")
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["Service-Worker-Allowed"] = "/"
+        return response
+
+    @app.get("/api/events")
+    @require_login
+    def stream_events() -> Response:
+        user = get_current_user()
+        assert user is not None
+        user_id = user.id
+        broker: EventBroker = app.extensions["event_broker"]
+        keepalive = app.config["EVENT_KEEPALIVE_SECONDS"]
+        # Subscribe before returning so no event after this request is missed.
+        subscriber = broker.subscribe(user_id)
+
+        def generate() -> Iterator[str]:
+            try:
+                yield "retry: 3000\n\n"
+                while True:
+                    try:
+                        event = subscriber.get(timeout=keepalive)
+                    except queue.Empty:
+                        yield ": keepalive\n\n"
+                        continue
+                    yield format_sse(event)
+            finally:
+                broker.unsubscribe(user_id, subscriber)
+
+        response = Response(generate(), mimetype="text/event-stream")
+        response.call_on_close(lambda: broker.unsubscribe(user_id, subscriber))
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    @app.get("/api/sync")
+    @require_login
+    def sync_changes() -> Response:
+        user = get_current_user()
+        assert user is not None
+        raw_since = request.args.get("since")
+        since = None
+        if raw_since not in (None, ""):
+            if not raw_since.isdigit():
+                return jsonify({"error": "since must be a token from a previous sync"}), 400
+            since = int(raw_since)
+        return jsonify(build_sync_payload(user.id, since))
+
     @app.get("/api/tasks")
     @require_login
     def list_tasks() -> Response:
         user = get_current_user()
         assert user is not None
-        tasks = (
-            Task.query.filter_by(user_id=user.id).order_by(Task.created_at.desc()).all()
-        )
-        return jsonify({"tasks": [task.to_dict() for task in tasks]}), 200
+        fields, error = parse_fields_param(TASK_ROWS)
+        if error:
+            return error
+        task_rows = db.session.execute(
+            TASK_ROWS.select(fields)
+            .where(Task.user_id == user.id)
+            .order_by(Task.created_at.desc())
+        ).all()
+        return stream_json_response({"tasks": map(TASK_ROWS.serializer(fields), task_rows)})
+
+    @app.get("/api/tasks/upcoming")
+    @require_login
+    def get_upcoming_deadlines() -> Response | tuple[Response, int]:
+        user = get_current_user()
+        assert user is not None
+        days = request.args.get("days", DEADLINE_DEFAULT_DAYS, type=int)
+        if not 1 <= days <= DEADLINE_MAX_DAYS:
+            return jsonify({"error": f"days must be between 1 and {DEADLINE_MAX_DAYS}"}), 400
+        fields, error = parse_fields_param(TASK_ROWS)
+        if error:
+            return error
+        return jsonify(build_upcoming_deadlines(user.id, date.today(), days, fields))
+
+    @app.get("/api/tasks/search")
+    @require_login
+    def search_tasks() -> Response | tuple[Response, int]:
+        user = get_current_user()
+        assert user is not None
+        match = build_task_search_match(request.args.get("q", ""), user.id)
+        if match is None:
+            return jsonify({"error": "q must contain at least one word"}), 400
+        limit = request.args.get("limit", TASK_SEARCH_DEFAULT_LIMIT, type=int)
+        if not 1 <= limit <= TASK_SEARCH_MAX_LIMIT:
+            return jsonify({"error": f"limit must be between 1 and {TASK_SEARCH_MAX_LIMIT}"}), 400
+        fields, error = parse_fields_param(TASK_ROWS)
+        if error:
+            return error
+
+        # Column weights follow the index order: title, topic, notes, user_id.
+        rank = func.bm25(literal_column("task_fts"), 10.0, 5.0, 1.0, 0.0)
+        rows = db.session.execute(
+            TASK_ROWS.select(fields)
+            .add_columns(rank)
+            .join(TASK_SEARCH_TABLE, TASK_SEARCH_TABLE.c.rowid == Task.id)
+            .where(literal_column("task_fts").op("MATCH")(match), Task.user_id == user.id)
+            .order_by(rank)
+            .limit(limit)
+        ).all()
+        serialize = TASK_ROWS.serializer(fields)
+        return jsonify({"tasks": [serialize(row) for row in rows]})
 
     @app.post("/api/tasks")
     @require_login
+    @idempotent
     def create_task() -> tuple[Response, int]:
         user = get_current_user()
         assert user is not None
@@ -1468,11 +5755,14 @@ def create_app() -> Flask:
             return jsonify({"error": "Validation failed", "details": errors}), 400
         task = build_task_from_payload(payload, user)
         db.session.add(task)
+        db.session.flush()
+        publish_event(user, "task.saved", item=task.to_dict())
         db.session.commit()
         return jsonify(task.to_dict()), 201
 
     @app.patch("/api/tasks/<int:task_id>")
     @require_login
+    @idempotent
     def update_task(task_id: int) -> Response:
         user = get_current_user()
         assert user is not None
@@ -1487,11 +5777,14 @@ def create_app() -> Flask:
         if errors:
             return jsonify({"error": "Validation failed", "details": errors}), 400
         update_task_from_payload(task, payload)
+        db.session.flush()
+        publish_event(user, "task.saved", item=task.to_dict())
         db.session.commit()
         return jsonify(task.to_dict())
 
     @app.delete("/api/tasks/<int:task_id>")
     @require_login
+    @idempotent
     def delete_task(task_id: int) -> Response:
         user = get_current_user()
         assert user is not None
@@ -1499,11 +5792,13 @@ def create_app() -> Flask:
         if task is None:
             return jsonify({"error": "Task not found"}), 404
         db.session.delete(task)
+        publish_event(user, "task.deleted", id=task_id)
         db.session.commit()
         return jsonify({"ok": True}), 200
 
     @app.put("/api/settings")
     @require_login
+    @idempotent
     def update_settings() -> Response:
         user = get_current_user()
         assert user is not None
@@ -1516,6 +5811,7 @@ def create_app() -> Flask:
         if errors:
             return jsonify({"error": "Validation failed", "details": errors}), 400
         update_settings_from_payload(setting, payload)
+        publish_event(user, "settings.updated", settings=setting.to_dict())
         db.session.commit()
         return jsonify(setting.to_dict())
 
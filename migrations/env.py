@@ -26,6 +26,21 @@ def run_migrations_online():
         with context.begin_transaction():
             context.run_migrations()
 
+    # With SHARD_COUNT > 0 the per-user tables live in shard files; run the
+    # same revisions against each of them. Revisions find ``shard_index`` in
+    # ``op.get_context().opts`` and must only touch per-user tables there.
+    router = current_app.extensions.get("shard_router")
+    if router is None:
+        return
+    router.create_all()
+    for index, engine in enumerate(router.engines):
+        with engine.connect() as connection:
+            context.configure(
+                connection=connection, target_metadata=target_metadata, shard_index=index
+            )
+            with context.begin_transaction():
+                context.run_migrations()
+
 
 if context.is_offline_mode():
     run_migrations_offline()
@@ -0,0 +1,26 @@
+"""Add per-user syllabus progress version for fragment caching.
+
+Revision ID: 20261019_05
+Revises: 20260227_04
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261019_05"
+down_revision = "20260227_04"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "user",
+        sa.Column("progress_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade():
+    op.drop_column("user", "progress_version")
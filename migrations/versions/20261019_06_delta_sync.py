@@ -0,0 +1,64 @@
+"""Add change tracking columns and tombstones for delta sync.
+
+Revision ID: 20261019_06
+Revises: 20261019_05
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261019_06"
+down_revision = "20261019_05"
+branch_labels = None
+depends_on = None
+
+SYNCED_TABLES = [
+    "task",
+    "daily_task",
+    "mock_test",
+    "user_syllabus_progress",
+    "routine_completion",
+]
+
+
+def upgrade():
+    op.add_column(
+        "user",
+        sa.Column("change_seq", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+    for table in SYNCED_TABLES:
+        op.add_column(table, sa.Column("updated_at", sa.DateTime(), nullable=True))
+        op.add_column(
+            table,
+            sa.Column("change_seq", sa.Integer(), nullable=False, server_default="0"),
+        )
+        op.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP")
+        op.create_index(f"ix_{table}_user_change_seq", table, ["user_id", "change_seq"], unique=False)
+
+    op.create_table(
+        "sync_tombstone",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("entity", sa.String(length=40), nullable=False),
+        sa.Column("entity_id", sa.Integer(), nullable=False),
+        sa.Column("change_seq", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_sync_tombstone_user_change_seq", "sync_tombstone", ["user_id", "change_seq"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_sync_tombstone_user_change_seq", table_name="sync_tombstone")
+    op.drop_table("sync_tombstone")
+
+    for table in reversed(SYNCED_TABLES):
+        op.drop_index(f"ix_{table}_user_change_seq", table_name=table)
+        op.drop_column(table, "change_seq")
+        op.drop_column(table, "updated_at")
+
+    op.drop_column("user", "change_seq")
@@ -0,0 +1,38 @@
+"""Add stored responses for idempotent mutation replays.
+
+Revision ID: 20261019_07
+Revises: 20261019_06
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261019_07"
+down_revision = "20261019_06"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "idempotency_record",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("key", sa.String(length=80), nullable=False),
+        sa.Column("method", sa.String(length=10), nullable=False),
+        sa.Column("path", sa.String(length=255), nullable=False),
+        sa.Column("status_code", sa.Integer(), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "key", name="uq_idempotency_record_user_key"),
+    )
+    op.create_index("ix_idempotency_record_created_at", "idempotency_record", ["created_at"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_idempotency_record_created_at", table_name="idempotency_record")
+    op.drop_table("idempotency_record")
@@ -0,0 +1,33 @@
+"""Add precomputed per-user analytics snapshots.
+
+Revision ID: 20261019_08
+Revises: 20261019_07
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261019_08"
+down_revision = "20261019_07"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "analytics_snapshot",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("summary", sa.Text(), nullable=False),
+        sa.Column("summary_date", sa.Date(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_index("ix_analytics_snapshot_computed_at", "analytics_snapshot", ["computed_at"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_analytics_snapshot_computed_at", table_name="analytics_snapshot")
+    op.drop_table("analytics_snapshot")
@@ -0,0 +1,47 @@
+"""Add the FTS5 full-text index over tasks.
+
+Revision ID: 20261019_10
+Revises: 20261019_09
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+
+revision = "20261019_10"
+down_revision = "20261019_09"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5("
+        "title, topic, notes, user_id, content='task', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS task_fts_ai AFTER INSERT ON task BEGIN "
+        "INSERT INTO task_fts(rowid, title, topic, notes, user_id) "
+        "VALUES (new.id, new.title, new.topic, new.notes, new.user_id); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS task_fts_ad AFTER DELETE ON task BEGIN "
+        "INSERT INTO task_fts(task_fts, rowid, title, topic, notes, user_id) "
+        "VALUES ('delete', old.id, old.title, old.topic, old.notes, old.user_id); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS task_fts_au AFTER UPDATE OF title, topic, notes, user_id ON task BEGIN "
+        "INSERT INTO task_fts(task_fts, rowid, title, topic, notes, user_id) "
+        "VALUES ('delete', old.id, old.title, old.topic, old.notes, old.user_id); "
+        "INSERT INTO task_fts(rowid, title, topic, notes, user_id) "
+        "VALUES (new.id, new.title, new.topic, new.notes, new.user_id); END"
+    )
+    op.execute("INSERT INTO task_fts(task_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS task_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS task_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS task_fts_ai")
+    op.execute("DROP TABLE IF EXISTS task_fts")
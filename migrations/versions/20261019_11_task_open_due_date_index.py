@@ -0,0 +1,29 @@
+"""Add a partial index on open tasks' due dates.
+
+Revision ID: 20261019_11
+Revises: 20261019_10
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261019_11"
+down_revision = "20261019_10"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_task_user_open_due_date",
+        "task",
+        ["user_id", "due_date"],
+        unique=False,
+        sqlite_where=sa.text("completed = 0 AND due_date IS NOT NULL"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_task_user_open_due_date", table_name="task")
@@ -0,0 +1,55 @@
+"""Add the append-only user event log and projection snapshots.
+
+Revision ID: 20261019_12
+Revises: 20261019_11
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261019_12"
+down_revision = "20261019_11"
+branch_labels = None
+depends_on = None
+
+
+# Shards created by the app before they were versioned already have these
+# tables, hence ``if_not_exists``.
+def upgrade():
+    op.create_table(
+        "user_event",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=40), nullable=False),
+        sa.Column("data", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_user_event_user_id_id",
+        "user_event",
+        ["user_id", "id"],
+        unique=False,
+        if_not_exists=True,
+    )
+    op.create_table(
+        "projection_snapshot",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=40), nullable=False),
+        sa.Column("state", sa.Text(), nullable=False),
+        sa.Column("event_id", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("user_id", "name"),
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    op.drop_table("projection_snapshot")
+    op.drop_index("ix_user_event_user_id_id", table_name="user_event")
+    op.drop_table("user_event")
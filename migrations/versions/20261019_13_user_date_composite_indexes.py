@@ -0,0 +1,46 @@
+"""Add composite (user_id, date) indexes for the per-day queries.
+
+Revision ID: 20261019_13
+Revises: 20261019_12
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+
+revision = "20261019_13"
+down_revision = "20261019_12"
+branch_labels = None
+depends_on = None
+
+
+# Shards created by the app before they were versioned may already have these
+# indexes, hence ``if_not_exists``.
+def upgrade():
+    op.create_index(
+        "ix_study_session_user_date",
+        "study_session",
+        ["user_id", "date", "duration_seconds"],
+        unique=False,
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_routine_completion_user_date",
+        "routine_completion",
+        ["user_id", "date", "completed"],
+        unique=False,
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_daily_task_user_date_created_at",
+        "daily_task",
+        ["user_id", "date", "created_at"],
+        unique=False,
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_daily_task_user_date_created_at", table_name="daily_task")
+    op.drop_index("ix_routine_completion_user_date", table_name="routine_completion")
+    op.drop_index("ix_study_session_user_date", table_name="study_session")
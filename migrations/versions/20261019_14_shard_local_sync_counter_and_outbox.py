@@ -0,0 +1,57 @@
+"""Keep the sync change sequence and the outbox next to each user's rows.
+
+Revision ID: 20261019_14
+Revises: 20261019_13
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261019_14"
+down_revision = "20261019_13"
+branch_labels = None
+depends_on = None
+
+
+def on_shard():
+    return op.get_context().opts.get("shard_index") is not None
+
+
+def upgrade():
+    op.create_table(
+        "sync_counter",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("change_seq", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    if on_shard():
+        # Shards had no outbox: it lived in the central database.
+        op.create_table(
+            "outbox_task",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("kind", sa.String(length=40), nullable=False),
+            sa.Column("payload", sa.Text(), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("last_error", sa.Text(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        return
+    op.add_column("outbox_task", sa.Column("user_id", sa.Integer(), nullable=True))
+    op.execute("UPDATE outbox_task SET user_id = json_extract(payload, '$.user_id')")
+    with op.batch_alter_table("outbox_task") as batch_op:
+        batch_op.alter_column("user_id", existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade():
+    if on_shard():
+        op.drop_table("outbox_task")
+    else:
+        with op.batch_alter_table("outbox_task") as batch_op:
+            batch_op.drop_column("user_id")
+    op.drop_table("sync_counter")
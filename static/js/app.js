@@ -1,4 +1,5 @@
 const state = {
+  route: 'dashboard',
   timerSeconds: 0,
   timerHandle: null,
 };
@@ -20,25 +21,229 @@ const el = {
   },
 };
 
+const OUTBOX_BATCH_SIZE = 50;
+
+const offlineStore = {
+  dbPromise: null,
+  // One database per account, so a shared browser never serves one user's
+  // cached views or replays their queued writes under another login.
+  open() {
+    const userId = document.body?.dataset.userId;
+    if (!window.indexedDB || !userId) return Promise.resolve(null);
+    this.dbPromise ??= new Promise((resolve) => {
+      indexedDB.deleteDatabase('task-tracker'); // Legacy store shared by all users.
+      const request = indexedDB.open(`task-tracker-user-${userId}`, 1);
+      request.onupgradeneeded = () => {
+        request.result.createObjectStore('views');
+        request.result.createObjectStore('outbox', { keyPath: 'seq', autoIncrement: true });
+      };
+      request.onsuccess = () => resolve(request.result);
+      request.onerror = () => resolve(null);
+    });
+    return this.dbPromise;
+  },
+  async run(storeName, mode, action) {
+    const db = await this.open();
+    if (!db) return undefined;
+    return new Promise((resolve, reject) => {
+      const tx = db.transaction(storeName, mode);
+      const request = action(tx.objectStore(storeName));
+      tx.oncomplete = () => resolve(request?.result);
+      tx.onerror = () => reject(tx.error);
+    });
+  },
+  getView(url) { return this.run('views', 'readonly', (store) => store.get(url)); },
+  putView(url, data) { return this.run('views', 'readwrite', (store) => store.put(data, url)); },
+  enqueue(operation) { return this.run('outbox', 'readwrite', (store) => store.add(operation)); },
+  pending() { return this.run('outbox', 'readonly', (store) => store.getAll()); },
+  remove(seqs) { return this.run('outbox', 'readwrite', (store) => { seqs.forEach((seq) => store.delete(seq)); }); },
+  // Replaces each coalesced group with the one operation about to be sent,
+  // flagged as sent: the server may apply it even if the reply is lost.
+  markSent(items) {
+    return this.run('outbox', 'readwrite', (store) => {
+      items.forEach(({ seqs, operation }) => {
+        seqs.filter((seq) => seq !== operation.seq).forEach((seq) => store.delete(seq));
+        store.put({ ...operation, sent: true });
+      });
+    });
+  },
+};
+
+// API responses the server embedded for the first render, keyed by URL.
+// Each is served once; later requests for the same URL hit the network.
+const initialState = (() => {
+  try {
+    return JSON.parse(document.getElementById('initialState')?.textContent || '{}');
+  } catch {
+    return {};
+  }
+})();
+
+function takeInitialState(url) {
+  if (!Object.hasOwn(initialState, url)) return undefined;
+  const data = initialState[url];
+  delete initialState[url];
+  return data;
+}
+
 async function api(url, options = {}) {
-  const response = await fetch(url, {
-    credentials: 'same-origin',
-    headers: { 'Content-Type': 'application/json' },
-    ...options,
+  const method = (options.method || 'GET').toUpperCase();
+  const embedded = method === 'GET' ? takeInitialState(url) : undefined;
+  if (embedded !== undefined) {
+    offlineStore.putView(url, embedded).catch(() => {});
+    return embedded;
+  }
+  let response;
+  try {
+    response = await fetch(url, {
+      credentials: 'same-origin',
+      headers: { 'Content-Type': 'application/json' },
+      ...options,
+    });
+  } catch (error) {
+    // Offline: fall back to the last-known state of this view.
+    const cached = method === 'GET' ? await offlineStore.getView(url) : undefined;
+    if (cached !== undefined) return cached;
+    throw error;
+  }
+  if (!response.ok) {
+    const error = new Error(`Request failed: ${response.status}`);
+    error.status = response.status;
+    throw error;
+  }
+  const data = await response.json();
+  if (method === 'GET') offlineStore.putView(url, data).catch(() => {});
+  return data;
+}
+
+function newIdempotencyKey() {
+  return window.crypto?.randomUUID?.() ?? `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+}
+
+// Sends a mutation with an idempotency key. When the network is unavailable
+// the mutation is queued in IndexedDB and null is returned, so callers keep
+// their optimistic UI state instead of rolling back.
+async function mutate(url, options = {}, coalesce = null) {
+  const method = options.method || 'POST';
+  const key = newIdempotencyKey();
+  if (navigator.onLine) {
+    try {
+      return await api(url, {
+        ...options,
+        method,
+        headers: { 'Content-Type': 'application/json', 'Idempotency-Key': key },
+      });
+    } catch (error) {
+      // Rate-limited writes are queued like offline ones and replayed later.
+      if (!(error instanceof TypeError) && error.status !== 429) throw error;
+    }
+  }
+  await offlineStore.enqueue({
+    method,
+    path: url,
+    body: options.body ? JSON.parse(options.body) : null,
+    idempotency_key: key,
+    coalesce,
+  });
+  return null;
+}
+
+// Collapses queued mutations: an even number of toggles of the same item
+// cancels out, and "merge" operations on the same target keep one request
+// whose body is the union of the queued bodies (later values win). Operations
+// already sent may have reached the server, so they are resent as they are.
+function coalesceOperations(operations) {
+  const groups = new Map();
+  const ordered = [];
+  operations.forEach((operation) => {
+    const groupKey = operation.sent ? null : operation.coalesce?.key;
+    const existing = groupKey ? groups.get(groupKey) : null;
+    if (existing) {
+      existing.operations.push(operation);
+      return;
+    }
+    const group = { kind: operation.coalesce?.kind, operations: [operation] };
+    if (groupKey) groups.set(groupKey, group);
+    ordered.push(group);
   });
+
+  return ordered.map(({ kind, operations: grouped }) => {
+    const seqs = grouped.map((operation) => operation.seq);
+    const last = grouped[grouped.length - 1];
+    if (kind === 'toggle') return { seqs, operation: grouped.length % 2 ? last : null };
+    if (kind === 'merge') {
+      return { seqs, operation: { ...last, body: Object.assign({}, ...grouped.map((operation) => operation.body)) } };
+    }
+    return { seqs, operation: last };
+  });
+}
+
+let replayingOutbox = false;
+
+async function replayOutbox() {
+  if (replayingOutbox || !navigator.onLine) return;
+  replayingOutbox = true;
+  try {
+    const pending = await offlineStore.pending();
+    if (!pending?.length) return;
+    const coalesced = coalesceOperations(pending);
+    const cancelled = coalesced.filter((item) => !item.operation).flatMap((item) => item.seqs);
+    if (cancelled.length) await offlineStore.remove(cancelled);
+    const sendable = coalesced.filter((item) => item.operation);
+    for (let start = 0; start < sendable.length; start += OUTBOX_BATCH_SIZE) {
+      const chunk = sendable.slice(start, start + OUTBOX_BATCH_SIZE);
+      await offlineStore.markSent(chunk);
+      await api('/api/batch', {
+        method: 'POST',
+        body: JSON.stringify({
+          operations: chunk.map(({ operation }) => ({
+            method: operation.method,
+            path: operation.path,
+            body: operation.body,
+            idempotency_key: operation.idempotency_key,
+          })),
+        }),
+      });
+      await offlineStore.remove(chunk.flatMap((item) => item.seqs));
+    }
+    setRoute(state.route);
+  } catch {
+    // Still offline or the server is unreachable; retry on the next online event.
+  } finally {
+    replayingOutbox = false;
+  }
+}
+
+function initOfflineSupport() {
+  navigator.serviceWorker?.register('/sw.js').catch(() => {});
+  window.addEventListener('online', replayOutbox);
+  replayOutbox();
+}
+
+async function loadViewFragment(route) {
+  const view = el.views[route];
+  const target = view?.querySelector('[data-fragment-target]');
+  if (!view || !target || view.dataset.fragmentLoaded === 'true') return;
+  const response = await fetch(view.dataset.fragmentUrl, { credentials: 'same-origin' });
   if (!response.ok) throw new Error(`Request failed: ${response.status}`);
-  return response.json();
+  target.innerHTML = await response.text();
+  view.dataset.fragmentLoaded = 'true';
 }
 
 function setRoute(route) {
   const active = Object.hasOwn(el.views, route) ? route : 'dashboard';
+  state.route = active;
   Object.values(el.views).forEach((view) => view?.classList.remove('active'));
   el.views[active]?.classList.add('active');
   el.navLinks.forEach((link) => link.classList.toggle('active', link.dataset.route === active));
+  if (active === 'syllabus') loadViewFragment(active);
+  if (active === 'score-predictor') loadViewFragment(active).then(loadScoreProjection);
+  if (active === 'dashboard') loadDeadlines();
   if (active === 'routine') loadDailyRoutine();
   if (active === 'plan') loadDailyPlanner();
   if (active === 'tests') loadMockTests();
   if (active === 'analytics' || active === 'score-predictor') loadAnalyticsSummary();
+  if (active === 'analytics') loadAnalyticsHeatmap();
 }
 
 function initNavigation() {
@@ -53,97 +258,191 @@ function initNavigation() {
   });
 }
 
-async function loadDailyRoutine() {
-  const data = await api('/api/daily-routine');
-  const list = document.getElementById('routineList');
-  const subtitle = document.getElementById('routineProgress');
-  const progressBar = document.getElementById('routineProgressBar');
-  if (!list || !subtitle || !progressBar) return;
-
-  subtitle.textContent = `${data.completed_count}/${data.total_count} completed · ${data.completion_percentage}%`;
-  progressBar.style.width = `${data.completion_percentage}%`;
+function percentOf(completed, total) {
+  return total ? Math.round((completed / total) * 1000) / 10 : 0;
+}
 
-  list.innerHTML = data.items.map((item) => `
+function renderRoutineItem(item) {
+  return `
     <article class="routine-item">
       <input type="checkbox" data-routine-id="${item.id}" ${item.completed ? 'checked' : ''}>
       <span class="routine-time">${item.time_label}</span>
       <label>${item.title}</label>
       <span class="routine-tag">Fixed</span>
     </article>
-  `).join('');
+  `;
+}
+
+function renderRoutineSummary(completedCount, totalCount) {
+  const subtitle = document.getElementById('routineProgress');
+  const progressBar = document.getElementById('routineProgressBar');
+  if (!subtitle || !progressBar) return;
+  const percent = percentOf(completedCount, totalCount);
+  subtitle.textContent = `${completedCount}/${totalCount} completed · ${percent}%`;
+  progressBar.style.width = `${percent}%`;
+}
+
+function refreshRoutineSummaryFromDom() {
+  const boxes = document.querySelectorAll('#routineList [data-routine-id]');
+  if (!boxes.length) return;
+  const completed = [...boxes].filter((box) => box.checked).length;
+  renderRoutineSummary(completed, boxes.length);
+}
+
+async function loadDailyRoutine() {
+  const data = await api('/api/daily-routine');
+  const list = document.getElementById('routineList');
+  if (!list) return;
+  renderRoutineSummary(data.completed_count, data.total_count);
+  list.innerHTML = data.items.map(renderRoutineItem).join('');
+}
 
-  list.querySelectorAll('input[type="checkbox"]').forEach((checkbox) => {
-    checkbox.addEventListener('change', async () => {
-      await api('/api/daily-routine', {
+function initDailyRoutineListeners() {
+  const list = document.getElementById('routineList');
+  list?.addEventListener('change', async (event) => {
+    const checkbox = event.target.closest('[data-routine-id]');
+    if (!checkbox) return;
+    refreshRoutineSummaryFromDom();
+    try {
+      const routineId = Number(checkbox.dataset.routineId);
+      const data = await mutate('/api/daily-routine', {
         method: 'POST',
-        body: JSON.stringify({ routine_id: Number(checkbox.dataset.routineId) }),
-      });
-      loadDailyRoutine();
-    });
+        body: JSON.stringify({ routine_id: routineId }),
+      }, { kind: 'toggle', key: `routine:${routineId}` });
+      if (!data) return;
+      checkbox.checked = data.item.completed;
+      renderRoutineSummary(data.completed_count, data.total_count);
+    } catch {
+      checkbox.checked = !checkbox.checked;
+      refreshRoutineSummaryFromDom();
+    }
   });
 }
 
-async function loadDailyPlanner() {
-  const data = await api('/api/daily-planner');
-  const list = document.getElementById('dailyPlannerList');
+// Tasks created offline have a local placeholder id until the queued POST
+// is replayed; their controls stay disabled so no PATCH or DELETE is queued
+// against an id the server never issued.
+function isPendingPlannerId(id) {
+  return String(id).startsWith('pending-');
+}
+
+function renderPlannerItem(task) {
+  const disabled = isPendingPlannerId(task.id) ? 'disabled' : '';
+  return `
+    <article class="task-item" data-planner-item="${task.id}">
+      <input type="checkbox" data-task-id="${task.id}" ${task.completed ? 'checked' : ''} ${disabled}>
+      <div><strong>${task.title}</strong></div>
+      <div class="task-actions"><button type="button" data-delete-id="${task.id}" ${disabled}>Delete</button></div>
+    </article>
+  `;
+}
+
+async function loadDeadlines() {
+  const buckets = document.getElementById('deadlineBuckets');
+  const list = document.getElementById('deadlineList');
+  if (!buckets || !list) return;
+  const data = await api('/api/tasks/upcoming?fields=id,title,due_date');
+  buckets.innerHTML = `
+    <article><h3>${data.overdue.count}</h3><p>Overdue</p></article>
+    <article><h3>${data.today.count}</h3><p>Due Today</p></article>
+    <article><h3>${data.upcoming.count}</h3><p>Next ${data.days} Days</p></article>
+  `;
+  const tasks = [...data.overdue.tasks, ...data.today.tasks, ...data.upcoming.tasks];
+  list.innerHTML = tasks.length
+    ? tasks.map((task) => `<article class="task-item"><strong>${task.title}</strong><span>${task.due_date}</span></article>`).join('')
+    : '<p class="subtitle">No open deadlines.</p>';
+}
+
+function renderPlannerSummary(completedCount, totalCount, streak) {
   const meta = document.getElementById('dailyPlannerMeta');
-  const streak = document.getElementById('dailyPlannerStreak');
+  const streakNode = document.getElementById('dailyPlannerStreak');
   const bar = document.getElementById('dailyPlannerProgressBar');
-  if (!list || !meta || !streak || !bar) return;
+  if (!meta || !streakNode || !bar) return;
+  const percent = percentOf(completedCount, totalCount);
+  meta.textContent = `${completedCount}/${totalCount} completed · ${percent}% complete`;
+  if (streak !== undefined) streakNode.textContent = `Streak: ${streak} days`;
+  bar.style.width = `${percent}%`;
+}
 
-  meta.textContent = `${data.completed_count}/${data.total_count} completed · ${data.completion_percentage}% complete`;
-  streak.textContent = `Streak: ${data.streak} days`;
-  bar.style.width = `${data.completion_percentage}%`;
+function refreshPlannerSummaryFromDom() {
+  const boxes = [...document.querySelectorAll('#dailyPlannerList [data-task-id]')];
+  renderPlannerSummary(boxes.filter((box) => box.checked).length, boxes.length);
+}
 
-  list.innerHTML = data.items.map((task) => `
-    <article class="task-item">
-      <input type="checkbox" data-task-id="${task.id}" ${task.completed ? 'checked' : ''}>
-      <div><strong>${task.title}</strong></div>
-      <div class="task-actions"><button type="button" data-delete-id="${task.id}">Delete</button></div>
-    </article>
-  `).join('');
+async function loadDailyPlanner() {
+  const data = await api('/api/daily-planner');
+  const list = document.getElementById('dailyPlannerList');
+  if (!list) return;
+  renderPlannerSummary(data.completed_count, data.total_count, data.streak);
+  list.innerHTML = data.items.map(renderPlannerItem).join('');
+}
 
-  list.querySelectorAll('[data-task-id]').forEach((node) => {
-    node.addEventListener('change', async () => {
-      await api(`/api/daily-planner/${node.dataset.taskId}`, { method: 'PATCH' });
-      loadDailyPlanner();
-    });
+function initDailyPlannerListeners() {
+  const list = document.getElementById('dailyPlannerList');
+  list?.addEventListener('change', async (event) => {
+    const checkbox = event.target.closest('[data-task-id]');
+    if (!checkbox || isPendingPlannerId(checkbox.dataset.taskId)) return;
+    refreshPlannerSummaryFromDom();
+    try {
+      const taskId = checkbox.dataset.taskId;
+      const data = await mutate(`/api/daily-planner/${taskId}`, { method: 'PATCH' }, { kind: 'toggle', key: `planner:${taskId}` });
+      if (!data) return;
+      checkbox.checked = data.completed;
+      renderPlannerSummary(data.completed_count, data.total_count, data.streak);
+    } catch {
+      checkbox.checked = !checkbox.checked;
+      refreshPlannerSummaryFromDom();
+    }
   });
-  list.querySelectorAll('[data-delete-id]').forEach((node) => {
-    node.addEventListener('click', async () => {
-      await api(`/api/daily-planner/${node.dataset.deleteId}`, { method: 'DELETE' });
-      loadDailyPlanner();
-    });
+  list?.addEventListener('click', async (event) => {
+    const button = event.target.closest('[data-delete-id]');
+    if (!button || isPendingPlannerId(button.dataset.deleteId)) return;
+    const row = button.closest('[data-planner-item]');
+    const nextRow = row?.nextElementSibling ?? null;
+    row?.remove();
+    refreshPlannerSummaryFromDom();
+    try {
+      const data = await mutate(`/api/daily-planner/${button.dataset.deleteId}`, { method: 'DELETE' });
+      if (!data) return;
+      renderPlannerSummary(data.completed_count, data.total_count, data.streak);
+    } catch {
+      if (row) list.insertBefore(row, nextRow);
+      refreshPlannerSummaryFromDom();
+    }
   });
 }
 
 function initDailyPlannerCreate() {
   const input = document.getElementById('dailyTaskTitle');
   const button = document.getElementById('addDailyTaskBtn');
-  if (!input || !button) return;
+  const list = document.getElementById('dailyPlannerList');
+  if (!input || !button || !list) return;
   button.addEventListener('click', async () => {
     const title = input.value.trim();
     if (!title) return;
-    await api('/api/daily-planner', { method: 'POST', body: JSON.stringify({ title }) });
+    const placeholderId = `pending-${Date.now()}`;
+    list.insertAdjacentHTML('beforeend', renderPlannerItem({ id: placeholderId, title, completed: false }));
+    const placeholder = list.querySelector(`[data-planner-item="${placeholderId}"]`);
     input.value = '';
-    loadDailyPlanner();
+    refreshPlannerSummaryFromDom();
+    try {
+      const data = await mutate('/api/daily-planner', { method: 'POST', body: JSON.stringify({ title }) });
+      if (!data) return;
+      const existing = list.querySelector(`[data-planner-item="${data.id}"]`);
+      if (existing) placeholder?.remove();
+      else if (placeholder) placeholder.outerHTML = renderPlannerItem(data);
+      renderPlannerSummary(data.completed_count, data.total_count, data.streak);
+    } catch {
+      placeholder?.remove();
+      input.value = title;
+      refreshPlannerSummaryFromDom();
+    }
   });
 }
 
-async function loadMockTests() {
-  const data = await api('/api/mock-tests');
-  const stats = document.getElementById('mockStats');
-  const list = document.getElementById('mockTestsList');
-  if (!stats || !list) return;
-
-  stats.innerHTML = `
-    <article><h3>${data.attempted_count}/${data.total_count}</h3><p>Attempted</p></article>
-    <article><h3>${data.average_score}</h3><p>Average Score</p></article>
-    <article><h3>${data.best_score}</h3><p>Best Score</p></article>
-  `;
-
-  list.innerHTML = data.items.map((test) => `
-    <article class="task-item">
+function renderMockItem(test) {
+  return `
+    <article class="task-item" data-mock-item="${test.test_number}">
       <input type="checkbox" data-test-number="${test.test_number}" ${test.attempted ? 'checked' : ''}>
       <div>
         <strong>Mock Test ${test.test_number}</strong>
@@ -151,31 +450,82 @@ async function loadMockTests() {
       </div>
       <div class="task-meta">${test.attempt_date || 'Not attempted yet'}</div>
     </article>
-  `).join('');
+  `;
+}
 
-  list.querySelectorAll('[data-test-number]').forEach((node) => {
-    node.addEventListener('change', async () => {
-      await api(`/api/mock-tests/${node.dataset.testNumber}`, {
-        method: 'PATCH',
-        body: JSON.stringify({ attempted: node.checked, attempt_date: node.checked ? new Date().toISOString().slice(0, 10) : null }),
-      });
-      loadMockTests();
-    });
+function renderMockStats(data) {
+  const stats = document.getElementById('mockStats');
+  if (!stats) return;
+  stats.innerHTML = `
+    <article><h3>${data.attempted_count}/${data.total_count}</h3><p>Attempted</p></article>
+    <article><h3>${data.average_score}</h3><p>Average Score</p></article>
+    <article><h3>${data.best_score}</h3><p>Best Score</p></article>
+  `;
+}
+
+function refreshMockStatsFromDom() {
+  const rows = [...document.querySelectorAll('#mockTestsList [data-mock-item]')];
+  const attempted = rows.filter((row) => row.querySelector('[data-test-number]')?.checked);
+  const scores = attempted
+    .map((row) => row.querySelector('[data-score-number]')?.value)
+    .filter((value) => value !== undefined && value !== '')
+    .map(Number);
+  const round2 = (value) => Math.round(value * 100) / 100;
+  renderMockStats({
+    attempted_count: attempted.length,
+    total_count: rows.length,
+    average_score: scores.length ? round2(scores.reduce((sum, value) => sum + value, 0) / scores.length) : 0,
+    best_score: scores.length ? round2(Math.max(...scores)) : 0,
   });
+}
 
-  list.querySelectorAll('[data-score-number]').forEach((node) => {
-    node.addEventListener('change', async () => {
-      await api(`/api/mock-tests/${node.dataset.scoreNumber}`, {
-        method: 'PATCH',
-        body: JSON.stringify({ score: node.value === '' ? null : Number(node.value), attempted: true, attempt_date: new Date().toISOString().slice(0, 10) }),
-      });
-      loadMockTests();
-    });
+async function loadMockTests() {
+  const data = await api('/api/mock-tests');
+  const list = document.getElementById('mockTestsList');
+  if (!list) return;
+  renderMockStats(data);
+  list.innerHTML = data.items.map(renderMockItem).join('');
+}
+
+function initMockTestListeners() {
+  const list = document.getElementById('mockTestsList');
+  list?.addEventListener('change', async (event) => {
+    const attemptBox = event.target.closest('[data-test-number]');
+    const scoreInput = event.target.closest('[data-score-number]');
+    if (!attemptBox && !scoreInput) return;
+    const row = event.target.closest('[data-mock-item]');
+    const snapshot = row?.outerHTML;
+    const today = new Date().toISOString().slice(0, 10);
+    const testNumber = attemptBox ? attemptBox.dataset.testNumber : scoreInput.dataset.scoreNumber;
+    const body = attemptBox
+      ? { attempted: attemptBox.checked, attempt_date: attemptBox.checked ? today : null }
+      : { score: scoreInput.value === '' ? null : Number(scoreInput.value), attempted: true, attempt_date: today };
+    if (scoreInput) {
+      const box = row?.querySelector('[data-test-number]');
+      if (box) box.checked = true;
+    }
+    refreshMockStatsFromDom();
+    try {
+      const data = await mutate(
+        `/api/mock-tests/${testNumber}`,
+        { method: 'PATCH', body: JSON.stringify(body) },
+        { kind: 'merge', key: `mock:${testNumber}` },
+      );
+      if (!data) return;
+      if (row?.isConnected) row.outerHTML = renderMockItem(data.item);
+      renderMockStats(data);
+    } catch {
+      if (row?.isConnected && snapshot) row.outerHTML = snapshot;
+      refreshMockStatsFromDom();
+    }
   });
 }
 
 async function loadAnalyticsSummary() {
-  const data = await api('/api/analytics-summary');
+  renderAnalyticsSummary(await api('/api/analytics-summary'));
+}
+
+function renderAnalyticsSummary(data) {
   const analyticsGrid = document.getElementById('analyticsSummaryGrid');
   if (analyticsGrid) {
     analyticsGrid.innerHTML = `
@@ -196,6 +546,28 @@ async function loadAnalyticsSummary() {
   if (predictorConfidence) predictorConfidence.textContent = data.confidence_level;
 }
 
+function heatmapLevel(studySeconds) {
+  const hours = studySeconds / 3600;
+  if (hours <= 0) return 0;
+  if (hours < 1) return 1;
+  if (hours < 3) return 2;
+  if (hours < 5) return 3;
+  return 4;
+}
+
+async function loadAnalyticsHeatmap() {
+  const grid = document.getElementById('analyticsHeatmap');
+  if (!grid) return;
+  const data = await api('/api/analytics/heatmap');
+  // Pad the first column so each column runs Monday..Sunday.
+  const leading = (new Date(`${data.start}T00:00:00`).getDay() + 6) % 7;
+  grid.innerHTML = '<span></span>'.repeat(leading) + data.days.map((day) => {
+    const hours = (day.study_seconds / 3600).toFixed(1);
+    const title = `${day.date}: ${hours}h studied, ${day.planner_completed}/${day.planner_total} planner, ${day.routine_completed}/${data.routine_total} routine`;
+    return `<span class="heatmap-cell" data-level="${heatmapLevel(day.study_seconds)}" title="${title}"></span>`;
+  }).join('');
+}
+
 function formatTime(seconds) {
   const hrs = String(Math.floor(seconds / 3600)).padStart(2, '0');
   const mins = String(Math.floor((seconds % 3600) / 60)).padStart(2, '0');
@@ -203,40 +575,155 @@ function formatTime(seconds) {
   return `${hrs}:${mins}:${secs}`;
 }
 
+const TIMER_HEARTBEAT_MS = 30000;
+
+// The timer runs on the server; the browser only ticks the display between
+// calls and sends a heartbeat so an abandoned timer is closed server-side.
 function initTimer() {
   const display = document.getElementById('timerDisplay');
   const start = document.getElementById('timerStart');
   const pause = document.getElementById('timerPause');
   const reset = document.getElementById('timerReset');
+  let heartbeatHandle = null;
   const render = () => { if (display) display.textContent = formatTime(state.timerSeconds); };
+  const apply = (timer) => {
+    clearInterval(state.timerHandle);
+    clearInterval(heartbeatHandle);
+    state.timerHandle = null;
+    heartbeatHandle = null;
+    state.timerSeconds = timer ? timer.elapsed_seconds : 0;
+    render();
+    if (!timer) return;
+    heartbeatHandle = setInterval(() => {
+      fetch('/api/timer/heartbeat', { method: 'POST', credentials: 'same-origin' }).catch(() => {});
+    }, TIMER_HEARTBEAT_MS);
+    if (timer.running) {
+      state.timerHandle = setInterval(() => { state.timerSeconds += 1; render(); }, 1000);
+    }
+  };
 
-  start?.addEventListener('click', () => {
+  start?.addEventListener('click', async () => {
     if (state.timerHandle) return;
-    state.timerHandle = setInterval(() => { state.timerSeconds += 1; render(); }, 1000);
+    apply((await api('/api/timer/start', { method: 'POST' })).timer);
   });
-  pause?.addEventListener('click', () => {
-    clearInterval(state.timerHandle);
-    state.timerHandle = null;
+  pause?.addEventListener('click', async () => {
+    if (!state.timerHandle) return;
+    apply((await api('/api/timer/pause', { method: 'POST' })).timer);
   });
-  reset?.addEventListener('click', () => {
-    clearInterval(state.timerHandle);
-    state.timerHandle = null;
-    state.timerSeconds = 0;
-    render();
+  reset?.addEventListener('click', async () => {
+    const data = await api('/api/timer/stop', { method: 'POST' }).catch(() => null);
+    apply(null);
+    if (data) liveEventHandlers['session.logged'](data);
   });
+  fetch('/api/timer', { credentials: 'same-origin' })
+    .then((response) => (response.ok ? response.json() : { timer: null }))
+    .then((data) => apply(data.timer))
+    .catch(() => {});
+}
+
+function markScorePredictorStale() {
+  const predictorView = el.views['score-predictor'];
+  if (predictorView && !predictorView.classList.contains('active')) {
+    predictorView.dataset.fragmentLoaded = 'false';
+  }
+}
+
+async function loadScoreProjection() {
+  const container = document.getElementById('scoreProjection');
+  if (!container) return;
+  try {
+    const data = await api('/api/score-projection');
+    container.innerHTML = `
+      <article><h3>${data.percentiles.p10}</h3><p>Pessimistic (10th percentile)</p></article>
+      <article><h3>${data.percentiles.p50}</h3><p>Median in ${data.days_remaining} days</p></article>
+      <article><h3>${data.percentiles.p90}</h3><p>Optimistic (90th percentile)</p></article>
+    `;
+  } catch {
+    container.innerHTML = '<p class="subtitle">Set an exam date in settings to see a projection.</p>';
+  }
 }
 
 function initSyllabusListeners() {
   document.addEventListener('change', async (event) => {
     const target = event.target;
     if (!target.classList?.contains('syllabus-toggle')) return;
-    await api('/api/syllabus-progress', {
+    await mutate('/api/syllabus-progress', {
       method: 'POST',
       body: JSON.stringify({
         topic_id: Number(target.dataset.topicId),
         field: target.dataset.field,
         value: target.checked,
       }),
+    }, { kind: 'merge', key: `syllabus:${target.dataset.topicId}:${target.dataset.field}` });
+    markScorePredictorStale();
+  });
+}
+
+const liveEventHandlers = {
+  'routine.toggled': (event) => {
+    const checkbox = document.querySelector(`#routineList [data-routine-id="${event.routine_id}"]`);
+    if (!checkbox) return;
+    checkbox.checked = event.completed;
+    refreshRoutineSummaryFromDom();
+  },
+  'planner.added': (event) => {
+    const list = document.getElementById('dailyPlannerList');
+    if (!list || list.querySelector(`[data-planner-item="${event.item.id}"]`)) return;
+    if (event.item.date !== new Date().toISOString().slice(0, 10)) return;
+    list.insertAdjacentHTML('beforeend', renderPlannerItem(event.item));
+    refreshPlannerSummaryFromDom();
+  },
+  'planner.toggled': (event) => {
+    const checkbox = document.querySelector(`#dailyPlannerList [data-task-id="${event.id}"]`);
+    if (!checkbox) return;
+    checkbox.checked = event.completed;
+    refreshPlannerSummaryFromDom();
+  },
+  'planner.deleted': (event) => {
+    document.querySelector(`#dailyPlannerList [data-planner-item="${event.id}"]`)?.remove();
+    refreshPlannerSummaryFromDom();
+  },
+  'mock.updated': (event) => {
+    const row = document.querySelector(`#mockTestsList [data-mock-item="${event.item.test_number}"]`);
+    if (!row) return;
+    row.outerHTML = renderMockItem(event.item);
+    refreshMockStatsFromDom();
+  },
+  'syllabus.changed': (event) => {
+    const selector = `.syllabus-toggle[data-topic-id="${event.topic_id}"][data-field="${event.field}"]`;
+    document.querySelectorAll(selector).forEach((checkbox) => { checkbox.checked = event.value; });
+    markScorePredictorStale();
+  },
+  'analytics.updated': (event) => renderAnalyticsSummary(event.summary),
+  'session.logged': (event) => {
+    const today = document.getElementById('hoursToday');
+    const week = document.getElementById('hoursWeek');
+    if (today) today.textContent = event.today_hours;
+    if (week) week.textContent = event.week_hours;
+  },
+  resync: () => setRoute(state.route),
+};
+
+// Change events carry absolute state and can arrive out of order, so each
+// carries its event-log id as `seq`. One that is not newer than the last
+// applied event (or the rendered page) would roll state back: reload the
+// view from the API instead of applying it.
+let lastEventSeq = Number(document.body?.dataset.eventSeq || 0);
+
+function initLiveUpdates() {
+  if (!window.EventSource) return;
+  const source = new EventSource('/api/events');
+  Object.entries(liveEventHandlers).forEach(([type, handler]) => {
+    source.addEventListener(type, (message) => {
+      const event = JSON.parse(message.data);
+      if (event.seq !== undefined) {
+        if (event.seq <= lastEventSeq) {
+          liveEventHandlers.resync();
+          return;
+        }
+        lastEventSeq = event.seq;
+      }
+      handler(event);
     });
   });
 }
@@ -245,9 +732,14 @@ function bootstrap() {
   const initialRoute = document.body?.dataset.initialRoute || 'dashboard';
   setRoute(initialRoute);
   initNavigation();
+  initDailyRoutineListeners();
+  initDailyPlannerListeners();
   initDailyPlannerCreate();
+  initMockTestListeners();
   initSyllabusListeners();
   initTimer();
+  initLiveUpdates();
+  initOfflineSupport();
 }
 
 document.addEventListener('DOMContentLoaded', bootstrap);
@@ -0,0 +1,50 @@
+const SHELL_CACHE = 'tracker-shell-v2';
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', (event) => {
+  event.waitUntil((async () => {
+    const names = await caches.keys();
+    await Promise.all(names.filter((name) => name !== SHELL_CACHE).map((name) => caches.delete(name)));
+    await self.clients.claim();
+  })());
+});
+
+async function cacheFirst(request) {
+  const cached = await caches.match(request);
+  if (cached) return cached;
+  const response = await fetch(request);
+  if (response.ok) (await caches.open(SHELL_CACHE)).put(request, response.clone());
+  return response;
+}
+
+async function networkFirst(request) {
+  try {
+    const response = await fetch(request);
+    if (response.ok) (await caches.open(SHELL_CACHE)).put(request, response.clone());
+    return response;
+  } catch (error) {
+    const cached = await caches.match(request);
+    if (cached) return cached;
+    throw error;
+  }
+}
+
+self.addEventListener('fetch', (event) => {
+  const { request } = event;
+  if (request.method !== 'GET') return;
+  const url = new URL(request.url);
+  // API state lives in IndexedDB (see app.js); the SSE stream must not be cached.
+  if (url.origin !== self.location.origin || url.pathname.startsWith('/api/')) return;
+  // Only fingerprinted /assets/ URLs are immutable; unhashed /static/ files
+  // change in place, so they are revalidated and the cache is just a fallback.
+  if (url.pathname.startsWith('/assets/')) {
+    event.respondWith(cacheFirst(request));
+  } else if (
+    request.mode === 'navigate'
+    || url.pathname.startsWith('/static/')
+    || url.pathname.startsWith('/fragments/')
+  ) {
+    event.respondWith(networkFirst(request));
+  }
+});
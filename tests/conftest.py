@@ -2,17 +2,20 @@ from __future__ import annotations
 
 import pytest
 
-from app import create_app, db
+from app import create_app, db, stop_background_workers
 
 
 @pytest.fixture()
 def app(tmp_path):
     database_path = tmp_path / "test_tracker.db"
-    flask_app = create_app()
-    flask_app.config.update(
-        TESTING=True,
-        SQLALCHEMY_DATABASE_URI=f"sqlite:///{database_path}",
-        SECRET_KEY="test-secret",
+    flask_app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database_path}",
+            "SECRET_KEY": "test-secret",
+            "ANALYTICS_SCHEDULER_ENABLED": False,
+            "SIDE_EFFECT_WORKERS": 0,
+        }
     )
 
     with flask_app.app_context():
@@ -22,6 +25,7 @@ def app(tmp_path):
 
     yield flask_app
 
+    stop_background_workers(flask_app)
     with flask_app.app_context():
         db.session.remove()
         db.drop_all()
@@ -1,8 +1,20 @@
 from __future__ import annotations
 
+import gzip
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
 from datetime import date, timedelta
+from pathlib import Path
 from unittest.mock import Mock
 
+import pytest
+from alembic.script import ScriptDirectory
+from sqlalchemy import event
+
 import app as tracker_app
 from app import Task, User, create_app, db, get_or_create_settings
 
@@ -30,13 +42,26 @@ def _admin_login(client, username="admin", password="admin123"):
     )
 
 
+def _query_plan(sql, parameters=()):
+    """Return the detail column of SQLite's EXPLAIN QUERY PLAN for ``sql``."""
+
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
 def test_first_request_auto_creates_schema_for_account_creation(tmp_path):
     database_path = tmp_path / "fresh_runtime.db"
-    flask_app = create_app()
-    flask_app.config.update(
-        TESTING=True,
-        SQLALCHEMY_DATABASE_URI=f"sqlite:///{database_path}",
-        SECRET_KEY="test-secret",
+    flask_app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database_path}",
+            "SECRET_KEY": "test-secret",
+        }
     )
     client = flask_app.test_client()
 
@@ -53,6 +78,7 @@ def test_first_request_auto_creates_schema_for_account_creation(tmp_path):
     with flask_app.app_context():
         created_user = User.query.filter_by(username="runtime_user").first()
         assert created_user is not None
+    tracker_app.stop_background_workers(flask_app)
 
 
 def test_root_redirects_to_login_when_unauthenticated(client):
@@ -110,6 +136,8 @@ def test_dashboard_template_uses_route_links(auth_client):
     assert 'href="/dashboard"' in body
     assert 'href="/downloads"' in body
     assert 'href="#downloads"' not in body
+    user_id = auth_client.get("/api/me").get_json()["user"]["id"]
+    assert f'data-user-id="{user_id}"' in body
 
 
 def test_login_form_redirects_to_dashboard_on_success(client):
@@ -464,3 +492,1758 @@ def test_score_predictor_reaches_jrf_category_with_full_progress(auth_client, ap
     body = response.get_data(as_text=True)
     assert "200.0" in body or "200" in body
     assert "High" in body
+
+
+def test_non_syllabus_pages_skip_syllabus_and_analytics(auth_client, monkeypatch):
+    syllabus_spy = Mock(side_effect=tracker_app.compute_syllabus_progress)
+    analytics_spy = Mock(side_effect=tracker_app.compute_analytics_summary)
+    monkeypatch.setattr(tracker_app, "compute_syllabus_progress", syllabus_spy)
+    monkeypatch.setattr(tracker_app, "compute_analytics_summary", analytics_spy)
+
+    response = auth_client.get("/settings")
+
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'data-fragment-url="/fragments/syllabus"' in body
+    assert "syllabus-toggle" not in body
+    syllabus_spy.assert_not_called()
+    analytics_spy.assert_not_called()
+
+
+def _embedded_initial_state(body):
+    match = re.search(r'<script id="initialState" type="application/json">(.*?)</script>', body)
+    assert match is not None
+    return json.loads(match.group(1))
+
+
+def test_pages_embed_initial_state_matching_api_responses(auth_client):
+    auth_client.post("/api/daily-planner", json={"title": "Revise <Jordan> forms"})
+    app_js = (Path(tracker_app.__file__).parent / "static" / "js" / "app.js").read_text()
+
+    for route, builders in tracker_app.INITIAL_STATE_BUILDERS.items():
+        state = _embedded_initial_state(auth_client.get(f"/{route}").get_data(as_text=True))
+        assert set(state) == set(builders)
+        for url, payload in state.items():
+            assert f"'{url}'" in app_js
+            assert payload == auth_client.get(url).get_json()
+
+    assert _embedded_initial_state(auth_client.get("/settings").get_data(as_text=True)) == {}
+
+
+def test_score_predictor_page_loads_the_analytics_summary_once(auth_client, monkeypatch):
+    load = Mock(wraps=tracker_app.load_analytics_summary)
+    monkeypatch.setattr(tracker_app, "load_analytics_summary", load)
+
+    body = auth_client.get("/score-predictor").get_data(as_text=True)
+
+    assert load.call_count == 1
+    assert set(_embedded_initial_state(body)) == {"/api/analytics-summary"}
+
+
+def test_view_fragments_render_partials(auth_client):
+    syllabus = auth_client.get("/fragments/syllabus")
+    assert syllabus.status_code == 200
+    assert "syllabus-toggle" in syllabus.get_data(as_text=True)
+
+    predictor = auth_client.get("/fragments/score-predictor")
+    assert predictor.status_code == 200
+    assert "Final Predicted Score / 200" in predictor.get_data(as_text=True)
+
+    auth_client.post("/api/logout")
+    assert auth_client.get("/fragments/syllabus").status_code == 401
+
+
+def test_fragment_cache_evicts_least_recently_used_within_byte_cap():
+    cache = tracker_app.FragmentCache(max_bytes=10)
+    cache.set(("a",), "aaaa")
+    cache.set(("b",), "bbbb")
+    assert cache.get(("a",)) == "aaaa"
+
+    cache.set(("c",), "cccc")
+
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == "aaaa"
+    assert cache.current_bytes == 8
+
+    cache.set(("huge",), "x" * 11)
+    assert cache.get(("huge",)) is None
+
+
+def test_syllabus_fragment_is_cached_until_progress_changes(auth_client, monkeypatch):
+    first = auth_client.get("/fragments/syllabus").get_data(as_text=True)
+
+    syllabus_spy = Mock(side_effect=tracker_app.compute_syllabus_progress)
+    monkeypatch.setattr(tracker_app, "compute_syllabus_progress", syllabus_spy)
+    assert auth_client.get("/fragments/syllabus").get_data(as_text=True) == first
+    syllabus_spy.assert_not_called()
+
+    grouped = auth_client.get("/api/syllabus-progress").get_json()["grouped_topics"]
+    topic_id = next(iter(grouped.values()))[0]["topic_id"]
+    syllabus_spy.reset_mock()
+    auth_client.post(
+        "/api/syllabus-progress",
+        json={"topic_id": topic_id, "field": "theory_completed", "value": True},
+    )
+
+    refreshed = auth_client.get("/fragments/syllabus").get_data(as_text=True)
+    assert refreshed != first
+    syllabus_spy.assert_called_once()
+
+
+def test_collected_assets_are_fingerprinted_and_served_immutable(app, tmp_path):
+    output_dir = tmp_path / "dist"
+    manifest = tracker_app.collect_static_assets(
+        tracker_app.STATIC_DIR, output_dir
+    )
+    hashed_js = manifest["js/app.js"]
+    assert hashed_js != "js/app.js"
+    assert (output_dir / f"{hashed_js}.gz").is_file()
+
+    app.config["ASSET_OUTPUT_DIR"] = str(output_dir)
+    client = app.test_client()
+    client.post("/api/admin/login", json={"username": "admin", "password": "admin123"})
+    client.post("/api/register", json={"username": "alice", "password": "secret"})
+    client.post("/api/login", json={"username": "alice", "password": "secret"})
+
+    body = client.get("/dashboard").get_data(as_text=True)
+    assert f"/assets/{hashed_js}" in body
+
+    gzipped = client.get(f"/assets/{hashed_js}", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.status_code == 200
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert "immutable" in gzipped.headers["Cache-Control"]
+    assert "max-age=31536000" in gzipped.headers["Cache-Control"]
+    assert "Accept-Encoding" in gzipped.headers["Vary"]
+
+    plain = client.get(f"/assets/{hashed_js}", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    assert plain.mimetype in {"text/javascript", "application/javascript"}
+
+
+def test_large_json_responses_are_gzip_compressed(auth_client):
+    plain = auth_client.get("/api/syllabus-progress")
+    assert "Content-Encoding" not in plain.headers
+
+    response = auth_client.get(
+        "/api/syllabus-progress", headers={"Accept-Encoding": "gzip"}
+    )
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    decoded = json.loads(gzip.decompress(response.get_data()))
+    assert decoded == plain.get_json()
+
+
+def test_small_responses_skip_compression(auth_client):
+    response = auth_client.get("/api/me", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json()["user"]["username"] == "alice"
+
+
+def test_streamed_task_list_supports_deflate(auth_client, app):
+    with app.app_context():
+        alice = User.query.filter_by(username="alice").first()
+        for index in range(3):
+            _create_task(alice.id, title=f"Task {index}")
+
+    response = auth_client.get("/api/tasks", headers={"Accept-Encoding": "deflate"})
+
+    assert response.is_streamed
+    assert response.headers["Content-Encoding"] == "deflate"
+    tasks = json.loads(zlib.decompress(response.get_data()))["tasks"]
+    assert sorted(task["title"] for task in tasks) == ["Task 0", "Task 1", "Task 2"]
+
+
+def test_streamed_task_list_does_not_block_writers(auth_client, app):
+    with app.app_context():
+        alice = User.query.filter_by(username="alice").first()
+        db.session.add_all(
+            Task(user_id=alice.id, title=f"Task {index}", unit="Algebra", topic="Rings")
+            for index in range(2000)
+        )
+        db.session.commit()
+        database_path = db.engine.url.database
+
+    response = auth_client.get("/api/tasks", buffered=False)
+    body = iter(response.response)
+    next(body)
+
+    # A writer that will not wait must still commit while the client reads.
+    connection = sqlite3.connect(database_path, timeout=0)
+    try:
+        connection.execute("UPDATE task SET notes = 'edited' WHERE id = 1")
+        connection.commit()
+    finally:
+        connection.close()
+        response.close()
+
+
+def test_task_rows_serialize_like_to_dict(auth_client, app):
+    with app.app_context():
+        alice = User.query.filter_by(username="alice").first()
+        task = _create_task(alice.id, due_date=date(2030, 1, 2), completed=True)
+        expected = task.to_dict()
+
+    payload = auth_client.get("/api/tasks").get_json()
+
+    assert payload["tasks"] == [expected]
+
+
+def test_list_endpoints_support_sparse_fieldsets(auth_client, app):
+    with app.app_context():
+        alice = User.query.filter_by(username="alice").first()
+        _create_task(alice.id, title="Sparse")
+
+    tasks = auth_client.get("/api/tasks?fields=id,title,completed").get_json()["tasks"]
+    assert set(tasks[0]) == {"id", "title", "completed"}
+    assert tasks[0]["title"] == "Sparse"
+
+    auth_client.post("/api/daily-planner", json={"title": "Plan"})
+    planner = auth_client.get("/api/daily-planner?fields=title").get_json()
+    assert planner["items"] == [{"title": "Plan"}]
+    assert planner["total_count"] == 1
+
+    mocks = auth_client.get("/api/mock-tests?fields=test_number").get_json()
+    assert mocks["items"][0] == {"test_number": 1}
+    assert mocks["total_count"] == 10
+
+    invalid = auth_client.get("/api/tasks?fields=id,password_hash")
+    assert invalid.status_code == 400
+    assert "fields must be a subset" in invalid.get_json()["error"]
+
+
+def test_sync_returns_only_changes_since_token(auth_client):
+    full = auth_client.get("/api/sync").get_json()
+    assert full["full"] is True
+    token = full["token"]
+
+    created = auth_client.post(
+        "/api/tasks", json={"title": "Delta", "unit": "Algebra", "topic": "Rings"}
+    ).get_json()
+    planner = auth_client.post("/api/daily-planner", json={"title": "Plan"}).get_json()
+
+    delta = auth_client.get(f"/api/sync?since={token}").get_json()
+    assert delta["full"] is False
+    assert [task["id"] for task in delta["changes"]["tasks"]] == [created["id"]]
+    assert [task["id"] for task in delta["changes"]["daily_tasks"]] == [planner["id"]]
+    assert delta["changes"]["mock_tests"] == []
+    assert int(delta["token"]) > int(token)
+
+    unchanged = auth_client.get(f"/api/sync?since={delta['token']}").get_json()
+    assert all(items == [] for items in unchanged["changes"].values())
+
+
+def test_sync_reports_deleted_rows_as_tombstones(auth_client):
+    created = auth_client.post(
+        "/api/tasks", json={"title": "Gone", "unit": "Algebra", "topic": "Rings"}
+    ).get_json()
+    token = auth_client.get("/api/sync").get_json()["token"]
+
+    auth_client.delete(f"/api/tasks/{created['id']}")
+
+    delta = auth_client.get(f"/api/sync?since={token}").get_json()
+    assert delta["deleted"]["tasks"] == [created["id"]]
+    assert delta["changes"]["tasks"] == []
+
+
+def test_sync_rejects_malformed_token(auth_client):
+    response = auth_client.get("/api/sync?since=abc")
+
+    assert response.status_code == 400
+
+
+def test_event_stream_receives_changes_from_mutating_routes(auth_client, app):
+    stream = auth_client.get("/api/events", buffered=False)
+    assert stream.mimetype == "text/event-stream"
+    chunks = iter(stream.response)
+    assert next(chunks).startswith(b"retry:")
+
+    routine_id = auth_client.get("/api/daily-routine").get_json()["items"][0]["id"]
+    auth_client.post("/api/daily-routine", json={"routine_id": routine_id})
+
+    event = next(chunks).decode()
+    assert event.startswith("event: routine.toggled\n")
+    data = json.loads(event.split("data: ", 1)[1])
+    with app.app_context():
+        alice = User.query.filter_by(username="alice").first()
+        seq = tracker_app.latest_event_id(alice.id)
+    assert data == {
+        "type": "routine.toggled",
+        "seq": seq,
+        "routine_id": routine_id,
+        "completed": True,
+    }
+
+    stream.close()
+    with app.app_context():
+        alice = User.query.filter_by(username="alice").first()
+        assert app.extensions["event_broker"].subscriber_count(alice.id) == 0
+
+
+def test_event_broker_replaces_overflowing_backlog_with_resync():
+    broker = tracker_app.EventBroker(max_queue_size=2)
+    subscriber = broker.subscribe(1)
+    for index in range(3):
+        broker.publish(1, {"type": "planner.added", "index": index})
+    broker.publish(2, {"type": "planner.added"})
+
+    assert subscriber.get_nowait() == tracker_app.RESYNC_EVENT
+    assert subscriber.empty()
+
+
+def test_sqlite_event_relay_fans_out_across_brokers(tmp_path):
+    path = str(tmp_path / "events.db")
+    publisher = tracker_app.SQLiteEventRelay(path, poll_interval=60)
+    listener = tracker_app.SQLiteEventRelay(path, poll_interval=60)
+    try:
+        subscriber = listener.subscribe(7)
+        publisher.publish(7, {"type": "session.logged", "duration_seconds": 60})
+        listener.poll()
+        assert subscriber.get_nowait()["type"] == "session.logged"
+    finally:
+        publisher.close()
+        listener.close()
+
+
+def test_routine_toggle_returns_only_changed_item_and_counters(auth_client):
+    items = auth_client.get("/api/daily-routine").get_json()["items"]
+
+    payload = auth_client.post(
+        "/api/daily-routine", json={"routine_id": items[1]["id"]}
+    ).get_json()
+
+    assert "items" not in payload
+    assert payload["item"]["id"] == items[1]["id"]
+    assert payload["item"]["completed"] is True
+    assert payload["completed_count"] == 1
+    assert payload["total_count"] == len(items)
+
+    missing = auth_client.post("/api/daily-routine", json={"routine_id": 9999})
+    assert missing.status_code == 404
+
+
+def test_planner_mutations_return_updated_counters(auth_client):
+    first = auth_client.post("/api/daily-planner", json={"title": "One"}).get_json()
+    second = auth_client.post("/api/daily-planner", json={"title": "Two"}).get_json()
+    assert second["total_count"] == 2
+
+    toggled = auth_client.patch(f"/api/daily-planner/{first['id']}").get_json()
+    assert toggled["completed"] is True
+    assert toggled["completed_count"] == 1
+    assert toggled["completion_percentage"] == 50.0
+    assert toggled["streak"] == 1
+
+    deleted = auth_client.delete(f"/api/daily-planner/{second['id']}").get_json()
+    assert deleted["total_count"] == 1
+    assert deleted["completion_percentage"] == 100.0
+
+
+def test_mock_test_update_returns_summary_without_item_list(auth_client):
+    auth_client.get("/api/mock-tests")
+    auth_client.patch("/api/mock-tests/1", json={"attempted": True, "score": 120})
+
+    payload = auth_client.patch(
+        "/api/mock-tests/2", json={"attempted": True, "score": 90.5}
+    ).get_json()
+
+    assert "items" not in payload
+    assert payload["item"]["score"] == 90.5
+    full = auth_client.get("/api/mock-tests").get_json()
+    for key in ["attempted_count", "total_count", "attempt_percent", "average_score", "best_score"]:
+        assert payload[key] == full[key]
+    assert payload["average_score"] == 105.25
+
+
+def test_idempotency_key_replays_mutation_instead_of_repeating_it(auth_client):
+    routine_id = auth_client.get("/api/daily-routine").get_json()["items"][0]["id"]
+    headers = {"Idempotency-Key": "toggle-1"}
+
+    first = auth_client.post(
+        "/api/daily-routine", json={"routine_id": routine_id}, headers=headers
+    )
+    replay = auth_client.post(
+        "/api/daily-routine", json={"routine_id": routine_id}, headers=headers
+    )
+
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.get_json() == first.get_json()
+    items = auth_client.get("/api/daily-routine").get_json()["items"]
+    assert items[0]["completed"] is True
+
+    misuse = auth_client.post(
+        "/api/daily-planner", json={"title": "Other"}, headers=headers
+    )
+    assert misuse.status_code == 422
+
+
+def test_concurrent_duplicate_idempotency_key_applies_mutation_once(
+    app, auth_client, monkeypatch
+):
+    entered, release = threading.Event(), threading.Event()
+    invalidate = tracker_app.invalidate_heatmap_day
+
+    def blocking_invalidate(user, day):
+        entered.set()
+        release.wait(5)
+        return invalidate(user, day)
+
+    monkeypatch.setattr(tracker_app, "invalidate_heatmap_day", blocking_invalidate)
+    clients = [app.test_client() for _ in range(2)]
+    for client in clients:
+        client.post("/api/login", json={"username": "alice", "password": "password123"})
+    headers = {"Idempotency-Key": "create-1"}
+    responses = {}
+
+    def create(name, client):
+        responses[name] = client.post(
+            "/api/daily-planner", json={"title": "Once"}, headers=headers
+        )
+
+    first = threading.Thread(target=create, args=("first", clients[0]))
+    first.start()
+    assert entered.wait(5)
+
+    monkeypatch.setattr(tracker_app, "IDEMPOTENCY_WAIT_SECONDS", 0)
+    busy = auth_client.post("/api/daily-planner", json={"title": "Once"}, headers=headers)
+    assert busy.status_code == 409
+    assert busy.headers["Retry-After"]
+
+    monkeypatch.setattr(tracker_app, "IDEMPOTENCY_WAIT_SECONDS", 5)
+    second = threading.Thread(target=create, args=("second", clients[1]))
+    second.start()
+    time.sleep(0.2)
+    release.set()
+    first.join()
+    second.join()
+
+    assert responses["first"].status_code == 201
+    assert responses["second"].status_code == 201
+    assert responses["second"].headers["Idempotent-Replayed"] == "true"
+    assert responses["second"].get_json() == responses["first"].get_json()
+    assert auth_client.get("/api/daily-planner").get_json()["total_count"] == 1
+
+
+def test_failed_idempotent_request_releases_its_key(auth_client, monkeypatch):
+    def fail(user, day):
+        raise RuntimeError("boom")
+
+    headers = {"Idempotency-Key": "create-2"}
+    with monkeypatch.context() as patch:
+        patch.setattr(tracker_app, "invalidate_heatmap_day", fail)
+        with pytest.raises(RuntimeError):
+            auth_client.post("/api/daily-planner", json={"title": "Retry"}, headers=headers)
+
+    retry = auth_client.post("/api/daily-planner", json={"title": "Retry"}, headers=headers)
+
+    assert retry.status_code == 201
+    assert "Idempotent-Replayed" not in retry.headers
+
+
+def test_rejected_idempotent_request_does_not_commit_partial_changes(auth_client):
+    response = auth_client.patch(
+        "/api/mock-tests/1",
+        json={"attempted": True, "attempt_date": "not a date"},
+        headers={"Idempotency-Key": "mock-1"},
+    )
+
+    assert response.status_code == 400
+    item = auth_client.get("/api/mock-tests").get_json()["items"][0]
+    assert item["attempted"] is False
+
+
+def test_failed_batch_operation_does_not_leak_into_the_next(auth_client):
+    response = auth_client.post(
+        "/api/batch",
+        json={
+            "operations": [
+                {
+                    "method": "PATCH",
+                    "path": "/api/mock-tests/1",
+                    "body": {"attempted": True, "score": "high"},
+                },
+                {
+                    "method": "POST",
+                    "path": "/api/daily-planner",
+                    "body": {"title": "After the failure"},
+                },
+            ]
+        },
+    )
+
+    assert [result["status"] for result in response.get_json()["results"]] == [400, 201]
+    item = auth_client.get("/api/mock-tests").get_json()["items"][0]
+    assert item["attempted"] is False
+
+
+def test_batch_replays_queued_operations_in_order(auth_client):
+    routine_id = auth_client.get("/api/daily-routine").get_json()["items"][0]["id"]
+
+    response = auth_client.post(
+        "/api/batch",
+        json={
+            "operations": [
+                {
+                    "method": "POST",
+                    "path": "/api/daily-planner",
+                    "body": {"title": "Offline task"},
+                    "idempotency_key": "op-1",
+                },
+                {
+                    "method": "POST",
+                    "path": "/api/daily-routine",
+                    "body": {"routine_id": routine_id},
+                    "idempotency_key": "op-2",
+                },
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result["status"] for result in results] == [201, 200]
+    assert results[0]["body"]["title"] == "Offline task"
+
+    again = auth_client.post(
+        "/api/batch",
+        json={
+            "operations": [
+                {
+                    "method": "POST",
+                    "path": "/api/daily-planner",
+                    "body": {"title": "Offline task"},
+                    "idempotency_key": "op-1",
+                }
+            ]
+        },
+    )
+    assert again.get_json()["results"][0]["body"]["id"] == results[0]["body"]["id"]
+    assert auth_client.get("/api/daily-planner").get_json()["total_count"] == 1
+
+
+def test_batch_operations_run_as_plain_subrequests(app, auth_client):
+    app.config["COMPRESSION_MIN_BYTES"] = 0
+
+    response = auth_client.post(
+        "/api/batch",
+        json={
+            "operations": [
+                {
+                    "method": "POST",
+                    "path": "/api/daily-planner",
+                    "body": {"title": "Compressed?"},
+                    "idempotency_key": "op-3",
+                },
+                {"method": "DELETE", "path": "/api/daily-planner/999999"},
+            ]
+        },
+        headers={"Accept-Encoding": "gzip", "Idempotency-Key": "outer"},
+    )
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    results = json.loads(gzip.decompress(response.data))["results"]
+    assert results[0]["status"] == 201
+    assert results[0]["body"]["title"] == "Compressed?"
+    assert results[1]["status"] == 404
+
+
+def test_batch_rejects_non_api_operations(auth_client):
+    response = auth_client.post(
+        "/api/batch",
+        json={"operations": [{"method": "GET", "path": "/admin"}]},
+    )
+
+    assert response.status_code == 400
+
+
+def test_service_worker_is_served_from_root_scope(client):
+    response = client.get("/sw.js")
+
+    assert response.status_code == 200
+    assert response.headers["Service-Worker-Allowed"] == "/"
+    assert "no-cache" in response.headers["Cache-Control"]
+
+
+def test_heatmap_returns_one_entry_per_day_with_activity_totals(app, auth_client):
+    today = date.today()
+    auth_client.post("/api/study-session", json={"duration_seconds": 1800})
+    auth_client.post("/api/study-session", json={"duration_seconds": 600})
+    auth_client.post("/api/daily-planner", json={"title": "Revise rings"})
+
+    response = auth_client.get(
+        f"/api/analytics/heatmap?start={(today - timedelta(days=6)).isoformat()}&end={today.isoformat()}"
+    )
+
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert len(payload["days"]) == 7
+    assert payload["days"][0]["study_seconds"] == 0
+    assert payload["days"][-1] == {
+        "date": today.isoformat(),
+        "study_seconds": 2400,
+        "planner_completed": 0,
+        "planner_total": 1,
+        "routine_completed": 0,
+    }
+    assert auth_client.get("/api/analytics/heatmap?start=2020-01-01&end=2026-01-01").status_code == 400
+
+
+def test_heatmap_caches_finished_months_until_back_dated_planner_write(app, auth_client):
+    past_day = date.today().replace(day=1) - timedelta(days=40)
+    query = f"/api/analytics/heatmap?start={past_day.isoformat()}&end={past_day.isoformat()}"
+    with app.app_context():
+        user_id = User.query.filter_by(username="alice").one().id
+        db.session.add(tracker_app.StudySession(user_id=user_id, date=past_day, duration_seconds=900))
+        db.session.commit()
+
+    assert auth_client.get(query).get_json()["days"][0]["study_seconds"] == 900
+
+    with app.app_context():
+        db.session.add(tracker_app.StudySession(user_id=user_id, date=past_day, duration_seconds=100))
+        db.session.commit()
+
+    assert auth_client.get(query).get_json()["days"][0]["study_seconds"] == 900
+
+    auth_client.post("/api/daily-planner", json={"title": "Back-dated", "date": past_day.isoformat()})
+    day = auth_client.get(query).get_json()["days"][0]
+    assert day["study_seconds"] == 1000
+    assert day["planner_total"] == 1
+
+
+def test_heatmap_invalidation_covers_every_month_a_session_spans(app, auth_client):
+    first_day = date.today().replace(day=1) - timedelta(days=45)
+    second_day = first_day + timedelta(days=31)
+    query = f"/api/analytics/heatmap?start={first_day.isoformat()}&end={second_day.isoformat()}"
+
+    def study_seconds():
+        days = {day["date"]: day for day in auth_client.get(query).get_json()["days"]}
+        return [days[day.isoformat()]["study_seconds"] for day in (first_day, second_day)]
+
+    assert study_seconds() == [0, 0]
+    with app.app_context():
+        user_id = User.query.filter_by(username="alice").one().id
+        for day in (first_day, second_day):
+            db.session.add(tracker_app.StudySession(user_id=user_id, date=day, duration_seconds=600))
+        db.session.commit()
+    assert study_seconds() == [0, 0]
+
+    with app.app_context():
+        tracker_app.invalidate_heatmap_days(user_id, first_day, date.today())
+        db.session.commit()
+    assert study_seconds() == [600, 600]
+
+
+def test_cohort_report_matches_per_user_analytics(app, client):
+    _admin_login(client)
+    assert client.get("/api/admin/cohort-report").status_code == 200
+
+    client.post("/api/register", json={"username": "bob", "password": "password123"})
+    client.post("/api/register", json={"username": "carol", "password": "password123"})
+    client.post("/api/admin/logout")
+    client.post("/api/login", json={"username": "bob", "password": "password123"})
+    client.post("/api/study-session", json={"duration_seconds": 7200})
+    client.patch("/api/mock-tests/1", json={"attempted": True, "score": 120})
+    with app.app_context():
+        topic_id = db.session.scalar(db.select(tracker_app.SyllabusTopic.id))
+    client.post("/api/syllabus-progress", json={"topic_id": topic_id, "field": "theory_completed", "value": True})
+    client.post("/api/logout")
+
+    assert client.get("/api/admin/cohort-report").status_code == 403
+
+    _admin_login(client)
+    report = client.get("/api/admin/cohort-report").get_json()
+
+    with app.app_context():
+        expected = {
+            user.username: tracker_app.compute_analytics_summary(user)
+            for user in User.query.all()
+        }
+    assert report["user_count"] == 2
+    assert report["confidence_levels"]["Low"] == 2
+    by_name = {item["username"]: item for item in report["at_risk"]["low_readiness"]}
+    for username, summary in expected.items():
+        assert by_name[username]["predicted_score"] == pytest.approx(summary["predicted_score"], abs=0.1)
+    assert by_name["bob"]["syllabus_completion"] > 0
+    assert report["metrics"]["total_hours_studied"]["max"] == 2.0
+    assert [item["username"] for item in report["at_risk"]["inactive_this_week"]] == ["carol"]
+
+
+def test_analytics_summary_serves_snapshot_until_debounced_refresh(app, auth_client):
+    scheduler = app.extensions["analytics_scheduler"]
+    assert auth_client.get("/api/analytics-summary").get_json()["total_hours_studied"] == 0
+
+    auth_client.post("/api/study-session", json={"duration_seconds": 3600})
+    auth_client.post("/api/study-session", json={"duration_seconds": 3600})
+
+    assert len(scheduler.pending()) == 1
+    assert scheduler.run_pending() == 0
+    assert auth_client.get("/api/analytics-summary").get_json()["total_hours_studied"] == 0
+
+    assert scheduler.run_pending(force=True) == 1
+    assert auth_client.get("/api/analytics-summary").get_json()["total_hours_studied"] == 2.0
+
+
+def test_analytics_scheduler_thread_recomputes_snapshots(app, auth_client):
+    with app.app_context():
+        user_id = User.query.filter_by(username="alice").one().id
+    scheduler = tracker_app.AnalyticsScheduler(app, debounce_seconds=0.01, refresh_seconds=60)
+    try:
+        scheduler.schedule(user_id)
+        deadline = time.monotonic() + 5
+        snapshot = None
+        while snapshot is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+            with app.app_context():
+                snapshot = db.session.get(tracker_app.AnalyticsSnapshot, user_id)
+    finally:
+        scheduler.close()
+
+    assert snapshot is not None
+    assert json.loads(snapshot.summary)["confidence_level"] == "Low"
+
+
+def test_failed_side_effects_stay_in_outbox_until_retried(app, auth_client, monkeypatch):
+    side_effects = app.extensions["side_effects"]
+    monkeypatch.setitem(
+        tracker_app.SIDE_EFFECT_HANDLERS, "event.publish", Mock(side_effect=RuntimeError("broker down"))
+    )
+
+    response = auth_client.post("/api/study-session", json={"duration_seconds": 60})
+
+    assert response.status_code == 201
+    metrics = side_effects.metrics()
+    assert metrics["outbox_pending"] == 1
+    assert metrics["failed"] == 1
+
+    monkeypatch.undo()
+    assert side_effects.sweep() == 1
+    assert side_effects.metrics()["outbox_pending"] == 0
+
+    _admin_login(auth_client)
+    assert auth_client.get("/api/admin/side-effects").get_json()["processed"] == 2
+
+
+def test_side_effect_workers_drain_outbox_left_by_restart(app):
+    with app.app_context():
+        # Core inserts bypass the after-commit hook, like rows a crashed worker left behind.
+        db.session.execute(
+            db.insert(tracker_app.OutboxTask),
+            [
+                {
+                    "user_id": 1,
+                    "kind": "heatmap.invalidate",
+                    "payload": json.dumps({"user_id": 1, "day": day}),
+                    "attempts": 0,
+                }
+                for day in ("2026-01-05", "2026-02-05", "2026-03-05")
+            ],
+        )
+        db.session.commit()
+        assert app.extensions["side_effects"].metrics()["outbox_pending"] == 3
+
+    side_effects = tracker_app.SideEffectQueue(app, workers=2, sweep_seconds=0.05)
+    side_effects.start()
+    try:
+        deadline = time.monotonic() + 5
+        while side_effects.metrics()["outbox_pending"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert side_effects.metrics()["outbox_pending"] == 0
+    finally:
+        side_effects.close()
+
+
+def test_threaded_side_effect_workers_deliver_sequenced_events(tmp_path):
+    flask_app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'workers.db'}",
+            "SECRET_KEY": "test-secret",
+            "ANALYTICS_SCHEDULER_ENABLED": False,
+            "SIDE_EFFECT_WORKERS": 2,
+            "SIDE_EFFECT_SWEEP_SECONDS": 0.05,
+        }
+    )
+    client = flask_app.test_client()
+    _admin_login(client)
+    client.post("/api/register", json={"username": "alice", "password": "password123"})
+    client.post("/api/admin/logout")
+    client.post("/api/login", json={"username": "alice", "password": "password123"})
+    side_effects = flask_app.extensions["side_effects"]
+    try:
+        routine_id = client.get("/api/daily-routine").get_json()["items"][0]["id"]
+        with flask_app.app_context():
+            alice = User.query.filter_by(username="alice").one()
+            user_id = alice.id
+        subscriber = flask_app.extensions["event_broker"].subscribe(user_id)
+        for _ in range(7):
+            client.post("/api/daily-routine", json={"routine_id": routine_id})
+
+        deadline = time.monotonic() + 5
+        while side_effects.metrics()["outbox_pending"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert side_effects.metrics()["outbox_pending"] == 0
+
+        events = []
+        while not subscriber.empty():
+            events.append(subscriber.get_nowait())
+        toggles = [event for event in events if event["type"] == "routine.toggled"]
+        with flask_app.app_context():
+            logged_ids = db.session.scalars(
+                db.select(tracker_app.UserEvent.id)
+                .where(tracker_app.UserEvent.kind == "routine.toggled")
+                .order_by(tracker_app.UserEvent.id)
+            ).all()
+        assert sorted(event["seq"] for event in toggles) == logged_ids
+        # Whatever the delivery order, the newest sequence carries the final state.
+        assert max(toggles, key=lambda event: event["seq"])["completed"] is True
+    finally:
+        tracker_app.stop_background_workers(flask_app)
+        with flask_app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+
+def test_inline_side_effects_delete_finished_outbox_rows_in_one_statement(app, auth_client):
+    deletes = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("DELETE FROM outbox_task"):
+            deletes.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        auth_client.post("/api/study-session", json={"duration_seconds": 60})
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert len(deletes) == 1
+    assert app.extensions["side_effects"].metrics()["outbox_pending"] == 0
+
+
+def test_score_projection_simulates_until_exam_date(app, auth_client):
+    assert auth_client.get("/api/score-projection").status_code == 400
+
+    exam_date = (date.today() + timedelta(days=120)).isoformat()
+    auth_client.put("/api/settings", json={"exam_date": exam_date})
+    auth_client.post("/api/study-session", json={"duration_seconds": 4 * 3600})
+    with app.app_context():
+        topic_id = db.session.scalar(db.select(tracker_app.SyllabusTopic.id))
+    auth_client.post("/api/syllabus-progress", json={"topic_id": topic_id, "field": "theory_completed", "value": True})
+
+    projection = auth_client.get("/api/score-projection").get_json()
+
+    assert projection["trajectories"] == 10_000
+    assert projection["days_remaining"] == 120
+    percentiles = projection["percentiles"]
+    assert projection["current_score"] <= percentiles["p10"] <= percentiles["p50"] <= percentiles["p90"]
+    assert percentiles["p90"] <= projection["max_possible"] <= 200
+    assert percentiles["p50"] > projection["current_score"]
+    assert auth_client.get("/api/score-projection?trajectories=0").status_code == 400
+
+
+def test_score_projection_is_cached_until_progress_version_changes(app, auth_client, monkeypatch):
+    auth_client.put("/api/settings", json={"exam_date": (date.today() + timedelta(days=30)).isoformat()})
+    compute_spy = Mock(side_effect=tracker_app.compute_score_projection)
+    monkeypatch.setattr(tracker_app, "compute_score_projection", compute_spy)
+
+    first = auth_client.get("/api/score-projection?trajectories=500").get_json()
+    assert auth_client.get("/api/score-projection?trajectories=500").get_json() == first
+    assert compute_spy.call_count == 1
+
+    with app.app_context():
+        topic_id = db.session.scalar(db.select(tracker_app.SyllabusTopic.id))
+    auth_client.post("/api/syllabus-progress", json={"topic_id": topic_id, "field": "pyq_30_done", "value": True})
+    auth_client.get("/api/score-projection?trajectories=500")
+    assert compute_spy.call_count == 2
+
+    auth_client.post("/api/study-session", json={"duration_seconds": 1800})
+    auth_client.get("/api/score-projection?trajectories=500")
+    assert compute_spy.call_count == 3
+
+
+def test_score_projection_caps_gains_per_subject(monkeypatch):
+    monkeypatch.setattr(tracker_app, "PROJECTION_EFFICIENCY_SIGMA", 0.0)
+
+    def simulate(days_remaining):
+        return tracker_app.simulate_score_projection(
+            current_points=10.0,
+            subject_rates=[0.5, 2.0, 1.0],
+            subject_caps=[10.0, 4.0, 0.0],
+            daily_hours=[1.0] * 28,
+            days_remaining=days_remaining,
+            trajectories=3,
+            seed=1,
+        )
+
+    # Two hours finish the fast subject (4 points); the rest earn 0.5 per hour.
+    assert simulate(4) == [pytest.approx(35.0)] * 3
+    assert simulate(1000) == [pytest.approx(44.0)] * 3
+    assert tracker_app.fill_subject_gains([0.5, 2.0, 1.0], [10.0, 4.0, 0.0], 5.0) == [
+        1.0,
+        4.0,
+        0.0,
+    ]
+
+
+def test_study_plan_schedules_stages_in_order_within_daily_goal(auth_client):
+    assert auth_client.get("/api/study-plan").status_code == 400
+
+    auth_client.put(
+        "/api/settings",
+        json={"exam_date": (date.today() + timedelta(days=10)).isoformat(), "daily_goal": 3},
+    )
+    plan = auth_client.get("/api/study-plan").get_json()
+
+    assert plan["days_remaining"] == 10
+    assert len(plan["days"]) == 10
+    assert all(len(day["items"]) == 3 for day in plan["days"])
+    assert plan["unscheduled_stages"] > 0
+    first_seen: dict[tuple[int, str], str] = {}
+    for day in plan["days"]:
+        for item in day["items"]:
+            first_seen[(item["topic_id"], item["stage"])] = day["date"]
+    for (topic_id, stage), day in first_seen.items():
+        if stage == "pyq_30_done":
+            assert first_seen[(topic_id, "theory_completed")] < day
+    first_day_points = [item["points"] for item in plan["days"][0]["items"]]
+    last_day_points = [item["points"] for item in plan["days"][-1]["items"]]
+    assert min(first_day_points) >= max(last_day_points) * 0.5
+
+
+def test_study_plan_apply_adds_planner_tasks_once(app, auth_client):
+    auth_client.put(
+        "/api/settings",
+        json={"exam_date": (date.today() + timedelta(days=30)).isoformat(), "daily_goal": 2},
+    )
+
+    response = auth_client.post("/api/study-plan/apply", json={"days": 3})
+    assert response.status_code == 201
+    assert response.get_json()["created"] == 6
+    assert auth_client.post("/api/study-plan/apply", json={"days": 3}).get_json()["created"] == 0
+    assert len(auth_client.get("/api/daily-planner").get_json()["items"]) == 2
+
+    result = app.test_cli_runner().invoke(args=["generate-plans", "--days", "4"])
+    assert "Added 2 planner tasks for 1 users." in result.output
+
+
+def test_task_search_ranks_prefix_matches_for_current_user_only(app, auth_client):
+    with app.app_context():
+        alice_id = User.query.filter_by(username="alice").one().id
+        other = _create_user("mallory")
+        _create_task(other.id, title="Galois groups", topic="Groups")
+        notes_match = _create_task(alice_id, title="Weekly review", topic="Mixed", notes="Revise Galois theory")
+        title_match = _create_task(alice_id, title="Galois extensions", topic="Fields")
+        _create_task(alice_id, title="Metric spaces", topic="Topology")
+        notes_match_id, title_match_id = notes_match.id, title_match.id
+
+    response = auth_client.get("/api/tasks/search?q=galo")
+
+    assert response.status_code == 200
+    assert [task["id"] for task in response.get_json()["tasks"]] == [title_match_id, notes_match_id]
+
+    auth_client.patch(f"/api/tasks/{title_match_id}", json={"title": "Field extensions"})
+    auth_client.delete(f"/api/tasks/{notes_match_id}")
+    assert auth_client.get("/api/tasks/search?q=galois").get_json()["tasks"] == []
+    assert auth_client.get("/api/tasks/search?q=fie+ext&fields=id").get_json()["tasks"] == [
+        {"id": title_match_id}
+    ]
+    assert auth_client.get("/api/tasks/search?q=%22%29").status_code == 400
+
+
+def test_rebuild_search_index_command_reindexes_existing_tasks(app, auth_client):
+    with app.app_context():
+        alice_id = User.query.filter_by(username="alice").one().id
+        _create_task(alice_id, title="Sylow theorems")
+        db.session.execute(db.text("INSERT INTO task_fts(task_fts) VALUES ('delete-all')"))
+        db.session.commit()
+    assert auth_client.get("/api/tasks/search?q=sylow").get_json()["tasks"] == []
+
+    result = app.test_cli_runner().invoke(args=["rebuild-search-index"])
+
+    assert "Rebuilt task search index." in result.output
+    assert len(auth_client.get("/api/tasks/search?q=sylow").get_json()["tasks"]) == 1
+
+
+def test_upcoming_deadlines_bucket_open_tasks_by_due_date(app, auth_client):
+    today = date.today()
+    with app.app_context():
+        alice_id = User.query.filter_by(username="alice").one().id
+        _create_task(alice_id, title="Late", due_date=today - timedelta(days=2))
+        _create_task(alice_id, title="Done late", due_date=today - timedelta(days=1), completed=True)
+        _create_task(alice_id, title="Now", due_date=today)
+        _create_task(alice_id, title="Soon", due_date=today + timedelta(days=3))
+        _create_task(alice_id, title="Later", due_date=today + timedelta(days=30))
+        _create_task(alice_id, title="Someday")
+
+    payload = auth_client.get("/api/tasks/upcoming?fields=title").get_json()
+
+    assert payload["overdue"] == {"count": 1, "tasks": [{"title": "Late"}]}
+    assert payload["today"] == {"count": 1, "tasks": [{"title": "Now"}]}
+    assert payload["upcoming"] == {"count": 1, "tasks": [{"title": "Soon"}]}
+    assert auth_client.get("/api/tasks/upcoming?days=31").get_json()["upcoming"]["count"] == 2
+    assert auth_client.get("/api/tasks/upcoming?days=0").status_code == 400
+
+
+def test_upcoming_deadline_queries_use_partial_due_date_index(app):
+    today = date.today()
+    with app.app_context():
+        conditions = tracker_app.open_due_task_conditions(1)
+        statement = db.select(db.func.count()).where(*conditions, Task.due_date <= today)
+        compiled = statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+        plan = _query_plan(str(compiled))
+
+    assert "USING INDEX ix_task_user_open_due_date" in " ".join(plan)
+
+
+def test_sharded_mode_stores_user_rows_in_their_shard(tmp_path):
+    shard_dir = tmp_path / "shards"
+    flask_app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'central.db'}",
+            "SECRET_KEY": "test-secret",
+            "ANALYTICS_SCHEDULER_ENABLED": False,
+            "SIDE_EFFECT_WORKERS": 0,
+            "SHARD_COUNT": 2,
+            "SHARD_DIRECTORY": str(shard_dir),
+        }
+    )
+    client = flask_app.test_client()
+    _admin_login(client)
+    for username in ("alice", "bob"):
+        client.post("/api/register", json={"username": username, "password": "password123"})
+    client.post("/api/admin/logout")
+
+    for username in ("alice", "bob"):
+        client.post("/api/login", json={"username": username, "password": "password123"})
+        created = client.post(
+            "/api/tasks", json={"title": f"{username} groups", "unit": "Algebra", "topic": "Groups"}
+        )
+        assert created.status_code == 201
+        client.post("/api/study-session", json={"duration_seconds": 3600})
+        titles = [task["title"] for task in client.get("/api/tasks").get_json()["tasks"]]
+        assert titles == [f"{username} groups"]
+        searched = client.get("/api/tasks/search?q=groups").get_json()["tasks"]
+        assert [task["title"] for task in searched] == [f"{username} groups"]
+        client.post("/api/logout")
+
+    def task_titles(path):
+        connection = sqlite3.connect(path)
+        try:
+            return [row[0] for row in connection.execute("SELECT title FROM task")]
+        finally:
+            connection.close()
+
+    # alice is user 1 and bob user 2, so they land in shards 1 and 0.
+    assert task_titles(shard_dir / "shard_1.db") == ["alice groups"]
+    assert task_titles(shard_dir / "shard_0.db") == ["bob groups"]
+    assert task_titles(tmp_path / "central.db") == []
+
+    _admin_login(client)
+    report = client.get("/api/admin/cohort-report").get_json()
+    assert report["user_count"] == 2
+    assert report["metrics"]["total_hours_studied"]["min"] == 1.0
+
+    result = flask_app.test_cli_runner().invoke(args=["rebuild-search-index"])
+    assert result.exit_code == 0
+    tracker_app.stop_background_workers(flask_app)
+    flask_app.extensions["shard_router"].dispose()
+
+
+def test_sharded_sync_idempotency_and_outbox_commit_in_the_user_shard(tmp_path, monkeypatch):
+    shard_dir = tmp_path / "shards"
+    flask_app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'central.db'}",
+            "SECRET_KEY": "test-secret",
+            "ANALYTICS_SCHEDULER_ENABLED": False,
+            "SIDE_EFFECT_WORKERS": 0,
+            "SHARD_COUNT": 2,
+            "SHARD_DIRECTORY": str(shard_dir),
+        }
+    )
+    client = flask_app.test_client()
+    _admin_login(client)
+    client.post("/api/register", json={"username": "alice", "password": "password123"})
+    client.post("/api/admin/logout")
+    client.post("/api/login", json={"username": "alice", "password": "password123"})
+
+    def rows(path, sql):
+        connection = sqlite3.connect(path)
+        try:
+            return connection.execute(sql).fetchall()
+        finally:
+            connection.close()
+
+    # alice is user 1, so her rows live in shard 1.
+    alice_shard = shard_dir / "shard_1.db"
+    token = client.get("/api/sync").get_json()["token"]
+    headers = {"Idempotency-Key": "create-1"}
+    created = client.post(
+        "/api/tasks", json={"title": "Sharded", "unit": "Algebra", "topic": "Rings"}, headers=headers
+    )
+    replayed = client.post(
+        "/api/tasks", json={"title": "Sharded", "unit": "Algebra", "topic": "Rings"}, headers=headers
+    )
+    assert created.status_code == 201
+    assert replayed.headers["Idempotent-Replayed"] == "true"
+    assert rows(alice_shard, "SELECT key FROM idempotency_record") == [("create-1",)]
+    assert rows(tmp_path / "central.db", "SELECT key FROM idempotency_record") == []
+
+    delta = client.get(f"/api/sync?since={token}").get_json()
+    assert [task["id"] for task in delta["changes"]["tasks"]] == [created.get_json()["id"]]
+    assert rows(alice_shard, "SELECT user_id, change_seq FROM sync_counter") == [(1, int(delta["token"]))]
+    assert rows(tmp_path / "central.db", "SELECT change_seq FROM user") == [(0,)]
+
+    # A failed write rolls back its change sequence with the shard rows.
+    with monkeypatch.context() as patch:
+        patch.setattr(tracker_app, "invalidate_heatmap_day", Mock(side_effect=RuntimeError("boom")))
+        with pytest.raises(RuntimeError):
+            client.post("/api/daily-planner", json={"title": "Lost"})
+    unchanged = client.get(f"/api/sync?since={delta['token']}").get_json()
+    assert unchanged["token"] == delta["token"]
+    assert all(items == [] for items in unchanged["changes"].values())
+
+    # Outbox rows commit with the write in the user's shard and drain from there.
+    side_effects = flask_app.extensions["side_effects"]
+    with monkeypatch.context() as patch:
+        patch.setitem(
+            tracker_app.SIDE_EFFECT_HANDLERS,
+            "event.publish",
+            Mock(side_effect=RuntimeError("broker down")),
+        )
+        assert client.post("/api/study-session", json={"duration_seconds": 600}).status_code == 201
+    assert rows(alice_shard, "SELECT user_id, kind FROM outbox_task") == [(1, "event.publish")]
+    assert rows(shard_dir / "shard_0.db", "SELECT id FROM outbox_task") == []
+    assert side_effects.metrics()["outbox_pending"] == 1
+    assert side_effects.sweep() == 1
+    assert side_effects.metrics()["outbox_pending"] == 0
+    tracker_app.stop_background_workers(flask_app)
+    flask_app.extensions["shard_router"].dispose()
+
+
+def test_init_shards_upgrades_unversioned_shards(tmp_path):
+    shard_dir = tmp_path / "shards"
+    flask_app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'central.db'}",
+            "SECRET_KEY": "test-secret",
+            "ANALYTICS_SCHEDULER_ENABLED": False,
+            "SIDE_EFFECT_WORKERS": 0,
+            "SHARD_COUNT": 2,
+            "SHARD_DIRECTORY": str(shard_dir),
+        }
+    )
+    _admin_login(flask_app.test_client())
+    runner = flask_app.test_cli_runner()
+    stamped = runner.invoke(args=["db", "stamp", "heads"])
+    assert stamped.exit_code == 0, stamped.output
+
+    # A shard created before shards were versioned: no sync counter or outbox
+    # and missing a later index.
+    connection = sqlite3.connect(shard_dir / "shard_0.db")
+    connection.execute("DROP INDEX ix_daily_task_user_date_created_at")
+    connection.execute("DROP TABLE sync_counter")
+    connection.execute("DROP TABLE outbox_task")
+    connection.execute("DROP TABLE alembic_version")
+    connection.commit()
+    connection.close()
+
+    result = runner.invoke(args=["init-shards"])
+    assert result.exit_code == 0, result.output
+
+    with flask_app.app_context():
+        head = ScriptDirectory(tracker_app.get_migrations_directory()).get_current_head()
+    for index in range(2):
+        connection = sqlite3.connect(shard_dir / f"shard_{index}.db")
+        try:
+            names = {row[0] for row in connection.execute("SELECT name FROM sqlite_master")}
+            version = connection.execute("SELECT version_num FROM alembic_version").fetchone()
+        finally:
+            connection.close()
+        assert {"ix_daily_task_user_date_created_at", "sync_counter", "outbox_task"} <= names
+        assert version == (head,)
+    tracker_app.stop_background_workers(flask_app)
+    flask_app.extensions["shard_router"].dispose()
+
+
+def test_group_commit_coalesces_concurrent_writes_and_isolates_failures(tmp_path):
+    flask_app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'group.db'}",
+            "SECRET_KEY": "test-secret",
+            "ANALYTICS_SCHEDULER_ENABLED": False,
+            "SIDE_EFFECT_WORKERS": 0,
+            "GROUP_COMMIT_MAX_LATENCY_MS": 200,
+        }
+    )
+    client = flask_app.test_client()
+    _admin_login(client)
+    client.post("/api/register", json={"username": "alice", "password": "password123"})
+    with flask_app.app_context():
+        alice_id = User.query.filter_by(username="alice").one().id
+
+    def log_session(user):
+        db.session.add(tracker_app.StudySession(user_id=user.id, duration_seconds=60, date=date.today()))
+        return user.id
+
+    def fail(user):
+        db.session.add(tracker_app.StudySession(user_id=user.id, duration_seconds=60, date=date.today()))
+        raise ValueError("boom")
+
+    def run_concurrently(committer, works):
+        barrier = threading.Barrier(len(works))
+        outcomes = []
+
+        def submit(work):
+            with flask_app.app_context():
+                barrier.wait()
+                try:
+                    outcomes.append(committer.run(alice_id, work))
+                except ValueError as error:
+                    outcomes.append(str(error))
+
+        threads = [threading.Thread(target=submit, args=(work,)) for work in works]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(outcomes, key=str)
+
+    # A long latency with max_batch equal to the number of writers makes the
+    # batch close exactly when the last unit arrives.
+    committer = tracker_app.GroupCommitter(flask_app, max_latency_ms=10_000, max_batch=5)
+    committer.start()
+    try:
+        assert run_concurrently(committer, [log_session] * 5) == [alice_id] * 5
+        assert committer.counters == {"commits": 1, "units": 5, "replayed": 0}
+    finally:
+        committer.close()
+
+    committer = tracker_app.GroupCommitter(flask_app, max_latency_ms=10_000, max_batch=3)
+    committer.start()
+    try:
+        outcomes = run_concurrently(committer, [log_session, fail, log_session])
+        assert outcomes == [alice_id, alice_id, "boom"]
+        assert committer.counters == {"commits": 2, "units": 2, "replayed": 3}
+    finally:
+        committer.close()
+    with flask_app.app_context():
+        assert tracker_app.StudySession.query.count() == 7
+
+    try:
+        client.post("/api/admin/logout")
+        client.post("/api/login", json={"username": "alice", "password": "password123"})
+        response = client.post("/api/study-session", json={"duration_seconds": 3600})
+        assert response.status_code == 201
+        assert response.get_json()["today_hours"] == round(4020 / 3600, 2)
+    finally:
+        tracker_app.stop_background_workers(flask_app)
+
+
+def test_group_commit_drops_units_whose_caller_timed_out(app, auth_client, monkeypatch):
+    with app.app_context():
+        alice_id = User.query.filter_by(username="alice").one().id
+
+    def log_session(user):
+        db.session.add(tracker_app.StudySession(user_id=user.id, duration_seconds=60, date=date.today()))
+        return user.id
+
+    committer = tracker_app.GroupCommitter(app, max_latency_ms=10_000, max_batch=2)
+    committer.start()
+    try:
+        with app.app_context():
+            monkeypatch.setattr(tracker_app, "GROUP_COMMIT_TIMEOUT_SECONDS", 0.05)
+            with pytest.raises(TimeoutError):
+                committer.run(alice_id, log_session)
+            # The second unit closes the batch that still holds the cancelled one.
+            monkeypatch.setattr(tracker_app, "GROUP_COMMIT_TIMEOUT_SECONDS", 5)
+            assert committer.run(alice_id, log_session) == alice_id
+            assert tracker_app.StudySession.query.count() == 1
+        assert committer.counters == {"commits": 1, "units": 1, "replayed": 0}
+    finally:
+        committer.close()
+
+
+def test_idempotency_records_commit_through_the_group_committer(app, auth_client):
+    routine_id = auth_client.get("/api/daily-routine").get_json()["items"][0]["id"]
+    counters = app.extensions["group_commit"].counters
+    units = counters["units"]
+
+    response = auth_client.post(
+        "/api/daily-routine",
+        json={"routine_id": routine_id},
+        headers={"Idempotency-Key": "routine-1"},
+    )
+
+    assert response.status_code == 200
+    # The claim, the toggle and the recorded response.
+    assert counters["units"] - units == 3
+
+
+def test_group_commit_splits_batches_by_shard(tmp_path):
+    flask_app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'central.db'}",
+            "SECRET_KEY": "test-secret",
+            "ANALYTICS_SCHEDULER_ENABLED": False,
+            "SIDE_EFFECT_WORKERS": 0,
+            "SHARD_COUNT": 2,
+            "SHARD_DIRECTORY": str(tmp_path / "shards"),
+        }
+    )
+    client = flask_app.test_client()
+    _admin_login(client)
+    for username in ("alice", "bob"):
+        client.post("/api/register", json={"username": username, "password": "password123"})
+
+    def log_session(user):
+        db.session.add(tracker_app.StudySession(user_id=user.id, duration_seconds=60, date=date.today()))
+        return user.id
+
+    committer = tracker_app.GroupCommitter(flask_app, max_latency_ms=10_000, max_batch=2)
+    committer.start()
+    barrier = threading.Barrier(2)
+    outcomes = []
+
+    def submit(user_id):
+        with flask_app.app_context():
+            barrier.wait()
+            outcomes.append(committer.run(user_id, log_session))
+
+    try:
+        # alice (user 1) and bob (user 2) live in different shards.
+        threads = [threading.Thread(target=submit, args=(user_id,)) for user_id in (1, 2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(outcomes) == [1, 2]
+        assert committer.counters == {"commits": 2, "units": 2, "replayed": 0}
+    finally:
+        committer.close()
+        tracker_app.stop_background_workers(flask_app)
+    flask_app.extensions["shard_router"].dispose()
+
+
+def test_study_timer_routes_log_session_on_stop(app, auth_client):
+    assert auth_client.post("/api/timer/heartbeat").status_code == 404
+    assert auth_client.post("/api/timer/pause").status_code == 404
+
+    started = auth_client.post("/api/timer/start").get_json()["timer"]
+    assert started["running"] is True
+    assert auth_client.post("/api/timer/heartbeat").status_code == 204
+    paused = auth_client.post("/api/timer/pause").get_json()["timer"]
+    assert paused["running"] is False
+    assert auth_client.get("/api/timer").get_json()["timer"] == paused
+
+    timers = app.extensions["study_timers"]
+    with app.app_context():
+        alice_id = User.query.filter_by(username="alice").one().id
+    timers.table.remove(alice_id)
+    timers.start_timer(alice_id, now=time.time() - 5400)
+    timers.pause(alice_id, now=time.time())
+
+    stopped = auth_client.post("/api/timer/stop").get_json()
+    assert stopped["duration_seconds"] == 5400
+    assert stopped["today_hours"] == 1.5
+    assert auth_client.get("/api/timer").get_json()["timer"] is None
+    assert auth_client.post("/api/timer/stop").status_code == 404
+    with app.app_context():
+        rows = tracker_app.StudySession.query.all()
+        assert [(row.user_id, row.duration_seconds) for row in rows] == [(alice_id, 5400)]
+
+
+def test_failed_timer_stop_keeps_the_timer_running(app, auth_client, monkeypatch):
+    auth_client.post("/api/timer/start")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(
+            tracker_app, "calculate_study_time_totals", Mock(side_effect=RuntimeError("boom"))
+        )
+        with pytest.raises(RuntimeError):
+            auth_client.post("/api/timer/stop")
+
+    assert auth_client.get("/api/timer").get_json()["timer"]["running"] is True
+    assert auth_client.post("/api/timer/stop").status_code == 200
+    assert auth_client.get("/api/timer").get_json()["timer"] is None
+
+
+def test_study_timers_are_shared_through_the_timer_store(app, tmp_path):
+    with app.app_context():
+        user_id = _create_user("timer").id
+    path = str(tmp_path / "timers.db")
+    first = tracker_app.StudyTimerRegistry(app, tracker_app.SQLiteStudyTimerTable(path))
+    second = tracker_app.StudyTimerRegistry(app, tracker_app.SQLiteStudyTimerTable(path))
+    try:
+        first.start_timer(user_id, now=1000)
+        assert second.pause(user_id, now=1030)["elapsed_seconds"] == 30
+        assert first.get(user_id, now=2000)["running"] is False
+
+        second.heartbeat(user_id, now=1040)
+        assert second.flush(now=1040) == 1
+        assert first.flush(now=1040) == 0
+        with first.stopping(user_id) as stopped:
+            timer, seconds = stopped
+            assert (timer.session_id, seconds) == (1, 30)
+        assert second.get(user_id) is None
+    finally:
+        first.close()
+        second.close()
+
+
+def test_study_timer_flush_updates_one_row_and_closes_stale_timers(app):
+    timers = app.extensions["study_timers"]
+    with app.app_context():
+        user_id = _create_user("timer").id
+
+    def durations():
+        with app.app_context():
+            return [row.duration_seconds for row in tracker_app.StudySession.query.all()]
+
+    timers.start_timer(user_id, now=1000)
+    assert timers.flush(now=1030) == 1
+    assert durations() == [30]
+    assert timers.flush(now=1030) == 0
+
+    timers.heartbeat(user_id, now=1050)
+    assert timers.flush(now=1060) == 1
+    assert durations() == [60]
+
+    # No heartbeat since 1050: the timer is closed and only counted up to it.
+    assert timers.flush(now=1050 + timers.stale_seconds + 1) == 1
+    assert timers.get(user_id) is None
+    assert durations() == [50]
+
+    timers.start_timer(user_id, now=2000)
+    timers.heartbeat(user_id, now=2090)
+    assert timers.flush(now=2090 + timers.stale_seconds + 1) == 1
+    assert timers.get(user_id) is None
+    assert durations() == [50, 90]
+
+
+def test_timer_writes_refresh_the_cached_heatmap_month(app, auth_client):
+    timers = app.extensions["study_timers"]
+    past_day = date.today().replace(day=1) - timedelta(days=1)
+    query = f"/api/analytics/heatmap?start={past_day.isoformat()}&end={past_day.isoformat()}"
+    assert auth_client.get(query).get_json()["days"][0]["study_seconds"] == 0
+    with app.app_context():
+        alice_id = User.query.filter_by(username="alice").one().id
+
+    def started_last_month(timer):
+        # The timer ran over from the last day of the previous month.
+        timer.started_on = past_day
+        return timer
+
+    now = time.time()
+    timers.start_timer(alice_id, now=now - 600)
+    timers.table.update(alice_id, started_last_month)
+    timers.heartbeat(alice_id, now=now - 300)
+    assert timers.flush(now=now - 300) == 1
+    assert auth_client.get(query).get_json()["days"][0]["study_seconds"] == 300
+
+    timers.pause(alice_id, now=now)
+    assert auth_client.post("/api/timer/stop").get_json()["duration_seconds"] == 600
+    assert auth_client.get(query).get_json()["days"][0]["study_seconds"] == 600
+
+
+def test_projections_fold_event_log_and_rebuild_from_scratch(app, auth_client):
+    auth_client.post("/api/study-session", json={"duration_seconds": 1800})
+    study = auth_client.get("/api/projections/study_days").get_json()
+    assert (study["study_days"], study["total_hours"]) == (1, 0.5)
+
+    with app.app_context():
+        topic_id = db.session.scalar(db.select(tracker_app.SyllabusTopic.id))
+    auth_client.post("/api/study-session", json={"duration_seconds": 1800})
+    auth_client.post(
+        "/api/syllabus-progress", json={"topic_id": topic_id, "field": "theory_completed", "value": True}
+    )
+    auth_client.patch("/api/mock-tests/2", json={"attempted": True, "score": 110})
+
+    assert auth_client.get("/api/projections/study_days").get_json()["total_hours"] == 1.0
+    mocks = auth_client.get("/api/projections/mock_stats").get_json()
+    assert (mocks["attempted_count"], mocks["total_count"], mocks["best_score"]) == (1, 10, 110)
+    assert auth_client.get("/api/projections/unknown").status_code == 404
+
+    with app.app_context():
+        kinds = [event.kind for event in tracker_app.UserEvent.query.order_by(tracker_app.UserEvent.id)]
+        assert kinds == [
+            "session.logged",
+            "session.logged",
+            "syllabus.changed",
+            "mock.seeded",
+            "mock.updated",
+        ]
+        snapshot = db.session.get(tracker_app.ProjectionSnapshot, (1, "study_days"))
+        snapshot.state = json.dumps({"days": {}})
+        db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["rebuild-projections", "--name", "study_days", "--from-scratch"])
+    assert result.exit_code == 0, result.output
+    assert auth_client.get("/api/projections/study_days").get_json()["total_hours"] == 1.0
+    assert runner.invoke(args=["rebuild-projections", "--name", "nope"]).exit_code != 0
+
+
+def test_study_days_projection_counts_flushed_timers_once(app, auth_client):
+    timers = app.extensions["study_timers"]
+    with app.app_context():
+        alice_id = User.query.filter_by(username="alice").one().id
+    now = time.time()
+    timers.start_timer(alice_id, now=now - 3600)
+    timers.heartbeat(alice_id, now=now - 1800)
+    assert timers.flush(now=now - 1800) == 1
+    # The first read snapshots the half-hour row the flush wrote.
+    assert auth_client.get("/api/projections/study_days").get_json()["total_hours"] == 0.5
+
+    assert auth_client.post("/api/timer/stop").get_json()["duration_seconds"] == 3600
+    assert auth_client.get("/api/projections/study_days").get_json()["total_hours"] == 1.0
+    result = app.test_cli_runner().invoke(
+        args=["rebuild-projections", "--name", "study_days", "--from-scratch"]
+    )
+    assert result.exit_code == 0, result.output
+    assert auth_client.get("/api/projections/study_days").get_json()["total_hours"] == 1.0
+
+
+def test_reads_served_from_projections_match_the_tables(app, auth_client):
+    # Snapshot every projection first so the rest is folded from the log.
+    assert auth_client.get("/api/projections/mock_stats").get_json()["total_count"] == 0
+    auth_client.get("/dashboard")
+    auth_client.get("/api/analytics-summary")
+
+    created = auth_client.post("/api/tasks", json={"title": "Read", "unit": "Algebra", "topic": "Rings"}).get_json()
+    auth_client.patch(f"/api/tasks/{created['id']}", json={"completed": True})
+    removed = auth_client.post("/api/tasks", json={"title": "Drop", "unit": "Algebra", "topic": "Rings"}).get_json()
+    auth_client.patch(f"/api/tasks/{removed['id']}", json={"completed": True})
+    auth_client.delete(f"/api/tasks/{removed['id']}")
+    auth_client.post("/api/study-session", json={"duration_seconds": 5400})
+    auth_client.patch("/api/mock-tests/1", json={"attempted": True, "score": 101.5})
+    auth_client.patch("/api/mock-tests/4", json={"attempted": True, "score": 120})
+    mock_summary = auth_client.patch("/api/mock-tests/4", json={"score": 88}).get_json()
+
+    progress = auth_client.get("/api/progress").get_json()
+    bootstrap = auth_client.get("/api/bootstrap").get_json()
+    assert progress["study_streak"] == bootstrap["study_streak"] == 1
+    assert progress["total_tracked_minutes"] == bootstrap["total_tracked_minutes"] == 45
+
+    mock_table = auth_client.get("/api/mock-tests").get_json()
+    for key in ["attempted_count", "total_count", "attempt_percent", "average_score", "best_score"]:
+        assert mock_summary[key] == mock_table[key]
+
+    with app.app_context():
+        user = User.query.filter_by(username="alice").one()
+        seconds = sum(s.duration_seconds for s in tracker_app.StudySession.query.filter_by(user_id=user.id))
+        summary = tracker_app.compute_analytics_summary(user)
+    assert summary["total_hours_studied"] == round(seconds / 3600, 2)
+    assert summary["average_daily_hours"] == 1.5
+    assert summary["mock_test_attempt_percent"] == mock_table["attempt_percent"]
+    assert summary["average_mock_score"] == mock_table["average_score"]
+
+
+def test_projection_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        tracker_app.Projection()
+
+
+HOT_PER_DAY_TABLES = {"daily_task", "routine_completion", "study_session"}
+
+
+def test_hot_per_day_queries_never_scan_their_tables(app, auth_client):
+    auth_client.post("/api/study-session", json={"duration_seconds": 600})
+    auth_client.post("/api/daily-planner", json={"title": "Revise"})
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        for path in ("/api/daily-planner", "/api/daily-routine", "/api/analytics/heatmap", "/api/progress"):
+            assert auth_client.get(path).status_code == 200
+        auth_client.post("/api/daily-routine", json={"routine_id": 1})
+        auth_client.post("/api/study-session", json={"duration_seconds": 60})
+        with app.app_context():
+            user = User.query.filter_by(username="alice").one()
+            tracker_app.compute_analytics_summary(user)
+            tracker_app.get_daily_study_hours(user, date.today(), 28)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    hot = [
+        (sql, parameters)
+        for sql, parameters in statements
+        if any(table in sql for table in HOT_PER_DAY_TABLES)
+    ]
+    assert hot
+    problems = {}
+    with app.app_context():
+        for sql, parameters in hot:
+            by_user_and_day = re.search(r"\.user_id = \?.*\.date (=|>|<|BETWEEN)", sql)
+            for detail in _query_plan(sql, parameters):
+                if "TEMP B-TREE FOR ORDER BY" in detail:
+                    problems[detail] = sql
+                if detail.split()[1] not in HOT_PER_DAY_TABLES:
+                    continue
+                constraints = detail.partition("(")[2]
+                if detail.startswith("SCAN") or (
+                    by_user_and_day and not ("user_id=?" in constraints and "date" in constraints)
+                ):
+                    problems[detail] = sql
+    assert problems == {}
+
+
+def test_rate_limiter_returns_429_per_route_class(app, auth_client):
+    app.extensions["rate_limiter"] = tracker_app.TokenBucketLimiter(
+        {"read": (100.0, 100.0), "write": (100.0, 100.0), "heavy": (0.01, 2.0)}
+    )
+
+    assert auth_client.get("/api/analytics/heatmap").status_code == 200
+    assert auth_client.get("/api/analytics-summary").status_code == 200
+    limited = auth_client.get("/api/analytics/heatmap")
+
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 99
+    assert auth_client.get("/api/tasks").status_code == 200
+    assert auth_client.post("/api/study-session", json={"duration_seconds": 60}).status_code == 201
+
+
+def test_admission_gate_sheds_heavy_requests_first(app, auth_client):
+    gate = app.extensions["admission_gate"]
+    gate.in_flight = gate.heavy_limit
+
+    shed = auth_client.get("/api/analytics-summary")
+    assert shed.status_code == 429
+    assert shed.headers["Retry-After"] == "1"
+    assert auth_client.get("/api/daily-routine").status_code == 200
+    assert auth_client.post("/api/study-session", json={"duration_seconds": 60}).status_code == 201
+    assert gate.in_flight == gate.heavy_limit
+
+    gate.in_flight = gate.max_in_flight
+    assert auth_client.get("/api/daily-routine").status_code == 429
+    gate.in_flight = 0
+
+
+def test_sqlite_rate_limiter_shares_buckets_between_workers(tmp_path):
+    path = str(tmp_path / "limits.db")
+    limits = {"write": (1.0, 2.0)}
+    first = tracker_app.SQLiteTokenBucketLimiter(path, limits)
+    second = tracker_app.SQLiteTokenBucketLimiter(path, limits)
+
+    assert first.acquire("user:1", "write", now=100) == 0
+    assert second.acquire("user:1", "write", now=100) == 0
+    assert first.acquire("user:1", "write", now=100) == pytest.approx(1.0)
+    assert second.acquire("user:2", "write", now=100) == 0
+    assert second.acquire("user:1", "write", now=101) == 0
+    with pytest.raises(ValueError):
+        first.acquire("user:3", "write", cost=3, now=100)
+    assert first.acquire("user:3", "write", cost=2, now=100) == 0
+
+    # A locked bucket file admits the request instead of failing it.
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        assert first.acquire("user:1", "write", now=101) == 0
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+
+
+def test_batches_pay_their_full_cost_to_the_rate_limiter(app, auth_client):
+    app.extensions["rate_limiter"] = tracker_app.TokenBucketLimiter(
+        {"read": (100.0, 100.0), "write": (0.01, 3.0), "heavy": (100.0, 100.0)}
+    )
+    operations = [{"method": "POST", "path": "/api/study-session", "body": {"duration_seconds": 60}}]
+
+    too_big = auth_client.post("/api/batch", json={"operations": operations * 4})
+    assert too_big.status_code == 400
+    assert auth_client.post("/api/batch", json=[operations[0]]).status_code == 400
+    assert auth_client.post("/api/batch", json={"operations": operations * 2}).status_code == 200
+    limited = auth_client.post("/api/batch", json={"operations": operations * 2})
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 99
+
+
+def test_single_flight_shares_concurrent_analytics_computation(app, auth_client, monkeypatch):
+    calls = []
+    release = threading.Event()
+    compute = tracker_app.compute_analytics_summary
+
+    def slow_compute(user):
+        calls.append(user.id)
+        release.wait(5)
+        return compute(user)
+
+    monkeypatch.setattr(tracker_app, "compute_analytics_summary", slow_compute)
+    clients = [app.test_client() for _ in range(3)]
+    for client in clients:
+        client.post("/api/login", json={"username": "alice", "password": "password123"})
+    responses = []
+
+    def fetch(client):
+        responses.append(client.get("/api/analytics-summary").get_json())
+
+    threads = [threading.Thread(target=fetch, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    flights = app.extensions["single_flight"]
+    for _ in range(500):
+        if flights.shared == 2:
+            break
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert flights.shared == 2
+    assert len(calls) == 1
+    assert len(responses) == 3 and all(response == responses[0] for response in responses)
+
+
+def test_single_flight_forwards_keyword_arguments(app, auth_client):
+    auth_client.get("/api/mock-tests")
+    with app.app_context():
+        user = User.query.filter_by(username="alice").one()
+        fields = ("test_number",)
+        by_keyword = tracker_app.get_mock_test_stats(user, fields=fields)
+        assert by_keyword == tracker_app.get_mock_test_stats(user, fields)
+        assert set(by_keyword["items"][0]) == {"test_number"}
+
+
+def test_single_flight_propagates_errors_to_waiting_callers():
+    flights = tracker_app.SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError("boom")
+
+    def call():
+        try:
+            flights.do("key", fail)
+        except ValueError as error:
+            errors.append(str(error))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flights.shared == 0:
+        time.sleep(0.01)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert errors == ["boom", "boom"]
+    assert flights.do("key", lambda: 42) == 42